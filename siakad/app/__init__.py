@@ -1,6 +1,7 @@
 from flask import Flask, render_template
-from .extensions import db, migrate, login_manager, bcrypt, csrf
+from .extensions import db, migrate, login_manager, bcrypt, csrf, cache, sql_stats, refdata, audit
 from .models import RoleEnum
+from .utils.routing import configure_engines, init_replica
 from . import extensions
 from config import get_config
 from flask_wtf.csrf import generate_csrf
@@ -11,27 +12,40 @@ def create_app(config_class=None):
     app = Flask(__name__)
     app.config.from_object(config_class or get_config())
 
+    configure_engines(app)
+
     # Init extensions
     db.init_app(app)
+    init_replica(app)
     migrate.init_app(app, db)
     bcrypt.init_app(app)
     csrf.init_app(app)
+    cache.init_app(app)
+    sql_stats.init_app(app)
+    refdata.init_app(app)
+    audit.init_app(app)
 
     # Login manager after app init
     login_manager.init_app(app)
     login_manager.login_view = "auth.login"
     login_manager.login_message_category = "warning"
 
-    from .models import User  # local import to avoid circular
+    from .auth.identity import load_identity  # local import to avoid circular
 
     @login_manager.user_loader
     def load_user(user_id: str):
-        return db.session.get(User, int(user_id))
+        return load_identity(int(user_id))
 
     # Jinja globals/filters
     app.jinja_env.globals["RoleEnum"] = RoleEnum
     app.jinja_env.globals["csrf_token"] = generate_csrf
 
+    from .reference import terms
+    from .terms.scope import current_term
+
+    app.jinja_env.globals["academic_terms"] = terms
+    app.jinja_env.globals["current_term"] = current_term
+
     # Blueprints (registered later when modules exist)
     from .auth.routes import bp as auth_bp
     from .dashboard.routes import bp as dashboard_bp
@@ -40,6 +54,10 @@ def create_app(config_class=None):
     from .subjects.routes import bp as subjects_bp
     from .classes.routes import bp as classes_bp
     from .grades.routes import bp as grades_bp
+    from .imports.routes import bp as imports_bp
+    from .analytics.routes import bp as analytics_bp
+    from .jobs.routes import bp as jobs_bp
+    from .terms.routes import bp as terms_bp
 
     app.register_blueprint(auth_bp)
     app.register_blueprint(dashboard_bp)
@@ -48,6 +66,10 @@ def create_app(config_class=None):
     app.register_blueprint(subjects_bp)
     app.register_blueprint(classes_bp)
     app.register_blueprint(grades_bp)
+    app.register_blueprint(imports_bp)
+    app.register_blueprint(analytics_bp)
+    app.register_blueprint(jobs_bp)
+    app.register_blueprint(terms_bp)
 
     # Error handlers
     @app.errorhandler(404)
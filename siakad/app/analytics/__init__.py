@@ -0,0 +1 @@
+# analytics blueprint package
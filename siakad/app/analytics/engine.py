@@ -0,0 +1,138 @@
+from itertools import chain
+
+import numpy as np
+from sqlalchemy import select, func
+
+from ..extensions import db
+from ..models import Student, Enrollment, Grade
+from .. import reference
+
+COMPONENTS = ("tugas", "uts", "uas", "nilai_akhir")
+PERCENTILES = (10, 25, 50, 75, 90)
+BINS = np.arange(0, 110, 10)
+MISSING = -1.0
+
+
+def load_columns(term_id: int, subject_id: int | None = None, classroom_id: int | None = None) -> dict[str, np.ndarray]:
+    # One term's rows, in one statement streamed straight into a flat float buffer. NULLs come back as a
+    # negative sentinel so fromiter never sees None, and the Core result skips ORM
+    # row processing; both matter at school-wide row counts.
+    stmt = (
+        select(
+            Enrollment.student_id,
+            Enrollment.subject_id,
+            *(func.coalesce(getattr(Grade, c), MISSING) for c in COMPONENTS),
+        )
+        .join(Grade, Grade.enrollment_id == Enrollment.id)
+        .where(Enrollment.term_id == term_id)
+    )
+    if subject_id:
+        stmt = stmt.where(Enrollment.subject_id == subject_id)
+    if classroom_id:
+        stmt = stmt.join(Student, Student.id == Enrollment.student_id).where(Student.classroom_id == classroom_id)
+    result = db.session.connection().execute(stmt)
+    data = np.fromiter(chain.from_iterable(result), dtype=float).reshape(-1, 2 + len(COMPONENTS))
+    values = data[:, 2:]
+    values[values == MISSING] = np.nan
+    return {
+        "student_id": data[:, 0].astype(np.int64),
+        "subject_id": data[:, 1].astype(np.int64),
+        **{name: values[:, i] for i, name in enumerate(COMPONENTS)},
+    }
+
+
+def _round(value, digits=2):
+    return None if value is None or np.isnan(value) else round(float(value), digits)
+
+
+def summarize(values: np.ndarray) -> dict:
+    values = values[~np.isnan(values)]
+    if not values.size:
+        return {"count": 0, "mean": None, "std": None, "min": None, "max": None, "percentiles": {}}
+    return {
+        "count": int(values.size),
+        "mean": _round(values.mean()),
+        "std": _round(values.std()),
+        "min": _round(values.min()),
+        "max": _round(values.max()),
+        "percentiles": {str(p): _round(v) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))},
+    }
+
+
+def distribution(values: np.ndarray) -> dict:
+    values = values[~np.isnan(values)]
+    counts, edges = np.histogram(values, bins=BINS)
+    labels = [f"{int(lo)}-{int(hi)}" for lo, hi in zip(edges[:-1], edges[1:])]
+    return {"labels": labels, "counts": counts.tolist()}
+
+
+def correlations(cols: dict[str, np.ndarray]) -> dict:
+    matrix = np.column_stack([cols[c] for c in COMPONENTS])
+    complete = matrix[~np.isnan(matrix).any(axis=1)]
+    if complete.shape[0] < 2:
+        return {}
+    with np.errstate(invalid="ignore", divide="ignore"):
+        corr = np.corrcoef(complete, rowvar=False)
+    return {a: {b: _round(corr[i, j], 3) for j, b in enumerate(COMPONENTS)} for i, a in enumerate(COMPONENTS)}
+
+
+def group_means(keys: np.ndarray, values: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    mask = ~np.isnan(values)
+    uniq, inverse = np.unique(keys[mask], return_inverse=True)
+    sums = np.bincount(inverse, weights=values[mask])
+    counts = np.bincount(inverse)
+    return uniq, sums / counts, counts
+
+
+def competition_rank(scores: np.ndarray) -> np.ndarray:
+    # 1 + number of strictly higher scores ("1224" ranking)
+    ordered = np.sort(scores)
+    return ordered.size - np.searchsorted(ordered, scores, side="right") + 1
+
+
+def rankings(cols: dict[str, np.ndarray], limit: int = 20) -> list[dict]:
+    student_ids, means, counts = group_means(cols["student_id"], cols["nilai_akhir"])
+    if not student_ids.size:
+        return []
+    ranks = competition_rank(means)
+    top = np.argsort(-means, kind="stable")[:limit]
+    names = dict(
+        db.session.execute(
+            select(Student.id, Student.name).where(Student.id.in_([int(i) for i in student_ids[top]]))
+        ).all()
+    )
+    return [
+        {
+            "rank": int(ranks[i]),
+            "student_id": int(student_ids[i]),
+            "name": names.get(int(student_ids[i])),
+            "average": _round(means[i]),
+            "subjects": int(counts[i]),
+        }
+        for i in top
+    ]
+
+
+def per_subject(cols: dict[str, np.ndarray]) -> list[dict]:
+    subject_ids, means, counts = group_means(cols["subject_id"], cols["nilai_akhir"])
+    if not subject_ids.size:
+        return []
+    names = {s.id: s.name for s in reference.subjects()}
+    order = np.argsort(-means, kind="stable")
+    return [
+        {"subject_id": int(subject_ids[i]), "name": names.get(int(subject_ids[i])), "average": _round(means[i]), "count": int(counts[i])}
+        for i in order
+    ]
+
+
+def analyze(term_id: int, subject_id: int | None = None, classroom_id: int | None = None, limit: int = 20) -> dict:
+    cols = load_columns(term_id, subject_id, classroom_id)
+    return {
+        "scope": {"term_id": term_id, "subject_id": subject_id, "classroom_id": classroom_id},
+        "final": summarize(cols["nilai_akhir"]),
+        "components": {c: summarize(cols[c]) for c in COMPONENTS[:3]},
+        "distribution": distribution(cols["nilai_akhir"]),
+        "correlations": correlations(cols),
+        "rankings": rankings(cols, limit),
+        "subjects": [] if subject_id else per_subject(cols),
+    }
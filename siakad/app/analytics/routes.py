@@ -0,0 +1,66 @@
+from flask import Blueprint, render_template, request, jsonify, abort
+from flask_login import login_required, current_user
+
+from ..extensions import cache
+from .. import reference
+from ..terms.scope import current_term, term_required
+from ..utils.cache import cache_key
+from ..utils.decorators import role_required
+from ..utils.routing import replica_reads
+from .engine import analyze
+
+bp = Blueprint("analytics", __name__, url_prefix="/analytics")
+
+ANALYTICS_TAGS = ("students", "subjects", "enrollments", "grades")
+
+
+def _scope():
+    # Teachers only see their own subjects; school/classroom-wide views are admin-only
+    subject_id = request.args.get("subject_id", type=int)
+    classroom_id = request.args.get("classroom_id", type=int)
+    subjects = reference.subjects()
+    role = getattr(getattr(current_user, "role", None), "value", current_user.role)
+    if role == "teacher":
+        subjects = [s for s in subjects if s.teacher_id == current_user.teacher_id]
+        if subject_id is None and subjects:
+            subject_id = subjects[0].id
+        if subject_id not in {s.id for s in subjects}:
+            abort(403)
+    return subject_id, classroom_id, subjects
+
+
+def _cached_analysis(term_id, subject_id, classroom_id):
+    return cache.get_or_set(
+        cache_key("analytics", term_id, subject_id, classroom_id),
+        ANALYTICS_TAGS,
+        lambda: analyze(term_id, subject_id, classroom_id),
+    )
+
+
+@bp.route("/")
+@login_required
+@role_required("admin", "teacher")
+@term_required
+@replica_reads()
+def index():
+    subject_id, classroom_id, subjects = _scope()
+    term = current_term()
+    return render_template(
+        "analytics/index.html",
+        subjects=subjects,
+        classes=reference.classrooms(),
+        term=term,
+        subject_id=subject_id,
+        classroom_id=classroom_id,
+        result=_cached_analysis(term.id, subject_id, classroom_id),
+    )
+
+
+@bp.route("/data")
+@login_required
+@role_required("admin", "teacher")
+@term_required
+@replica_reads()
+def data():
+    subject_id, classroom_id, _ = _scope()
+    return jsonify(_cached_analysis(current_term().id, subject_id, classroom_id))
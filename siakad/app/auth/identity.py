@@ -0,0 +1,67 @@
+from typing import NamedTuple
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from ..extensions import db, cache
+from ..models import User, RoleEnum
+from ..utils.cache import touch
+
+IDENTITY_TTL = 60
+
+
+class Identity(NamedTuple):
+    # Flask-Login user object for every request after login; no lazy relationships to trip over
+    id: int
+    username: str
+    role: RoleEnum
+    teacher_id: int | None
+    student_id: int | None
+    is_active: bool
+
+    @property
+    def is_authenticated(self) -> bool:
+        return True
+
+    @property
+    def is_anonymous(self) -> bool:
+        return False
+
+    def get_id(self) -> str:
+        return str(self.id)
+
+
+def _fetch(user_id: int) -> Identity | None:
+    row = db.session.execute(
+        select(User.id, User.username, User.role, User.teacher_id, User.student_id, User.is_active).where(
+            User.id == user_id
+        )
+    ).one_or_none()
+    return Identity._make(row) if row else None
+
+
+def identity_tag(user_id: int) -> str:
+    # One tag per account, so writes to other users, teachers or students keep this entry
+    return f"user:{user_id}"
+
+
+def touch_linked(column, ids) -> None:
+    # Accounts whose teacher_id/student_id the database is about to unlink (FK SET NULL), which
+    # no flush hook sees; call before deleting the teachers/students in ids
+    linked = db.session.scalars(select(User.id).where(column.in_(ids))).all()
+    touch(db.session, *map(identity_tag, linked))
+
+
+@event.listens_for(Session, "after_flush")
+def _tag_flushed_users(session, flush_context):
+    ids = [obj.id for obj in (*session.new, *session.dirty, *session.deleted) if isinstance(obj, User)]
+    if ids:
+        touch(session, *map(identity_tag, ids))
+
+
+def load_identity(user_id: int) -> Identity | None:
+    identity = cache.get_or_set(f"identity:{user_id}", (identity_tag(user_id),), lambda: _fetch(user_id), ttl=IDENTITY_TTL)
+    # Deactivated accounts lose their session on the next request
+    if identity is None or not identity.is_active:
+        return None
+    return identity
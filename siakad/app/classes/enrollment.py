@@ -0,0 +1,136 @@
+from sqlalchemy import select, insert, delete, exists, func, literal, true
+
+from ..dashboard.stats import apply_grade_delta
+from ..extensions import db
+from ..grades.audit import record_from_select, ENROLLMENT_FIELDS, GRADE_FIELDS
+from ..models import Student, Subject, Enrollment, Grade
+from ..utils.cache import touch
+
+# Set-based (un)enrollment of whole classrooms into one term: a fixed handful of statements
+# whatever the class or school size. Mapper events don't fire, so audit rows and subject_stats are kept
+# in step here. The caller commits.
+
+
+def _students(classroom_id: int | None):
+    # classroom_id=None means every student assigned to a classroom
+    return select(Student.id).where(Student.classroom_id == classroom_id if classroom_id else Student.classroom_id.is_not(None))
+
+
+def enroll(classroom_id: int | None, subject_ids: list[int], term_id: int) -> int:
+    # One INSERT ... SELECT over students x subjects; pairs already enrolled that term
+    # (uq_enrollment_term_student_subject) are skipped by the NOT EXISTS, not by a failed insert.
+    if not subject_ids:
+        return 0
+    students = _students(classroom_id).subquery()
+    pairs = (
+        select(literal(term_id), students.c.id, Subject.id)
+        .join(Subject, true())
+        .where(Subject.id.in_(subject_ids))
+        .where(
+            ~exists().where(
+                Enrollment.term_id == term_id, Enrollment.student_id == students.c.id, Enrollment.subject_id == Subject.id
+            )
+        )
+    )
+    last_id = db.session.scalar(select(func.coalesce(func.max(Enrollment.id), 0)))
+    inserted = db.session.execute(insert(Enrollment).from_select(["term_id", "student_id", "subject_id"], pairs)).rowcount
+    if inserted:
+        # New rows are those above the previous maximum id within the same scope
+        record_from_select(
+            "enrollment",
+            "insert",
+            select(
+                Enrollment.id.label("record_id"),
+                Enrollment.id.label("enrollment_id"),
+                Enrollment.student_id,
+                Enrollment.subject_id,
+            ).where(
+                Enrollment.id > last_id,
+                Enrollment.term_id == term_id,
+                Enrollment.subject_id.in_(subject_ids),
+                Enrollment.student_id.in_(_students(classroom_id)),
+            ),
+            ENROLLMENT_FIELDS,
+        )
+    return inserted
+
+
+def unenroll(classroom_id: int | None, subject_ids: list[int], term_id: int, with_grades: bool = False) -> tuple[int, int]:
+    # Returns (enrollments removed, graded enrollments kept). Graded enrollments are only
+    # removed, together with their grades, when with_grades is set.
+    if not subject_ids:
+        return 0, 0
+    # Criteria on enrollments itself rather than an IN over enrollments: MySQL rejects a
+    # DELETE whose subquery reads the table being deleted from
+    scope = (
+        Enrollment.term_id == term_id,
+        Enrollment.subject_id.in_(subject_ids),
+        Enrollment.student_id.in_(_students(classroom_id)),
+    )
+    graded = exists().where(Grade.enrollment_id == Enrollment.id)
+    kept = 0
+    if with_grades:
+        forget_grades(*scope)
+    else:
+        kept = db.session.scalar(select(func.count()).select_from(Enrollment).where(*scope, graded))
+        scope = (*scope, ~graded)
+    forget_enrollments(*scope)
+    # Grades of removed enrollments go by ON DELETE CASCADE
+    removed = db.session.execute(delete(Enrollment).where(*scope).execution_options(synchronize_session=False)).rowcount
+    return removed, kept
+
+
+def forget_grades(*scope) -> None:
+    # subject_stats deltas and audit rows for the grades of enrollments matching scope, which are
+    # about to be deleted by ON DELETE CASCADE, unseen by mapper events
+    for term_id, subject_id, count, total in db.session.execute(
+        select(
+            Enrollment.term_id, Enrollment.subject_id, func.count(Grade.nilai_akhir), func.coalesce(func.sum(Grade.nilai_akhir), 0)
+        )
+        .join(Grade, Grade.enrollment_id == Enrollment.id)
+        .where(*scope)
+        .group_by(Enrollment.term_id, Enrollment.subject_id)
+    ):
+        apply_grade_delta(db.session.connection(), term_id, subject_id, -count, -total)
+    record_from_select(
+        "grade",
+        "delete",
+        select(
+            Grade.id.label("record_id"),
+            Grade.enrollment_id,
+            Enrollment.student_id,
+            Enrollment.subject_id,
+            *(getattr(Grade, f) for f in GRADE_FIELDS),
+        )
+        .join(Enrollment, Enrollment.id == Grade.enrollment_id)
+        .where(*scope),
+        GRADE_FIELDS,
+    )
+    touch(db.session, "grades")
+
+
+def forget_enrollments(*scope) -> None:
+    # Audit rows for enrollments matching scope that are about to be deleted
+    record_from_select(
+        "enrollment",
+        "delete",
+        select(
+            Enrollment.id.label("record_id"),
+            Enrollment.id.label("enrollment_id"),
+            Enrollment.student_id,
+            Enrollment.subject_id,
+        ).where(*scope),
+        ENROLLMENT_FIELDS,
+    )
+    touch(db.session, "enrollments")
+
+
+def enrollment_counts(classroom_id: int | None, term_id: int) -> dict[int, int]:
+    # subject_id -> enrolled students of the classroom (or of all classrooms) that term
+    return dict(
+        db.session.execute(
+            select(Enrollment.subject_id, func.count())
+            .where(Enrollment.term_id == term_id, Enrollment.student_id.in_(_students(classroom_id)))
+            .group_by(Enrollment.subject_id)
+        ).all()
+    )
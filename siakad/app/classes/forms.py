@@ -1,8 +1,26 @@
 from flask_wtf import FlaskForm
-from wtforms import StringField, SubmitField
-from wtforms.validators import DataRequired, Length
+from wtforms import StringField, SubmitField, SelectField, SelectMultipleField, BooleanField
+from wtforms.validators import DataRequired, InputRequired, Length, Optional, Regexp
 
 
 class ClassroomForm(FlaskForm):
     name = StringField("Nama Kelas", validators=[DataRequired(), Length(max=64)])
     submit = SubmitField("Simpan")
+
+
+class EnrollmentForm(FlaskForm):
+    classroom_id = SelectField("Kelas", choices=[], coerce=int)
+    subject_ids = SelectMultipleField("Mata Pelajaran", choices=[], coerce=int)
+    all_subjects = BooleanField("Semua mata pelajaran")
+    with_grades = BooleanField("Batalkan juga pendaftaran yang sudah bernilai (nilainya ikut terhapus)")
+    enroll = SubmitField("Daftarkan")
+    unenroll = SubmitField("Batalkan Pendaftaran")
+
+
+class RolloverForm(FlaskForm):
+    # Per-classroom targets are plain target_<id> selects read from request.form
+    academic_year = StringField(
+        "Tahun ajaran yang diarsipkan",
+        validators=[InputRequired(message="Isi tahun ajaran yang ditutup."), Regexp(r"^\d{4}/\d{4}$", message="Format tahun ajaran: 2024/2025")],
+    )
+    submit = SubmitField("Jalankan Kenaikan Kelas")
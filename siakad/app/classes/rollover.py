@@ -0,0 +1,144 @@
+import re
+from datetime import datetime
+
+from sqlalchemy import select, insert, update, delete, case, literal, null, func, Integer, DateTime
+from sqlalchemy.exc import IntegrityError
+
+from ..extensions import db
+from ..grades.audit import actor_id
+from ..jobs.runner import task
+from ..models import Student, Subject, Classroom, AcademicTerm, Enrollment, Grade, GradeArchive, Rollover
+from .enrollment import forget_grades, forget_enrollments
+
+ACADEMIC_YEAR = re.compile(r"^\d{4}/\d{4}$")
+# Mapping target meaning "leaves the school" (classroom_id becomes NULL)
+GRADUATE = "lulus"
+
+
+def archive_enrollments(*criteria) -> int:
+    # One INSERT ... SELECT copying enrollments matching criteria (with their grade, if any) into
+    # grade_archive, labelled with each enrollment's term and the student's current classroom
+    columns = [
+        "academic_year", "semester", "enrollment_id", "student_id", "subject_id", "subject_code", "subject_name", "sks",
+        "classroom_name", "tugas", "uts", "uas", "nilai_akhir", "archived_at",
+    ]
+    rows = (
+        select(
+            AcademicTerm.academic_year,
+            AcademicTerm.semester,
+            Enrollment.id,
+            Enrollment.student_id,
+            Enrollment.subject_id,
+            Subject.code,
+            Subject.name,
+            Subject.sks,
+            Classroom.name,
+            Grade.tugas,
+            Grade.uts,
+            Grade.uas,
+            Grade.nilai_akhir,
+            literal(datetime.utcnow(), DateTime),
+        )
+        .join(AcademicTerm, AcademicTerm.id == Enrollment.term_id)
+        .join(Subject, Subject.id == Enrollment.subject_id)
+        .join(Student, Student.id == Enrollment.student_id)
+        .outerjoin(Classroom, Classroom.id == Student.classroom_id)
+        .outerjoin(Grade, Grade.enrollment_id == Enrollment.id)
+        .where(*criteria)
+    )
+    return db.session.execute(insert(GradeArchive).from_select(columns, rows)).rowcount
+
+
+def archive_current(academic_year: str) -> int:
+    # Moves every enrollment of the year's terms (with its grade, if any) into grade_archive. A fixed
+    # handful of statements whatever the school size; other terms are untouched and the terms
+    # themselves stay as labels. Bulk deletes skip mapper events: forget_grades/forget_enrollments
+    # write the audit rows and subject_stats deltas, as for any other set-based removal.
+    year_terms = select(AcademicTerm.id).where(AcademicTerm.academic_year == academic_year)
+    scope = (Enrollment.term_id.in_(year_terms),)
+    archived = archive_enrollments(*scope)
+    forget_grades(*scope)
+    forget_enrollments(*scope)
+    db.session.execute(
+        delete(Grade)
+        .where(Grade.enrollment_id.in_(select(Enrollment.id).where(*scope)))
+        .execution_options(synchronize_session=False)
+    )
+    db.session.execute(delete(Enrollment).where(*scope).execution_options(synchronize_session=False))
+    return archived
+
+
+def promote(mapping: dict[int, int | None]) -> int:
+    # One UPDATE with a CASE over the old classroom_id, so chains and swaps
+    # (X-A -> XI-A while XI-A -> XII-A) resolve against the pre-rollover classes.
+    # mapping: source classroom id -> target classroom id, or None to graduate.
+    moves = {src: dst for src, dst in mapping.items() if src != dst}
+    if not moves:
+        return 0
+    target = case(
+        *((Student.classroom_id == src, literal(dst, Integer) if dst is not None else null()) for src, dst in moves.items())
+    )
+    return db.session.execute(
+        update(Student)
+        .where(Student.classroom_id.in_(list(moves)))
+        .values(classroom_id=target)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+
+def already_rolled_over(academic_year: str) -> bool:
+    return db.session.scalar(select(Rollover.id).where(Rollover.academic_year == academic_year)) is not None
+
+
+def rollover(mapping: dict[int, int | None], academic_year: str) -> dict:
+    # Runs at most once per academic year. The rollovers row is inserted first: a second run of the
+    # same year (double submit, another admin, a requeued job) blocks on its unique key until this
+    # transaction ends, then fails instead of promoting everyone again. Archive before promoting, so
+    # the snapshot records the classes students were in during that year. The caller commits:
+    # everything, the record included, lands in one transaction. Raises ValueError if already done.
+    done = f"Kenaikan kelas tahun ajaran {academic_year} sudah pernah dijalankan."
+    if already_rolled_over(academic_year):
+        raise ValueError(done)
+    record = Rollover(academic_year=academic_year, user_id=actor_id())
+    db.session.add(record)
+    try:
+        db.session.flush()
+    except IntegrityError:
+        db.session.rollback()
+        raise ValueError(done) from None
+    record.archived = archive_current(academic_year)
+    record.moved = promote(mapping)
+    return {"archived": record.archived, "moved": record.moved}
+
+
+def parse_mapping(items, classroom_ids) -> dict[int, int | None]:
+    # ("source", "target") pairs from the form or CLI; target "lulus" graduates, empty keeps.
+    # Both ends must be among classroom_ids; raises ValueError otherwise.
+    mapping = {}
+    for src, dst in items:
+        if dst in (None, ""):
+            continue
+        try:
+            src_id, dst_id = int(src), None if dst == GRADUATE else int(dst)
+        except (TypeError, ValueError):
+            raise ValueError(f"Pemetaan kelas '{src}={dst}' tidak valid.") from None
+        if src_id not in classroom_ids or (dst_id is not None and dst_id not in classroom_ids):
+            raise ValueError(f"Kelas pada pemetaan '{src}={dst}' tidak ditemukan.")
+        mapping[src_id] = dst_id
+    return mapping
+
+
+def class_sizes() -> dict[int, int]:
+    return dict(
+        db.session.execute(
+            select(Student.classroom_id, func.count()).where(Student.classroom_id.is_not(None)).group_by(Student.classroom_id)
+        ).all()
+    )
+
+
+@task("rollover")
+def rollover_job(ctx, mapping: dict, academic_year: str):
+    # JSON turns the mapping's keys into strings; the job's single commit makes it atomic.
+    # Queued with max_attempts=1, and a rerun would fail on the rollovers record anyway.
+    ctx.progress(0, 1, "Memindahkan siswa dan mengarsipkan nilai", force=True)
+    return rollover({int(k): v for k, v in mapping.items()}, academic_year)
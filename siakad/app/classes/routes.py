@@ -1,11 +1,18 @@
+import click
 from flask import Blueprint, render_template, redirect, url_for, request, flash
-from flask_login import login_required
+from flask_login import login_required, current_user
 from sqlalchemy import select
 
 from ..extensions import db
-from ..models import Classroom
+from ..jobs.runner import enqueue
+from ..models import Classroom, Rollover
+from .. import reference
+from ..removal import delete_classrooms
+from ..terms.scope import current_term, term_required
 from ..utils.decorators import role_required
-from .forms import ClassroomForm
+from .enrollment import enroll, unenroll, enrollment_counts
+from .forms import ClassroomForm, EnrollmentForm, RolloverForm
+from .rollover import ACADEMIC_YEAR, GRADUATE, rollover, parse_mapping, class_sizes, already_rolled_over
 
 bp = Blueprint("classes", __name__, url_prefix="/classes")
 
@@ -14,8 +21,7 @@ bp = Blueprint("classes", __name__, url_prefix="/classes")
 @login_required
 @role_required("admin")
 def index():
-    classes = db.session.execute(select(Classroom).order_by(Classroom.name)).scalars().all()
-    return render_template("classes/index.html", classes=classes)
+    return render_template("classes/index.html", classes=reference.classrooms())
 
 
 @bp.route("/create", methods=["GET", "POST"])
@@ -58,11 +64,130 @@ def edit(class_id):
 @login_required
 @role_required("admin")
 def delete(class_id):
-    c = db.session.get(Classroom, class_id)
-    if not c:
+    if not delete_classrooms([class_id]):
         flash("Kelas tidak ditemukan.", "warning")
     else:
-        db.session.delete(c)
         db.session.commit()
         flash("Kelas dihapus.", "info")
     return redirect(url_for("classes.index"))
+
+
+@bp.route("/bulk-delete", methods=["POST"])
+@login_required
+@role_required("admin")
+def bulk_delete():
+    ids = request.form.getlist("ids", type=int)
+    if not ids:
+        flash("Tidak ada data yang dipilih.", "warning")
+        return redirect(url_for("classes.index"))
+    deleted = delete_classrooms(ids)
+    db.session.commit()
+    flash(f"{deleted} kelas dihapus.", "info")
+    return redirect(url_for("classes.index"))
+
+
+@bp.route("/enrollment", methods=["GET", "POST"])
+@login_required
+@role_required("admin")
+@term_required
+def enrollment():
+    # Enroll (or unenroll) a whole classroom, or every classroom, into subjects of one term in one statement
+    term = current_term()
+    form = EnrollmentForm()
+    form.classroom_id.choices = [(0, "Semua kelas")] + reference.classroom_choices()
+    form.subject_ids.choices = reference.subject_choices()
+    if request.method == "GET":
+        form.classroom_id.data = request.args.get("classroom_id", 0, type=int)
+    if form.validate_on_submit():
+        classroom_id = form.classroom_id.data or None
+        subject_ids = [s.id for s in reference.subjects()] if form.all_subjects.data else form.subject_ids.data
+        if not subject_ids:
+            flash("Pilih minimal satu mata pelajaran.", "warning")
+        elif form.unenroll.data:
+            removed, kept = unenroll(classroom_id, subject_ids, term.id, with_grades=form.with_grades.data)
+            db.session.commit()
+            flash(f"{removed} pendaftaran dibatalkan.", "info")
+            if kept:
+                flash(f"{kept} pendaftaran yang sudah bernilai tidak diubah.", "warning")
+        else:
+            added = enroll(classroom_id, subject_ids, term.id)
+            db.session.commit()
+            flash(f"{added} pendaftaran baru dibuat (yang sudah terdaftar dilewati).", "success")
+        return redirect(url_for("classes.enrollment", classroom_id=form.classroom_id.data, term_id=term.id))
+
+    counts = enrollment_counts(form.classroom_id.data or None, term.id)
+    return render_template("classes/enrollment.html", form=form, subjects=reference.subjects(), counts=counts, term=term)
+
+
+@bp.cli.command("enroll")
+@click.option("--classroom-id", type=int, help="Hanya kelas ini (default: semua kelas).")
+@click.option("--subject-id", type=int, multiple=True, help="Mata pelajaran (boleh diulang; default: semua).")
+@click.option("--term-id", type=int, help="Semester (default: semester aktif).")
+@click.option("--unenroll", "remove", is_flag=True, help="Batalkan pendaftaran alih-alih mendaftarkan.")
+@click.option("--with-grades", is_flag=True, help="Bersama --unenroll: hapus juga pendaftaran yang sudah bernilai.")
+def enroll_command(classroom_id, subject_id, term_id, remove, with_grades):
+    term = reference.term(term_id) if term_id else reference.active_term()
+    if term is None:
+        raise click.ClickException("Semester tidak ditemukan; buat dulu dengan `flask terms create`.")
+    subject_ids = list(subject_id) or [s.id for s in reference.subjects()]
+    if remove:
+        removed, kept = unenroll(classroom_id, subject_ids, term.id, with_grades=with_grades)
+        db.session.commit()
+        print(f"{removed} pendaftaran dibatalkan, {kept} yang sudah bernilai dilewati.")
+    else:
+        added = enroll(classroom_id, subject_ids, term.id)
+        db.session.commit()
+        print(f"{added} pendaftaran baru dibuat untuk semester {term.name}.")
+
+
+@bp.route("/rollover", methods=["GET", "POST"])
+@login_required
+@role_required("admin")
+def rollover_view():
+    # Year-end: move whole classes (or graduate them) and archive the year's enrollments/grades
+    form = RolloverForm()
+    classes = reference.classrooms()
+    if request.method == "GET" and reference.active_term():
+        form.academic_year.data = reference.active_term().academic_year
+    if form.validate_on_submit():
+        try:
+            mapping = parse_mapping(((c.id, request.form.get(f"target_{c.id}")) for c in classes), {c.id for c in classes})
+        except ValueError as exc:
+            flash(str(exc), "danger")
+            return redirect(url_for("classes.rollover_view"))
+        year = form.academic_year.data
+        if already_rolled_over(year):
+            flash(f"Kenaikan kelas tahun ajaran {year} sudah pernah dijalankan.", "warning")
+            return redirect(url_for("classes.rollover_view"))
+        # Never retried: a rerun after a commit the job runner didn't record would promote twice
+        job = enqueue("rollover", {"mapping": mapping, "academic_year": year}, user_id=current_user.id, max_attempts=1)
+        flash(f"Kenaikan kelas dijadwalkan sebagai job #{job.id}.", "success")
+        return redirect(url_for("jobs.index"))
+    history = db.session.execute(select(Rollover).order_by(Rollover.academic_year.desc())).scalars().all()
+    return render_template(
+        "classes/rollover.html", form=form, classes=classes, sizes=class_sizes(), graduate=GRADUATE, history=history
+    )
+
+
+@bp.cli.command("rollover")
+@click.option("--year", required=True, help="Tahun ajaran yang ditutup dan diarsipkan, mis. 2024/2025 (sekali per tahun).")
+@click.option("--map", "moves", multiple=True, help="ASAL=TUJUAN (id kelas; TUJUAN 'lulus' untuk kelulusan). Boleh diulang.")
+def rollover_command(year, moves):
+    if not ACADEMIC_YEAR.match(year):
+        raise click.ClickException("Format tahun ajaran: 2024/2025")
+    pairs = []
+    for m in moves:
+        src, sep, dst = m.partition("=")
+        if not sep:
+            raise click.BadParameter(f"'{m}' bukan ASAL=TUJUAN", param_hint="--map")
+        pairs.append((src.strip(), dst.strip()))
+    try:
+        mapping = parse_mapping(pairs, {c.id for c in reference.classrooms()})
+    except ValueError as exc:
+        raise click.BadParameter(str(exc), param_hint="--map")
+    try:
+        result = rollover(mapping, year)
+    except ValueError as exc:
+        raise click.ClickException(str(exc))
+    db.session.commit()
+    print(f"{result['moved']} siswa dipindahkan, {result['archived']} pendaftaran diarsipkan.")
@@ -1,36 +1,62 @@
-from flask import Blueprint, render_template
+from flask import Blueprint, render_template, jsonify
 from flask_login import login_required
-from sqlalchemy import func
 
-from ..extensions import db
-from ..models import Student, Teacher, Subject, Grade, Enrollment
+from ..extensions import cache, sql_stats
+from ..jobs.runner import task
+from ..terms.scope import current_term
+from ..utils.cache import cache_key
+from ..utils.decorators import role_required
+from ..utils.routing import replica_reads
+from .stats import dashboard_snapshot, rebuild_stats
 
 bp = Blueprint("dashboard", __name__)
 
+DASHBOARD_TAGS = ("students", "teachers", "subjects", "grades", "enrollments", "subject_stats", "stat_counters")
+
 
 @bp.route("/")
 @login_required
+@replica_reads()
 def index():
-    total_students = db.session.scalar(db.select(func.count(Student.id)))
-    total_teachers = db.session.scalar(db.select(func.count(Teacher.id)))
-    total_subjects = db.session.scalar(db.select(func.count(Subject.id)))
-
-    averages = db.session.execute(
-        db.select(Subject.name, func.avg(Grade.nilai_akhir))
-        .join(Enrollment, Enrollment.subject_id == Subject.id, isouter=True)
-        .join(Grade, Grade.enrollment_id == Enrollment.id, isouter=True)
-        .group_by(Subject.id, Subject.name)
-        .order_by(Subject.name)
-    ).all()
+    # Averages of one term (active by default); nothing to chart before the first term exists
+    term = current_term()
+    term_id = term.id if term else None
+    counts, averages = cache.get_or_set(cache_key("dashboard", term_id), DASHBOARD_TAGS, lambda: dashboard_snapshot(term_id))
 
-    labels = [row[0] for row in averages]
-    data = [float(row[1]) if row[1] is not None else 0.0 for row in averages]
+    labels = [name for name, _ in averages]
+    data = [avg if avg is not None else 0.0 for _, avg in averages]
 
     return render_template(
         "dashboard/index.html",
-        total_students=total_students,
-        total_teachers=total_teachers,
-        total_subjects=total_subjects,
+        total_students=counts["students"],
+        total_teachers=counts["teachers"],
+        total_subjects=counts["subjects"],
+        term=term,
         chart_labels=labels,
         chart_data=data,
     )
+
+
+@bp.route("/cache-stats")
+@login_required
+@role_required("admin")
+def cache_stats():
+    return jsonify(cache.stats())
+
+
+@bp.route("/sql-stats")
+@login_required
+@role_required("admin")
+def sql_stats_view():
+    return jsonify(sql_stats.snapshot())
+
+
+@bp.cli.command("rebuild-stats")
+def rebuild_stats_command():
+    rebuild_stats()
+    print("Statistik dashboard dibangun ulang.")
+
+
+@task("rebuild_stats")
+def rebuild_stats_job(ctx):
+    rebuild_stats()
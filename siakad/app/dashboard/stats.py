@@ -0,0 +1,167 @@
+from sqlalchemy import select, insert, update, delete, func, event, inspect, literal, true
+
+from ..extensions import db
+from ..models import Student, Teacher, Subject, AcademicTerm, Enrollment, Grade, SubjectStat, StatCounter
+
+COUNTED = {"students": Student, "teachers": Teacher, "subjects": Subject}
+
+
+def _subject_aggregate(term_id: int, subject_id: int):
+    return (
+        select(func.count(Grade.nilai_akhir), func.coalesce(func.sum(Grade.nilai_akhir), 0))
+        .join(Enrollment, Enrollment.id == Grade.enrollment_id)
+        .where(Enrollment.term_id == term_id, Enrollment.subject_id == subject_id)
+    )
+
+
+def refresh_subject(connection, subject_id: int, term_id: int | None = None) -> None:
+    # Exact recount of one subject in one term (or in every term); cheap thanks to ix_enrollments_term_subject
+    term_ids = [term_id] if term_id else connection.execute(
+        select(SubjectStat.term_id).where(SubjectStat.subject_id == subject_id)
+    ).scalars().all()
+    for tid in term_ids:
+        count, total = connection.execute(_subject_aggregate(tid, subject_id)).one()
+        connection.execute(
+            update(SubjectStat)
+            .where(SubjectStat.term_id == tid, SubjectStat.subject_id == subject_id)
+            .values(grade_count=count, grade_sum=total)
+        )
+
+
+# Missing rows are left alone: dashboard_snapshot() computes them live until rebuild_stats() runs
+def apply_grade_delta(connection, term_id: int, subject_id: int, count: int, total: float) -> None:
+    if not count and not total:
+        return
+    connection.execute(
+        update(SubjectStat)
+        .where(SubjectStat.term_id == term_id, SubjectStat.subject_id == subject_id)
+        .values(grade_count=SubjectStat.grade_count + count, grade_sum=SubjectStat.grade_sum + total)
+    )
+
+
+def grade_delta(old: float | None, new: float | None) -> tuple[int, float]:
+    return (new is not None) - (old is not None), (new or 0) - (old or 0)
+
+
+def bump_counter(connection, name: str, delta: int) -> None:
+    connection.execute(update(StatCounter).where(StatCounter.name == name).values(value=StatCounter.value + delta))
+
+
+def create_stat_rows(connection, term_id: int | None = None, subject_id: int | None = None) -> None:
+    # Zeroed rows for a new term (every subject) or a new subject (every term)
+    pairs = select(AcademicTerm.id, Subject.id, literal(0), literal(0)).select_from(AcademicTerm).join(Subject, true())
+    if term_id is not None:
+        pairs = pairs.where(AcademicTerm.id == term_id)
+    if subject_id is not None:
+        pairs = pairs.where(Subject.id == subject_id)
+    connection.execute(
+        insert(SubjectStat).from_select(["term_id", "subject_id", "grade_count", "grade_sum"], pairs)
+    )
+
+
+def rebuild_stats() -> None:
+    db.session.execute(delete(SubjectStat))
+    db.session.execute(
+        insert(SubjectStat).from_select(
+            ["term_id", "subject_id", "grade_count", "grade_sum"],
+            select(AcademicTerm.id, Subject.id, func.count(Grade.nilai_akhir), func.coalesce(func.sum(Grade.nilai_akhir), 0))
+            .select_from(AcademicTerm)
+            .join(Subject, true())
+            .outerjoin(Enrollment, (Enrollment.term_id == AcademicTerm.id) & (Enrollment.subject_id == Subject.id))
+            .outerjoin(Grade, Grade.enrollment_id == Enrollment.id)
+            .group_by(AcademicTerm.id, Subject.id),
+        )
+    )
+    db.session.execute(delete(StatCounter))
+    db.session.execute(
+        insert(StatCounter),
+        [{"name": name, "value": db.session.scalar(select(func.count()).select_from(model))} for name, model in COUNTED.items()],
+    )
+    db.session.commit()
+
+
+def dashboard_snapshot(term_id: int | None):
+    # Entity counts are school-wide; subject averages are for one term
+    counts = dict(db.session.execute(select(StatCounter.name, StatCounter.value)).all())
+    for name, model in COUNTED.items():
+        if name not in counts:
+            counts[name] = db.session.scalar(select(func.count()).select_from(model))
+    averages = []
+    if term_id is None:
+        return counts, averages
+    rows = db.session.execute(
+        select(Subject.id, Subject.name, SubjectStat.grade_count, SubjectStat.grade_sum)
+        .outerjoin(SubjectStat, (SubjectStat.subject_id == Subject.id) & (SubjectStat.term_id == term_id))
+        .order_by(Subject.name)
+    ).all()
+    # Subjects without a stats row yet (new term or subject) are counted live, all in one grouped query
+    missing = [subject_id for subject_id, _, count, _ in rows if count is None]
+    live = {}
+    if missing:
+        live = {
+            subject_id: (count, total)
+            for subject_id, count, total in db.session.execute(
+                select(Enrollment.subject_id, func.count(Grade.nilai_akhir), func.coalesce(func.sum(Grade.nilai_akhir), 0))
+                .join(Enrollment, Enrollment.id == Grade.enrollment_id)
+                .where(Enrollment.term_id == term_id, Enrollment.subject_id.in_(missing))
+                .group_by(Enrollment.subject_id)
+            )
+        }
+    for subject_id, name, count, total in rows:
+        if count is None:
+            count, total = live.get(subject_id, (0, 0))
+        averages.append((name, round(total / count, 2) if count else None))
+    return counts, averages
+
+
+def _scope_of(connection, enrollment_id: int):
+    return connection.execute(select(Enrollment.term_id, Enrollment.subject_id).where(Enrollment.id == enrollment_id)).one()
+
+
+@event.listens_for(Grade, "after_insert")
+def _grade_inserted(mapper, connection, target):
+    if target.nilai_akhir is not None:
+        apply_grade_delta(connection, *_scope_of(connection, target.enrollment_id), 1, target.nilai_akhir)
+
+
+@event.listens_for(Grade, "after_update")
+def _grade_updated(mapper, connection, target):
+    history = inspect(target).attrs.nilai_akhir.history
+    if not history.has_changes():
+        return
+    term_id, subject_id = _scope_of(connection, target.enrollment_id)
+    if history.deleted:
+        apply_grade_delta(connection, term_id, subject_id, *grade_delta(history.deleted[0], target.nilai_akhir))
+    else:
+        refresh_subject(connection, subject_id, term_id)
+
+
+@event.listens_for(Grade, "after_delete")
+def _grade_deleted(mapper, connection, target):
+    if target.nilai_akhir is not None:
+        apply_grade_delta(connection, *_scope_of(connection, target.enrollment_id), -1, -target.nilai_akhir)
+
+
+def _track(name, model):
+    @event.listens_for(model, "after_insert")
+    def _inserted(mapper, connection, target):
+        bump_counter(connection, name, 1)
+
+    @event.listens_for(model, "after_delete")
+    def _deleted(mapper, connection, target):
+        bump_counter(connection, name, -1)
+
+
+for _name, _model in COUNTED.items():
+    _track(_name, _model)
+
+
+# A deleted subject's rows go by ON DELETE CASCADE
+@event.listens_for(Subject, "after_insert")
+def _subject_created(mapper, connection, target):
+    create_stat_rows(connection, subject_id=target.id)
+
+
+@event.listens_for(AcademicTerm, "after_insert")
+def _term_created(mapper, connection, target):
+    create_stat_rows(connection, term_id=target.id)
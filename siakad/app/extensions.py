@@ -4,9 +4,19 @@ from flask_login import LoginManager
 from flask_bcrypt import Bcrypt
 from flask_wtf import CSRFProtect
 
+from .utils.audit import AuditWriter
+from .utils.cache import ResponseCache
+from .utils.instrumentation import SQLInstrumentation
+from .utils.refdata import ReferenceData
+from .utils.routing import RoutingSession
 
-db = SQLAlchemy()
+
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 migrate = Migrate()
 login_manager = LoginManager()
 bcrypt = Bcrypt()
 csrf = CSRFProtect()
+cache = ResponseCache()
+sql_stats = SQLInstrumentation()
+refdata = ReferenceData()
+audit = AuditWriter("grade_audit")
@@ -0,0 +1,161 @@
+from datetime import datetime
+
+from flask import g, has_request_context
+from flask_login import current_user
+from sqlalchemy import event, inspect, select, insert, func, literal, null, Integer, DateTime
+from sqlalchemy.orm import Session
+
+from ..extensions import db, audit
+from ..models import Enrollment, Grade, GradeAudit
+
+GRADE_FIELDS = ("tugas", "uts", "uas", "nilai_akhir")
+ENROLLMENT_FIELDS = ("student_id", "subject_id")
+
+
+def actor_id() -> int | None:
+    # The logged-in user for web requests; background jobs set g.actor_id to their requester
+    if has_request_context() and current_user.is_authenticated:
+        return current_user.id
+    return g.get("actor_id")
+
+
+def entry(entity: str, action: str, changes: dict, record_id=None, enrollment_id=None, student_id=None, subject_id=None, user_id=None) -> dict:
+    return {
+        "entity": entity,
+        "action": action,
+        "record_id": record_id,
+        "enrollment_id": enrollment_id,
+        "student_id": student_id,
+        "subject_id": subject_id,
+        "user_id": user_id,
+        "changes": changes,
+        "created_at": datetime.utcnow(),
+    }
+
+
+def diff(old: dict | None, new: dict | None, fields) -> dict:
+    # {"field": [old, new]} for fields that changed; inserts have old=None, deletes new=None
+    old, new = old or {}, new or {}
+    return {f: [old.get(f), new.get(f)] for f in fields if old.get(f) != new.get(f)}
+
+
+def _stage(entries: list[dict]):
+    # Held on the session until commit; a rollback discards them
+    if entries:
+        db.session.info.setdefault("audit_pending", []).extend(entries)
+
+
+def record_grade_rows(subject_id: int, rows: list[tuple]):
+    # For set-based writers, which bypass the session hooks below.
+    # rows: (grade_id, enrollment_id, student_id, old values or None, new values)
+    user = actor_id()
+    entries = []
+    for grade_id, enr_id, student_id, old, new in rows:
+        changes = diff(old, new, GRADE_FIELDS)
+        if changes:
+            action = "insert" if old is None else "update"
+            entries.append(entry("grade", action, changes, grade_id, enr_id, student_id, subject_id, user))
+    _stage(entries)
+
+
+def record_enrollments(action: str, pairs: list[tuple]):
+    # pairs: (enrollment_id, student_id, subject_id)
+    user = actor_id()
+    entries = []
+    for enr_id, student_id, subject_id in pairs:
+        values = {"student_id": student_id, "subject_id": subject_id}
+        changes = diff(None, values, ENROLLMENT_FIELDS) if action == "insert" else diff(values, None, ENROLLMENT_FIELDS)
+        entries.append(entry("enrollment", action, changes, enr_id, enr_id, student_id, subject_id, user))
+    _stage(entries)
+
+
+def record_from_select(entity: str, action: str, rows, fields):
+    # For bulk writers too large to queue row by row: one INSERT ... SELECT into grade_audit,
+    # in the writer's own transaction. rows selects enrollment_id, student_id, subject_id,
+    # record_id and then the audited fields, labelled by name; action is insert or delete.
+    rows = rows.subquery()
+    changes = func.json_object(
+        *(part for f in fields for part in (f, func.json_array(null(), rows.c[f]) if action == "insert" else func.json_array(rows.c[f], null())))
+    )
+    columns = ["entity", "action", "record_id", "enrollment_id", "student_id", "subject_id", "user_id", "changes", "created_at"]
+    return db.session.execute(
+        insert(GradeAudit).from_select(
+            columns,
+            select(
+                literal(entity),
+                literal(action),
+                rows.c.record_id,
+                rows.c.enrollment_id,
+                rows.c.student_id,
+                rows.c.subject_id,
+                literal(actor_id(), Integer),
+                changes,
+                literal(datetime.utcnow(), DateTime),
+            ),
+        )
+    ).rowcount
+
+
+def _history(state, fields) -> tuple[dict, dict]:
+    # Reads the instance dict only: deleted rows must not be refreshed from the database
+    old, new = {}, {}
+    for f in fields:
+        hist = state.attrs[f].history
+        new[f] = state.dict.get(f)
+        old[f] = hist.deleted[0] if hist.deleted else new[f]
+    return old, new
+
+
+# ORM flushes: capture old/new values while attribute history is still available
+@event.listens_for(Session, "after_flush")
+def _capture_flushed(session, flush_context):
+    pending = []
+    for action, objs in (("insert", session.new), ("update", session.dirty), ("delete", session.deleted)):
+        for obj in objs:
+            state = inspect(obj)
+            if isinstance(obj, Grade):
+                old, new = _history(state, GRADE_FIELDS)
+                if action == "insert":
+                    changes = diff(None, new, GRADE_FIELDS)
+                elif action == "delete":
+                    changes = diff(old, None, GRADE_FIELDS)
+                else:
+                    changes = diff(old, new, GRADE_FIELDS)
+                if changes:
+                    pending.append(("grade", action, changes, state.dict.get("id"), state.dict.get("enrollment_id")))
+            elif isinstance(obj, Enrollment) and action != "update":
+                old, new = _history(state, ENROLLMENT_FIELDS)
+                changes = diff(None, new, ENROLLMENT_FIELDS) if action == "insert" else diff(old, None, ENROLLMENT_FIELDS)
+                enr_id = state.dict.get("id")
+                pending.append(("enrollment", action, changes, enr_id, enr_id, old["student_id"], old["subject_id"]))
+    if not pending:
+        return
+
+    # Grades only carry enrollment_id; resolve student/subject with one query on the flush's connection
+    known = {p[4]: (p[5], p[6]) for p in pending if p[0] == "enrollment"}
+    missing = {p[4] for p in pending if p[0] == "grade" and p[4] not in known}
+    if missing:
+        known.update(
+            (enr_id, (st, su))
+            for enr_id, st, su in session.connection().execute(
+                select(Enrollment.id, Enrollment.student_id, Enrollment.subject_id).where(Enrollment.id.in_(missing))
+            )
+        )
+    user = actor_id()
+    session.info.setdefault("audit_pending", []).extend(
+        entry(entity, action, changes, record_id, enr_id, *known.get(enr_id, (None, None)), user)
+        for entity, action, changes, record_id, enr_id, *_ in pending
+    )
+
+
+# Entries are queued only once the change is committed
+@event.listens_for(Session, "after_commit")
+def _queue_committed(session):
+    entries = session.info.pop("audit_pending", None)
+    if entries:
+        audit.record(entries)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard(session):
+    session.info.pop("audit_pending", None)
@@ -1,17 +1,30 @@
 from flask_wtf import FlaskForm
-from wtforms import HiddenField, FloatField, SubmitField, SelectField
-from wtforms.validators import Optional, NumberRange, DataRequired
+from wtforms import Form, HiddenField, FloatField, SubmitField, SelectField, FieldList, FormField
+from wtforms.validators import Optional, NumberRange, DataRequired, InputRequired
 
 
-class GradeInputForm(FlaskForm):
+class GradeRowForm(Form):
+    # Plain Form: CSRF is handled once by the enclosing BulkGradeForm
     student_id = HiddenField("Student ID")
     tugas = FloatField("Tugas", validators=[Optional(), NumberRange(min=0, max=100)])
     uts = FloatField("UTS", validators=[Optional(), NumberRange(min=0, max=100)])
     uas = FloatField("UAS", validators=[Optional(), NumberRange(min=0, max=100)])
-    submit = SubmitField("Simpan")
+
+
+class BulkGradeForm(FlaskForm):
+    rows = FieldList(FormField(GradeRowForm))
+    submit = SubmitField("Simpan Semua")
 
 
 class ReportFilterForm(FlaskForm):
     subject_id = SelectField("Mata Pelajaran", choices=[], coerce=int, validators=[DataRequired()])
     classroom_id = SelectField("Kelas", choices=[], coerce=int, validators=[DataRequired()])
     submit = SubmitField("Tampilkan")
+
+
+class GradingPolicyForm(FlaskForm):
+    subject_id = SelectField("Berlaku untuk", choices=[], coerce=int)
+    tugas = FloatField("Bobot Tugas", validators=[InputRequired(), NumberRange(min=0, max=100)])
+    uts = FloatField("Bobot UTS", validators=[InputRequired(), NumberRange(min=0, max=100)])
+    uas = FloatField("Bobot UAS", validators=[InputRequired(), NumberRange(min=0, max=100)])
+    submit = SubmitField("Simpan Bobot")
@@ -0,0 +1,195 @@
+import hashlib
+from itertools import groupby
+from typing import NamedTuple
+
+from sqlalchemy import select, and_, case, func, literal, null, union_all
+
+from ..extensions import db
+from ..models import Student, Subject, Classroom, AcademicTerm, Enrollment, Grade, GradeArchive
+
+
+class GradeSheetRow(NamedTuple):
+    student_id: int
+    nis: str
+    name: str
+    enrollment_id: int | None
+    grade_id: int | None
+    tugas: float | None
+    uts: float | None
+    uas: float | None
+    nilai_akhir: float | None
+
+
+def grade_sheet_query(subject_id: int, classroom_id: int, term_id: int):
+    return (
+        select(
+            Student.id,
+            Student.nis,
+            Student.name,
+            Enrollment.id,
+            Grade.id,
+            Grade.tugas,
+            Grade.uts,
+            Grade.uas,
+            Grade.nilai_akhir,
+        )
+        .outerjoin(
+            Enrollment,
+            and_(Enrollment.term_id == term_id, Enrollment.student_id == Student.id, Enrollment.subject_id == subject_id),
+        )
+        .outerjoin(Grade, Grade.enrollment_id == Enrollment.id)
+        .where(Student.classroom_id == classroom_id)
+        .order_by(Student.name, Student.id)
+    )
+
+
+def grade_sheet(
+    subject_id: int, classroom_id: int, term_id: int, student_ids: list[int] | None = None, for_update: bool = False
+) -> list[GradeSheetRow]:
+    # One outer-joined statement for the whole class (or some of its students), hydrated as plain tuples.
+    # for_update makes it a locking read: the latest committed rows, held until the transaction ends.
+    stmt = grade_sheet_query(subject_id, classroom_id, term_id)
+    if student_ids is not None:
+        stmt = stmt.where(Student.id.in_(student_ids))
+    if for_update:
+        stmt = stmt.with_for_update()
+    result = db.session.execute(stmt)
+    return [GradeSheetRow._make(r) for r in result]
+
+
+def row_version(row: GradeSheetRow) -> str:
+    # Optimistic-concurrency token for one student's grade: changes whenever a component does
+    return hashlib.blake2s(repr((row.grade_id, row.tugas, row.uts, row.uas)).encode(), digest_size=8).hexdigest()
+
+
+class TranscriptItem(NamedTuple):
+    subject_id: int
+    code: str
+    name: str
+    sks: int
+    tugas: float | None
+    uts: float | None
+    uas: float | None
+    nilai_akhir: float | None
+
+
+class Transcript(NamedTuple):
+    student_id: int
+    items: tuple[TranscriptItem, ...]
+    total_sks: int
+    weighted_average: float | None
+
+
+def grade_matrix_query(term_id: int):
+    # One row per (student, subject enrolled that term), ordered so each student's rows are contiguous
+    return (
+        select(Student.id, Student.nis, Student.name, Classroom.name, Enrollment.subject_id, Grade.nilai_akhir)
+        .outerjoin(Classroom, Classroom.id == Student.classroom_id)
+        .outerjoin(Enrollment, and_(Enrollment.term_id == term_id, Enrollment.student_id == Student.id))
+        .outerjoin(Grade, Grade.enrollment_id == Enrollment.id)
+        .order_by(Student.name, Student.id)
+    )
+
+
+def build_transcript(student_id: int, items) -> Transcript:
+    # Same aggregates as transcript_for, computed in Python for batch loads
+    items = tuple(TranscriptItem._make(i) for i in items)
+    total_sks = sum(i.sks for i in items)
+    graded = [i for i in items if i.nilai_akhir is not None]
+    graded_sks = sum(i.sks for i in graded)
+    average = round(sum(i.nilai_akhir * i.sks for i in graded) / graded_sks, 2) if graded_sks else None
+    return Transcript(student_id, items, total_sks, average)
+
+
+def transcript_for(student_id: int, term_id: int) -> tuple[Transcript, tuple[tuple[str, str | None, str | None, Transcript], ...]]:
+    # The term's transcript plus (academic year, semester name, classroom that year, transcript) for
+    # each archived term, oldest first, from one UNION ALL over enrollments and grade_archive. Rows
+    # archived before terms existed have no semester and form one group per year.
+    current = (
+        select(
+            literal(0).label("archived"),
+            null().label("academic_year"),
+            null().label("semester"),
+            null().label("classroom_name"),
+            Subject.id.label("subject_id"),
+            Subject.code.label("code"),
+            Subject.name.label("name"),
+            Subject.sks.label("sks"),
+            Grade.tugas.label("tugas"),
+            Grade.uts.label("uts"),
+            Grade.uas.label("uas"),
+            Grade.nilai_akhir.label("nilai_akhir"),
+        )
+        .select_from(Enrollment)
+        .join(Subject, Subject.id == Enrollment.subject_id)
+        .outerjoin(Grade, Grade.enrollment_id == Enrollment.id)
+        .where(Enrollment.term_id == term_id, Enrollment.student_id == student_id)
+    )
+    archived = select(
+        literal(1),
+        GradeArchive.academic_year,
+        GradeArchive.semester,
+        GradeArchive.classroom_name,
+        GradeArchive.subject_id,
+        GradeArchive.subject_code,
+        GradeArchive.subject_name,
+        GradeArchive.sks,
+        GradeArchive.tugas,
+        GradeArchive.uts,
+        GradeArchive.uas,
+        GradeArchive.nilai_akhir,
+    ).where(GradeArchive.student_id == student_id)
+    rows = union_all(current, archived).subquery()
+    # sks-weighted aggregates per term come back on every row via window sums
+    per_term = {"partition_by": (rows.c.archived, rows.c.academic_year, rows.c.semester)}
+    graded_sks = case((rows.c.nilai_akhir.is_not(None), rows.c.sks), else_=0)
+    result = db.session.execute(
+        select(
+            rows,
+            func.sum(rows.c.sks).over(**per_term),
+            func.sum(rows.c.nilai_akhir * rows.c.sks).over(**per_term),
+            func.sum(graded_sks).over(**per_term),
+        ).order_by(rows.c.archived, rows.c.academic_year, rows.c.semester, rows.c.code)
+    ).all()
+    current = [r for r in result if not r.archived]
+    transcript = _windowed_transcript(student_id, current) if current else Transcript(student_id, (), 0, None)
+    terms = []
+    for (year, semester), group in groupby((r for r in result if r.archived), key=lambda r: r[1:3]):
+        group = list(group)
+        terms.append((year, AcademicTerm.SEMESTERS.get(semester), group[0][3], _windowed_transcript(student_id, group)))
+    return transcript, tuple(terms)
+
+
+def _windowed_transcript(student_id: int, rows) -> Transcript:
+    # rows: one term of transcript_for's result; the trailing window sums are the same on each
+    total_sks, weighted_sum, graded = rows[0][12:]
+    average = round(float(weighted_sum) / graded, 2) if graded else None
+    return Transcript(student_id, tuple(TranscriptItem._make(r[4:12]) for r in rows), int(total_sks), average)
+
+
+def classroom_transcripts(classroom_id: int | None, term_id: int) -> list[tuple[tuple[int, str, str], Transcript]]:
+    # Two statements per classroom (students, then every item of every student); None = no classroom
+    in_class = Student.classroom_id.is_(None) if classroom_id is None else Student.classroom_id == classroom_id
+    students = db.session.execute(
+        select(Student.id, Student.nis, Student.name).where(in_class).order_by(Student.name, Student.id)
+    ).all()
+    rows = db.session.execute(
+        select(
+            Enrollment.student_id,
+            Subject.id,
+            Subject.code,
+            Subject.name,
+            Subject.sks,
+            Grade.tugas,
+            Grade.uts,
+            Grade.uas,
+            Grade.nilai_akhir,
+        )
+        .join(Student, Student.id == Enrollment.student_id)
+        .join(Subject, Subject.id == Enrollment.subject_id)
+        .outerjoin(Grade, Grade.enrollment_id == Enrollment.id)
+        .where(Enrollment.term_id == term_id, in_class)
+        .order_by(Enrollment.student_id, Subject.code)
+    ).all()
+    items = {sid: [r[1:] for r in group] for sid, group in groupby(rows, key=lambda r: r[0])}
+    return [(s, build_transcript(s.id, items.get(s.id, ()))) for s in students]
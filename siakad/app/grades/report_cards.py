@@ -0,0 +1,114 @@
+import atexit
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from multiprocessing import get_context
+
+from flask import current_app
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from werkzeug.utils import secure_filename
+
+from ..jobs.runner import task
+from .. import reference
+from ..utils.export import iter_zip
+from ..utils.routing import replica_reads
+from .queries import classroom_transcripts
+
+TEMPLATE = "grades/report_card.html"
+# Report cards handed to a worker per task
+RENDER_CHUNK = 50
+# Render processes when REPORT_CARD_WORKERS is 0
+DEFAULT_WORKERS = 4
+
+_template = None
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def _init_worker(template_folder: str):
+    # Worker processes render with a bare Jinja environment: the template needs no app or request context
+    global _template
+    env = Environment(loader=FileSystemLoader(template_folder), autoescape=select_autoescape())
+    _template = env.get_template(TEMPLATE)
+
+
+def _render_chunk(args) -> list[tuple[str, str]]:
+    classroom, term, issued, cards = args
+    return [
+        (name, _template.render(student=student, transcript=transcript, classroom=classroom, term=term, issued=issued))
+        for name, student, transcript in cards
+    ]
+
+
+def _shared_pool(workers: int, template_folder: str) -> ProcessPoolExecutor:
+    # One pool per process, reused by every report-card job it runs. Spawned, not forked: the
+    # parent is threaded (audit writer, cache stamps) and holds pooled DB connections.
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=get_context("spawn"), initializer=_init_worker, initargs=(template_folder,)
+            )
+            _pool_pid = os.getpid()
+            atexit.register(_pool.shutdown, cancel_futures=True)
+        return _pool
+
+
+def _member_name(folder: str | None, student) -> str:
+    name = secure_filename(f"{student.nis}_{student.name}.html") or f"{student.id}.html"
+    return f"{secure_filename(folder) or 'kelas'}/{name}" if folder else name
+
+
+def _chunks(items: list, size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def report_card_members(term_id: int, classroom_id: int | None = None, progress=None, parallel: bool = False):
+    # Yields (archive name, html) for one term of one classroom, or the whole school when classroom_id is None.
+    # Data is loaded a classroom at a time so memory stays bounded by the largest class. parallel=True
+    # renders on the shared process pool; only the job worker asks for it, web requests render inline.
+    if classroom_id is None:
+        classes = [tuple(c) for c in reference.classrooms()] + [(None, "Tanpa Kelas")]
+        per_folder = True
+    else:
+        classes = [tuple(c) for c in reference.classrooms() if c.id == classroom_id]
+        per_folder = False
+
+    term = reference.term(term_id)
+    term_name = term.name if term else None
+    issued = date.today().strftime("%d-%m-%Y")
+    workers = current_app.config.get("REPORT_CARD_WORKERS") or min(DEFAULT_WORKERS, os.cpu_count() or 1)
+    template_folder = os.path.join(current_app.root_path, current_app.template_folder)
+    _init_worker(template_folder)
+    pool = _shared_pool(workers, template_folder) if parallel and workers > 1 else None
+    for done, (cid, cname) in enumerate(classes):
+        if progress:
+            progress(done, len(classes), cname)
+        with replica_reads():
+            transcripts = classroom_transcripts(cid, term_id)
+        cards = [(_member_name(cname if per_folder else None, s), s._asdict(), t) for s, t in transcripts]
+        tasks = [(cname, term_name, issued, chunk) for chunk in _chunks(cards, RENDER_CHUNK)]
+        rendered = pool.map(_render_chunk, tasks) if pool and len(tasks) > 1 else map(_render_chunk, tasks)
+        for chunk in rendered:
+            yield from chunk
+
+
+def report_cards_filename(classroom_name: str | None, term_name: str) -> str:
+    return secure_filename(f"rapor_{classroom_name or 'semua_kelas'}_{term_name}.zip")
+
+
+@task("report_cards")
+def report_cards_job(ctx, classroom_id: int | None = None, term_id: int | None = None):
+    # Without term_id the term active when the job runs is used
+    term = reference.term(term_id) if term_id else reference.active_term()
+    if term is None:
+        raise ValueError("Belum ada semester aktif.")
+    classroom = reference.classroom(classroom_id) if classroom_id else None
+    path = ctx.path("rapor.zip")
+    with open(path, "wb") as f:
+        for chunk in iter_zip(report_card_members(term.id, classroom_id, progress=ctx.progress, parallel=True)):
+            f.write(chunk)
+    return {"file": os.path.basename(path), "filename": report_cards_filename(classroom.name if classroom else None, term.name)}
@@ -1,21 +1,56 @@
-from flask import Blueprint, render_template, redirect, url_for, request, flash
+from itertools import groupby
+
+import click
+from flask import Blueprint, render_template, redirect, url_for, request, flash, abort, jsonify
 from flask_login import login_required, current_user
 from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import joinedload
+from werkzeug.utils import secure_filename
 
-from ..extensions import db
-from ..models import Subject, Enrollment, Grade, Student, Classroom
+from ..extensions import db, cache, audit
+from ..jobs.runner import enqueue
+from ..models import Student, User, GradingPolicy, GradeAudit
+from .. import reference
+from ..reference import SubjectRef
+from ..terms.scope import current_term, term_required
+from ..utils.cache import cache_key
 from ..utils.decorators import role_required
-from .forms import GradeInputForm, ReportFilterForm
+from ..utils.export import csv_response, stream_rows, zip_response
+from ..utils.grading import Weights
+from ..utils.pagination import keyset_paginate
+from ..utils.routing import replica_reads
+from .forms import BulkGradeForm, ReportFilterForm, GradingPolicyForm
+from .queries import grade_sheet, grade_sheet_query, grade_matrix_query, transcript_for, row_version
+from .report_cards import report_card_members, report_cards_filename
+from .services import GRADE_FIELDS, save_grade_rows, save_grade_cells
+from .weighting import recompute_finals, save_policy, subjects_following_default
 
 bp = Blueprint("grades", __name__, url_prefix="/grades")
 
+SHEET_TAGS = ("students", "enrollments", "grades")
+TRANSCRIPT_TAGS = ("subjects", "enrollments", "grades", "grade_archive")
+
+
+def _cached_transcript(student_id: int, term_id: int):
+    # (transcript of the term, archived terms); one statement on a miss
+    return cache.get_or_set(
+        cache_key("transcript", term_id, student_id), TRANSCRIPT_TAGS, lambda: transcript_for(student_id, term_id)
+    )
+
 
 def _subjects_for_user():
-    q = select(Subject).order_by(Subject.name)
     role = getattr(getattr(current_user, "role", None), "value", current_user.role)
-    if role == "teacher" and current_user.teacher:
-        q = q.where(Subject.teacher_id == current_user.teacher.id)
-    return db.session.execute(q).scalars().all()
+    if role == "teacher" and current_user.teacher_id:
+        return reference.subjects(current_user.teacher_id)
+    return reference.subjects()
+
+
+def _can_manage(subject: SubjectRef) -> bool:
+    role = getattr(getattr(current_user, "role", None), "value", current_user.role)
+    if role == "teacher":
+        return bool(current_user.teacher_id) and subject.teacher_id == current_user.teacher_id
+    return True
 
 
 @bp.route("/subjects")
@@ -29,148 +64,325 @@ def subjects():
 @bp.route("/subject/<int:subject_id>", methods=["GET", "POST"])
 @login_required
 @role_required("admin", "teacher")
+@term_required
 def manage_subject(subject_id):
-    subject = db.session.get(Subject, subject_id)
+    subject = reference.subject(subject_id)
     if not subject:
         flash("Mata pelajaran tidak ditemukan.", "warning")
         return redirect(url_for("grades.subjects"))
-    role = getattr(getattr(current_user, "role", None), "value", current_user.role)
-    if role == "teacher":
-        if not current_user.teacher or subject.teacher_id != current_user.teacher.id:
-            flash("Anda tidak berhak mengelola mata pelajaran ini.", "danger")
-            return redirect(url_for("grades.subjects"))
+    if not _can_manage(subject):
+        flash("Anda tidak berhak mengelola mata pelajaran ini.", "danger")
+        return redirect(url_for("grades.subjects"))
 
     class_id = request.args.get("classroom_id", type=int)
-    classes = db.session.execute(select(Classroom).order_by(Classroom.name)).scalars().all()
+    classes = reference.classrooms()
     if not classes:
         flash("Belum ada data kelas. Tambahkan kelas terlebih dahulu.", "warning")
         return redirect(url_for("classes.create"))
     if class_id is None:
         class_id = classes[0].id
-    classroom = db.session.get(Classroom, class_id)
-    students = db.session.execute(
-        select(Student).where(Student.classroom_id == class_id).order_by(Student.name)
-    ).scalars().all()
+    classroom = reference.classroom(class_id)
+    term = current_term()
+    sheet = grade_sheet(subject_id, class_id, term.id)
 
+    form = BulkGradeForm()
     if request.method == "POST":
-        form = GradeInputForm()
-        if form.validate_on_submit():
-            sid = int(form.student_id.data)
-            siswa = db.session.get(Student, sid)
-            if not siswa or siswa.classroom_id != class_id:
-                flash("Siswa tidak valid.", "danger")
-                return redirect(url_for("grades.manage_subject", subject_id=subject_id, classroom_id=class_id))
-            enr = db.session.execute(
-                select(Enrollment).where(Enrollment.student_id == sid, Enrollment.subject_id == subject_id)
-            ).scalar_one_or_none()
-            if not enr:
-                enr = Enrollment(student_id=sid, subject_id=subject_id)
-                db.session.add(enr)
-                db.session.flush()
-            grade = db.session.execute(
-                select(Grade).where(Grade.enrollment_id == enr.id)
-            ).scalar_one_or_none()
-            if not grade:
-                grade = Grade(enrollment_id=enr.id)
-                db.session.add(grade)
-            grade.tugas = form.tugas.data
-            grade.uts = form.uts.data
-            grade.uas = form.uas.data
-            grade.recompute_final()
-            db.session.commit()
-            flash(f"Nilai untuk {siswa.name} disimpan.", "success")
-            return redirect(url_for("grades.manage_subject", subject_id=subject_id, classroom_id=class_id))
-        else:
+        form.validate()
+        if "csrf_token" in form.errors:
             flash("Input nilai tidak valid.", "danger")
+        else:
+            names = {r.student_id: r.name for r in sheet}
+            entries = list(form.rows)
+            save_row = request.form.get("save_row", type=int)
+            if save_row is not None:
+                entries = entries[save_row:save_row + 1]
+            valid, errors = [], []
+            for entry in entries:
+                row = entry.form
+                try:
+                    sid = int(row.student_id.data)
+                except (TypeError, ValueError):
+                    sid = None
+                if sid not in names:
+                    errors.append("Baris dengan siswa tidak valid dilewati.")
+                    continue
+                if row.errors:
+                    fields = ", ".join(row[f].label.text for f in row.errors)
+                    errors.append(f"{names[sid]}: nilai {fields} tidak valid (0-100).")
+                    continue
+                valid.append({"student_id": sid, "tugas": row.tugas.data, "uts": row.uts.data, "uas": row.uas.data})
+            saved = save_grade_rows(subject_id, valid, term.id)
+            db.session.commit()
+            if saved:
+                flash(f"Nilai untuk {saved} siswa disimpan.", "success")
+            for message in errors:
+                flash(message, "danger")
+        return redirect(url_for("grades.manage_subject", subject_id=subject_id, classroom_id=class_id, term_id=term.id))
 
-    forms = []
-    for s in students:
-        enr = db.session.execute(
-            select(Enrollment).where(Enrollment.student_id == s.id, Enrollment.subject_id == subject_id)
-        ).scalar_one_or_none()
-        gr = None
-        if enr:
-            gr = db.session.execute(select(Grade).where(Grade.enrollment_id == enr.id)).scalar_one_or_none()
-        f = GradeInputForm()
-        f.student_id.data = str(s.id)
-        f.tugas.data = gr.tugas if gr and gr.tugas is not None else None
-        f.uts.data = gr.uts if gr and gr.uts is not None else None
-        f.uas.data = gr.uas if gr and gr.uas is not None else None
-        forms.append((s, gr, f))
+    for r in sheet:
+        form.rows.append_entry({"student_id": str(r.student_id), "tugas": r.tugas, "uts": r.uts, "uas": r.uas})
 
     return render_template(
         "grades/manage_subject.html",
         subject=subject,
         classroom=classroom,
         classes=classes,
-        forms=forms,
+        term=term,
+        form=form,
+        rows=list(zip(sheet, form.rows)),
+        versions={r.student_id: row_version(r) for r in sheet},
     )
 
 
+def _cell_row(row) -> dict:
+    return {
+        "student_id": row.student_id,
+        **{f: getattr(row, f) for f in GRADE_FIELDS},
+        "nilai_akhir": row.nilai_akhir,
+        "version": row_version(row),
+    }
+
+
+@bp.route("/subject/<int:subject_id>/cells", methods=["PATCH"])
+@login_required
+@role_required("admin", "teacher")
+@term_required
+def save_cells(subject_id):
+    # Autosave endpoint of the grade grid: a batch of changed cells written in one transaction.
+    # Answers with the saved rows (recomputed nilai_akhir and new version), plus the current
+    # state of rows edited elsewhere since the client loaded them (409 if there are any).
+    subject = reference.subject(subject_id)
+    if not subject:
+        abort(404)
+    if not _can_manage(subject):
+        abort(403)
+    classroom_id = request.args.get("classroom_id", type=int)
+    payload = request.get_json(silent=True)
+    cells = payload.get("cells") if isinstance(payload, dict) else None
+    if not classroom_id or not isinstance(cells, list):
+        return jsonify(error="Permintaan tidak valid: perlu classroom_id dan daftar cells."), 400
+    try:
+        saved, conflicts, errors = save_grade_cells(subject_id, classroom_id, current_term().id, cells)
+        db.session.commit()
+    except (IntegrityError, OperationalError):
+        # Two first saves of an ungraded row raced: the other one created it, or the two locking
+        # reads deadlocked and the database picked this one as the victim
+        db.session.rollback()
+        return jsonify(error="Nilai sedang diubah pengguna lain. Muat ulang halaman."), 409
+    body = {"rows": [_cell_row(r) for r in saved], "conflicts": [_cell_row(r) for r in conflicts], "errors": errors}
+    return jsonify(body), 409 if conflicts else 200
+
+
 @bp.route("/transcript")
 @login_required
 @role_required("student")
+@term_required
+@replica_reads()
 def transcript_me():
-    student = current_user.student
+    student = db.session.get(Student, current_user.student_id) if current_user.student_id else None
     if not student:
         flash("Akun ini tidak terkait dengan data siswa.", "warning")
         return redirect(url_for("dashboard.index"))
-    enrollments = db.session.execute(
-        select(Enrollment).where(Enrollment.student_id == student.id)
-    ).scalars().all()
-    items = []
-    for enr in enrollments:
-        subject = db.session.get(Subject, enr.subject_id)
-        grade = db.session.execute(select(Grade).where(Grade.enrollment_id == enr.id)).scalar_one_or_none()
-        items.append((subject, grade))
-    return render_template("grades/transcript.html", student=student, items=items)
+    term = current_term()
+    transcript, archive = _cached_transcript(student.id, term.id)
+    return render_template(
+        "grades/transcript.html",
+        student=student,
+        term=term,
+        transcript=transcript,
+        archive=archive,
+    )
 
 
 @bp.route("/transcript/<int:student_id>")
 @login_required
 @role_required("admin")
+@term_required
+@replica_reads()
 def transcript_admin(student_id):
     student = db.session.get(Student, student_id)
     if not student:
         flash("Siswa tidak ditemukan.", "warning")
         return redirect(url_for("students.index"))
-    enrollments = db.session.execute(
-        select(Enrollment).where(Enrollment.student_id == student.id)
-    ).scalars().all()
-    items = []
-    for enr in enrollments:
-        subject = db.session.get(Subject, enr.subject_id)
-        grade = db.session.execute(select(Grade).where(Grade.enrollment_id == enr.id)).scalar_one_or_none()
-        items.append((subject, grade))
-    return render_template("grades/transcript.html", student=student, items=items)
+    term = current_term()
+    transcript, archive = _cached_transcript(student.id, term.id)
+    return render_template(
+        "grades/transcript.html",
+        student=student,
+        term=term,
+        transcript=transcript,
+        archive=archive,
+    )
 
 
 @bp.route("/report", methods=["GET", "POST"])
 @login_required
 @role_required("admin", "teacher")
+@term_required
+@replica_reads()
 def report():
     form = ReportFilterForm()
     subs = _subjects_for_user()
-    form.subject_id.choices = [(s.id, f"{s.code} - {s.name}") for s in subs]
-    classes = db.session.execute(select(Classroom).order_by(Classroom.name)).scalars().all()
-    form.classroom_id.choices = [(c.id, c.name) for c in classes]
+    form.subject_id.choices = [(s.id, s.label) for s in subs]
+    form.classroom_id.choices = reference.classroom_choices()
 
     rows = None
     subject = None
     classroom = None
+    term = current_term()
     if form.validate_on_submit():
-        subject = db.session.get(Subject, form.subject_id.data)
-        classroom = db.session.get(Classroom, form.classroom_id.data)
-        students = db.session.execute(
-            select(Student).where(Student.classroom_id == classroom.id).order_by(Student.name)
-        ).scalars().all()
-        rows = []
-        for s in students:
-            enr = db.session.execute(
-                select(Enrollment).where(Enrollment.student_id == s.id, Enrollment.subject_id == subject.id)
-            ).scalar_one_or_none()
-            grade = None
-            if enr:
-                grade = db.session.execute(select(Grade).where(Grade.enrollment_id == enr.id)).scalar_one_or_none()
-            rows.append((s, grade))
-    return render_template("grades/report.html", form=form, rows=rows, subject=subject, classroom=classroom)
+        subject = reference.subject(form.subject_id.data)
+        classroom = reference.classroom(form.classroom_id.data)
+        rows = cache.get_or_set(
+            cache_key("grade_sheet", term.id, subject.id, classroom.id),
+            SHEET_TAGS,
+            lambda: grade_sheet(subject.id, classroom.id, term.id),
+        )
+    return render_template("grades/report.html", form=form, rows=rows, subject=subject, classroom=classroom, term=term)
+
+
+@bp.route("/report/export")
+@login_required
+@role_required("admin", "teacher")
+@term_required
+def export_report():
+    subject = reference.subject(request.args.get("subject_id", type=int))
+    classroom = reference.classroom(request.args.get("classroom_id", type=int))
+    if not subject or not classroom:
+        abort(404)
+    if not _can_manage(subject):
+        abort(403)
+    term = current_term()
+    rows = (r[1:3] + r[5:] for r in stream_rows(grade_sheet_query(subject.id, classroom.id, term.id)))
+    return csv_response(
+        secure_filename(f"nilai_{subject.code}_{classroom.name}_{term.name}.csv"),
+        ["NIS", "Nama", "Tugas", "UTS", "UAS", "Nilai Akhir"],
+        rows,
+    )
+
+
+@bp.route("/export/matrix")
+@login_required
+@role_required("admin")
+@term_required
+def export_matrix():
+    term = current_term()
+    subjects = sorted(reference.subjects(), key=lambda s: s.code)
+    columns = [s.id for s in subjects]
+
+    def rows():
+        for _, group in groupby(stream_rows(grade_matrix_query(term.id)), key=lambda r: r[0]):
+            group = list(group)
+            finals = {r[4]: r[5] for r in group}
+            yield list(group[0][1:4]) + [finals.get(sid) for sid in columns]
+
+    return csv_response(secure_filename(f"matriks_nilai_{term.name}.csv"), ["NIS", "Nama", "Kelas"] + [s.code for s in subjects], rows())
+
+
+@bp.route("/report-cards", methods=["GET", "POST"])
+@login_required
+@role_required("admin")
+@term_required
+def report_cards():
+    # GET ?classroom_id=<id> streams one class; POST queues the whole school as a job, so the
+    # rendering runs in the job worker rather than this web worker. ?term_id= as elsewhere.
+    term = current_term()
+    if request.method == "POST":
+        job = enqueue("report_cards", {"term_id": term.id}, user_id=current_user.id)
+        flash(f"Rapor semua kelas dibuat di latar belakang (job #{job.id}).", "info")
+        return redirect(url_for("jobs.index"))
+    classroom = reference.classroom(request.args.get("classroom_id", type=int) or 0)
+    if not classroom:
+        abort(404)
+    return zip_response(report_cards_filename(classroom.name, term.name), report_card_members(term.id, classroom.id))
+
+
+@bp.route("/audit")
+@login_required
+@role_required("admin", "teacher")
+def audit_log():
+    # Newest first, per student and/or subject; teachers must pick one of their own subjects
+    student_id = request.args.get("student_id", type=int)
+    subject_id = request.args.get("subject_id", type=int)
+    subject = reference.subject(subject_id) if subject_id else None
+    role = getattr(getattr(current_user, "role", None), "value", current_user.role)
+    if role == "teacher" and (subject is None or not _can_manage(subject)):
+        abort(403)
+
+    audit.flush()
+    stmt = select(GradeAudit)
+    if student_id:
+        stmt = stmt.where(GradeAudit.student_id == student_id)
+    if subject_id:
+        stmt = stmt.where(GradeAudit.subject_id == subject_id)
+    page = keyset_paginate(stmt, GradeAudit.created_at, GradeAudit.id, descending=True)
+
+    student_ids = {e.student_id for e in page.items if e.student_id} | ({student_id} if student_id else set())
+    students = {
+        r.id: r for r in db.session.execute(select(Student.id, Student.nis, Student.name).where(Student.id.in_(student_ids)))
+    } if student_ids else {}
+    user_ids = {e.user_id for e in page.items if e.user_id}
+    users = dict(db.session.execute(select(User.id, User.username).where(User.id.in_(user_ids))).all()) if user_ids else {}
+    return render_template(
+        "grades/audit.html",
+        entries=page.items,
+        page=page,
+        student=students.get(student_id),
+        subject=subject,
+        students=students,
+        subjects={s.id: s for s in reference.subjects()},
+        users=users,
+    )
+
+
+def _schedule_recompute(subject_ids: list[int]):
+    if not subject_ids:
+        flash("Bobot disimpan.", "success")
+        return
+    job = enqueue("recompute_finals", {"subject_ids": subject_ids}, user_id=current_user.id)
+    flash(f"Bobot disimpan. Nilai akhir dihitung ulang di latar belakang (job #{job.id}).", "success")
+
+
+@bp.route("/weights", methods=["GET", "POST"])
+@login_required
+@role_required("admin")
+def weights():
+    form = GradingPolicyForm()
+    form.subject_id.choices = [(0, "Default (semua mata pelajaran)")] + reference.subject_choices()
+    if form.validate_on_submit():
+        values = Weights(form.tugas.data, form.uts.data, form.uas.data)
+        if sum(values) <= 0:
+            flash("Total bobot harus lebih dari 0.", "danger")
+        else:
+            subject_id = form.subject_id.data or None
+            save_policy(subject_id, values)
+            db.session.commit()
+            _schedule_recompute([subject_id] if subject_id else subjects_following_default())
+            return redirect(url_for("grades.weights"))
+
+    policies = db.session.execute(
+        select(GradingPolicy).options(joinedload(GradingPolicy.subject)).order_by(GradingPolicy.subject_id.is_not(None), GradingPolicy.id)
+    ).scalars().all()
+    return render_template("grades/weights.html", form=form, policies=policies)
+
+
+@bp.route("/weights/<int:policy_id>/delete", methods=["POST"])
+@login_required
+@role_required("admin")
+def delete_weights(policy_id):
+    policy = db.session.get(GradingPolicy, policy_id)
+    if not policy:
+        abort(404)
+    subject_id = policy.subject_id
+    db.session.delete(policy)
+    db.session.commit()
+    # A removed override falls back to the default; a removed default falls back to a plain mean
+    _schedule_recompute([subject_id] if subject_id else subjects_following_default())
+    return redirect(url_for("grades.weights"))
+
+
+@bp.cli.command("recompute-finals")
+@click.option("--subject-id", type=int, multiple=True, help="Hanya mata pelajaran ini (boleh diulang).")
+def recompute_finals_command(subject_id):
+    changed = recompute_finals(list(subject_id) or None)
+    print(f"{changed} nilai akhir diperbarui.")
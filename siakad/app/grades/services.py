@@ -0,0 +1,146 @@
+from sqlalchemy import select, insert, update, false
+
+from ..dashboard.stats import apply_grade_delta, grade_delta
+from ..extensions import db
+from ..models import Enrollment, Grade
+from .audit import record_enrollments, record_grade_rows
+from .queries import GradeSheetRow, grade_sheet, row_version
+from .weighting import weights_for
+
+GRADE_FIELDS = ("tugas", "uts", "uas")
+GRADE_LABELS = {"tugas": "Tugas", "uts": "UTS", "uas": "UAS"}
+
+
+def save_grade_rows(subject_id: int, rows: list[dict], term_id: int) -> int:
+    # Set-based upsert into one term: a fixed number of statements regardless of class size.
+    # Each row is {"student_id", "tugas", "uts", "uas"}; the caller commits. Returns the rows written:
+    # a row with every component empty and no grade yet is skipped, so "Simpan Semua" on an untouched
+    # grid enrolls nobody and creates no all-NULL grades.
+    by_student = {r["student_id"]: r for r in rows}
+    if not by_student:
+        return 0
+    blank = {sid for sid, r in by_student.items() if all(r.get(f) is None for f in GRADE_FIELDS)}
+    student_ids = list(by_student)
+
+    enr_ids = dict(
+        db.session.execute(
+            select(Enrollment.student_id, Enrollment.id).where(
+                Enrollment.term_id == term_id, Enrollment.subject_id == subject_id, Enrollment.student_id.in_(student_ids)
+            )
+        ).all()
+    )
+    for sid in blank - enr_ids.keys():
+        del by_student[sid]
+    missing = [sid for sid in by_student if sid not in enr_ids]
+    if missing:
+        db.session.execute(insert(Enrollment), [{"term_id": term_id, "student_id": sid, "subject_id": subject_id} for sid in missing])
+        created = dict(
+            db.session.execute(
+                select(Enrollment.student_id, Enrollment.id).where(
+                    Enrollment.term_id == term_id, Enrollment.subject_id == subject_id, Enrollment.student_id.in_(missing)
+                )
+            ).all()
+        )
+        enr_ids.update(created)
+        record_enrollments("insert", [(enr_id, sid, subject_id) for sid, enr_id in created.items()])
+
+    existing = {
+        row.enrollment_id: row
+        for row in db.session.execute(
+            select(Grade.enrollment_id, Grade.id, Grade.tugas, Grade.uts, Grade.uas, Grade.nilai_akhir).where(
+                Grade.enrollment_id.in_(list(enr_ids.values()))
+            )
+        )
+    }
+    weights = weights_for(subject_id)
+    inserts, updates, audited = [], [], []
+    count_delta, sum_delta = 0, 0.0
+    for sid, row in by_student.items():
+        values = {f: row.get(f) for f in GRADE_FIELDS}
+        values["nilai_akhir"] = Grade.compute_final(**values, weights=weights)
+        enr_id = enr_ids[sid]
+        old = existing.get(enr_id)
+        if old is None and sid in blank:
+            continue
+        if old:
+            updates.append({"id": old.id, **values})
+        else:
+            inserts.append({"enrollment_id": enr_id, **values})
+        audited.append((old.id if old else None, enr_id, sid, old._asdict() if old else None, values))
+        dc, ds = grade_delta(old.nilai_akhir if old else None, values["nilai_akhir"])
+        count_delta += dc
+        sum_delta += ds
+    if inserts:
+        db.session.execute(insert(Grade), inserts)
+    if updates:
+        db.session.execute(update(Grade), updates)
+    record_grade_rows(subject_id, audited)
+    # Bulk statements bypass mapper events, so keep subject_stats in step here
+    apply_grade_delta(db.session.connection(), term_id, subject_id, count_delta, sum_delta)
+    return len(inserts) + len(updates)
+
+
+def parse_score(value) -> float | None:
+    # A cell value as sent by the grid: null or "" clears the component, anything else must be 0-100
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    if isinstance(value, bool):
+        raise ValueError(value)
+    score = float(value)
+    if not 0 <= score <= 100:
+        raise ValueError(value)
+    return score
+
+
+def save_grade_cells(
+    subject_id: int, classroom_id: int, term_id: int, cells: list
+) -> tuple[list[GradeSheetRow], list[GradeSheetRow], list[dict]]:
+    # Partial update from the autosave grid. Each cell is {"student_id", "field", "value", "version"},
+    # version being row_version() of the student's row as the client last saw it. Changed cells are
+    # merged into the current rows and written by one save_grade_rows() call; a student whose row
+    # changed in the meantime is left untouched. Returns (saved rows, conflicting rows, errors),
+    # rows as re-read after the write; the caller commits.
+    student_ids = list({cell["student_id"] for cell in cells if isinstance(cell, dict) and type(cell.get("student_id")) is int})
+    # Versions are compared against a locking read, so a concurrent batch carrying the same versions
+    # waits for this transaction and then sees the new values (a conflict) instead of overwriting them.
+    # A plain read could come from a snapshot taken earlier in the request.
+    # SQLite ignores FOR UPDATE, so there the write lock is taken first with a no-op UPDATE: a
+    # concurrent batch then blocks before its read, and sees this one's values once it commits.
+    # Run on the connection, not the session, so it tags no cache entries.
+    connection = db.session.connection()
+    if student_ids and connection.dialect.name == "sqlite":
+        connection.execute(update(Grade).where(false()).values(tugas=Grade.tugas))
+    current = (
+        {r.student_id: r for r in grade_sheet(subject_id, classroom_id, term_id, student_ids, for_update=True)}
+        if student_ids
+        else {}
+    )
+    changes, versions, errors = {}, {}, []
+    for cell in cells:
+        sid = cell.get("student_id") if isinstance(cell, dict) else None
+        if type(sid) is not int or sid not in current:
+            errors.append({"student_id": None, "field": None, "message": "Baris dengan siswa tidak valid dilewati."})
+            continue
+        field = cell.get("field")
+        if field not in GRADE_FIELDS:
+            errors.append({"student_id": sid, "field": field, "message": f"{current[sid].name}: kolom tidak dikenal."})
+            continue
+        try:
+            value = parse_score(cell.get("value"))
+        except (TypeError, ValueError):
+            errors.append({"student_id": sid, "field": field,
+                           "message": f"{current[sid].name}: nilai {GRADE_LABELS[field]} tidak valid (0-100)."})
+            continue
+        changes.setdefault(sid, {})[field] = value
+        versions.setdefault(sid, cell.get("version"))
+
+    conflicted = [sid for sid in changes if versions[sid] != row_version(current[sid])]
+    rows = [
+        {"student_id": sid, **{f: getattr(current[sid], f) for f in GRADE_FIELDS}, **values}
+        for sid, values in changes.items()
+        if sid not in conflicted
+    ]
+    save_grade_rows(subject_id, rows, term_id)
+    touched = [r["student_id"] for r in rows]
+    fresh = {r.student_id: r for r in grade_sheet(subject_id, classroom_id, term_id, touched)} if rows else {}
+    return [fresh[sid] for sid in touched], [current[sid] for sid in conflicted], errors
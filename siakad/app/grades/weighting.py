@@ -0,0 +1,116 @@
+from collections import defaultdict
+
+from flask import current_app
+from sqlalchemy import select, update, func, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased
+
+from ..dashboard.stats import refresh_subject
+from ..extensions import db
+from ..jobs.runner import task
+from ..models import Subject, Enrollment, Grade, GradingPolicy
+from ..utils.grading import Weights, EQUAL_WEIGHTS, final_expression
+
+
+def weights_for(subject_id: int) -> Weights:
+    # Subject override, else the global policy, else a plain mean
+    rows = db.session.execute(
+        select(GradingPolicy.subject_id, GradingPolicy.tugas, GradingPolicy.uts, GradingPolicy.uas).where(
+            or_(GradingPolicy.subject_id == subject_id, GradingPolicy.subject_id.is_(None))
+        )
+    ).all()
+    policies = {sid: Weights(*w) for sid, *w in rows}
+    return policies.get(subject_id) or policies.get(None) or EQUAL_WEIGHTS
+
+
+def save_policy(subject_id: int | None, weights: Weights) -> GradingPolicy:
+    # Upsert of a subject override (or of the default, subject_id None) under a row lock. Two first
+    # saves racing both find nothing to lock; the unique subject_id / is_default key rejects the
+    # second insert, which then retries and updates the winner's row. The insert runs in a
+    # savepoint so a rejected one leaves the rest of the caller's transaction alone. The caller commits.
+    scope = GradingPolicy.subject_id == subject_id if subject_id else GradingPolicy.is_default.is_(True)
+    for attempt in range(2):
+        policy = db.session.execute(select(GradingPolicy).where(scope).with_for_update()).scalar_one_or_none()
+        if policy is not None:
+            policy.tugas, policy.uts, policy.uas = weights
+            db.session.flush()
+            return policy
+        try:
+            with db.session.begin_nested():
+                policy = GradingPolicy(subject_id=subject_id, is_default=None if subject_id else True)
+                policy.tugas, policy.uts, policy.uas = weights
+                db.session.add(policy)
+            return policy
+        except IntegrityError:
+            if attempt:
+                raise
+
+
+def effective_weights(subject_ids: list[int] | None = None) -> dict[int, Weights]:
+    # Every subject (or the given ones) mapped to the weights that apply to it, in one statement
+    own = aliased(GradingPolicy)
+    default = db.session.execute(
+        select(GradingPolicy.tugas, GradingPolicy.uts, GradingPolicy.uas).where(GradingPolicy.subject_id.is_(None))
+    ).first()
+    default = Weights(*default) if default else EQUAL_WEIGHTS
+    stmt = select(Subject.id, own.tugas, own.uts, own.uas).outerjoin(own, own.subject_id == Subject.id)
+    if subject_ids is not None:
+        stmt = stmt.where(Subject.id.in_(subject_ids))
+    return {sid: Weights(t, u, a) if t is not None else default for sid, t, u, a in db.session.execute(stmt)}
+
+
+def subjects_following_default() -> list[int]:
+    return list(
+        db.session.execute(
+            select(Subject.id).outerjoin(GradingPolicy, GradingPolicy.subject_id == Subject.id).where(GradingPolicy.id.is_(None))
+        ).scalars()
+    )
+
+
+def recompute_finals(subject_ids: list[int] | None = None, chunk: int | None = None, progress=None) -> int:
+    # One UPDATE per weight group and grade-id window, committed per window so locks stay short.
+    # Only rows whose value actually changes are written; subject_stats is recounted afterwards.
+    chunk = chunk or current_app.config.get("GRADE_RECOMPUTE_CHUNK", 5000)
+    groups = defaultdict(list)
+    for sid, weights in effective_weights(subject_ids).items():
+        groups[weights].append(sid)
+    low, high = db.session.execute(select(func.min(Grade.id), func.max(Grade.id))).one()
+    if low is None or not groups:
+        return 0
+
+    windows = range(low, high + 1, chunk)
+    total_steps = len(windows) * len(groups)
+    changed = step = 0
+    for weights, sids in groups.items():
+        final = final_expression(Grade.tugas, Grade.uts, Grade.uas, weights)
+        # Correlated on the enrollment PK so each window costs O(window), not O(all enrollments)
+        in_subjects = (
+            select(Enrollment.id)
+            .where(Enrollment.id == Grade.enrollment_id, Enrollment.subject_id.in_(sids))
+            .exists()
+        )
+        for start in windows:
+            result = db.session.execute(
+                update(Grade)
+                .where(Grade.id >= start, Grade.id < start + chunk, in_subjects, Grade.nilai_akhir.is_distinct_from(final))
+                .values(nilai_akhir=final)
+                .execution_options(synchronize_session=False)
+            )
+            changed += result.rowcount
+            db.session.commit()
+            step += 1
+            if progress:
+                progress(step, total_steps, f"{changed} nilai diperbarui")
+
+    # Core UPDATEs skip the Grade mapper events that keep subject_stats current
+    connection = db.session.connection()
+    for sids in groups.values():
+        for sid in sids:
+            refresh_subject(connection, sid)
+    db.session.commit()
+    return changed
+
+
+@task("recompute_finals")
+def recompute_finals_job(ctx, subject_ids: list[int] | None = None):
+    return {"changed": recompute_finals(subject_ids, progress=ctx.progress)}
@@ -0,0 +1 @@
+# imports blueprint package
@@ -0,0 +1,12 @@
+from flask_wtf import FlaskForm
+from flask_wtf.file import FileField, FileRequired, FileAllowed
+from wtforms import SelectField, BooleanField, SubmitField
+from wtforms.validators import DataRequired
+
+
+class ImportForm(FlaskForm):
+    kind = SelectField("Jenis Data", choices=[("students", "Siswa"), ("teachers", "Guru")], validators=[DataRequired()])
+    file = FileField("File CSV", validators=[FileRequired(), FileAllowed(["csv"], "Hanya file CSV.")])
+    dry_run = BooleanField("Uji coba saja (tanpa menyimpan)", default=True)
+    background = BooleanField("Proses di latar belakang")
+    submit = SubmitField("Proses")
@@ -0,0 +1,42 @@
+import uuid
+
+from flask import Blueprint, render_template, flash, redirect, url_for
+from flask_login import login_required, current_user
+
+from ..jobs.runner import enqueue, storage_path
+from ..utils.decorators import role_required
+from .forms import ImportForm
+from .services import run_import, STUDENT_COLUMNS, TEACHER_COLUMNS, MAX_LISTED_ERRORS
+
+bp = Blueprint("imports", __name__, url_prefix="/imports")
+
+
+@bp.route("/", methods=["GET", "POST"])
+@login_required
+@role_required("admin")
+def index():
+    form = ImportForm()
+    report = None
+    if form.validate_on_submit():
+        if form.background.data:
+            # Hand the upload to the job worker and return straight away
+            path = storage_path(f"import_{uuid.uuid4().hex}.csv")
+            form.file.data.save(path)
+            params = {"kind": form.kind.data, "path": path, "dry_run": form.dry_run.data}
+            job = enqueue("import", params, user_id=current_user.id)
+            flash(f"Impor dijadwalkan sebagai job #{job.id}.", "info")
+            return redirect(url_for("jobs.index"))
+        report = run_import(form.kind.data, form.file.data.stream, dry_run=form.dry_run.data)
+        if report.dry_run:
+            flash(f"Uji coba selesai: {report.valid} dari {report.total} baris valid.", "info")
+        elif report.inserted:
+            flash(f"{report.inserted} data dan {report.users_created} akun berhasil diimpor.", "success")
+        if report.errors:
+            flash(f"{len(report.errors)} baris bermasalah dilewati.", "warning")
+    return render_template(
+        "imports/index.html",
+        form=form,
+        report=report,
+        max_errors=MAX_LISTED_ERRORS,
+        columns={"Siswa": STUDENT_COLUMNS, "Guru": TEACHER_COLUMNS},
+    )
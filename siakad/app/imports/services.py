@@ -0,0 +1,280 @@
+import csv
+import io
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date
+from multiprocessing import get_context
+
+import bcrypt as _bcrypt
+from flask import current_app
+from sqlalchemy import select, insert
+from sqlalchemy.exc import DBAPIError, IntegrityError
+
+from ..dashboard.stats import bump_counter
+from ..extensions import db
+from ..jobs.runner import task
+from ..models import Student, Teacher, User, RoleEnum
+from .. import reference
+from ..students.search import reindex
+
+# Errors beyond this are counted but not listed
+MAX_LISTED_ERRORS = 200
+
+STUDENT_COLUMNS = ["nis", "name", "birth_date", "gender", "address", "parent_phone", "classroom", "username", "email", "password"]
+TEACHER_COLUMNS = ["nip", "name", "phone", "address", "username", "email", "password"]
+# Column widths from models.py; longer values are row errors rather than a DataError mid-import
+PHONE_MAX, EMAIL_MAX = 32, 120
+EMAIL = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+
+
+@dataclass
+class ImportReport:
+    dry_run: bool
+    total: int = 0
+    valid: int = 0
+    inserted: int = 0
+    users_created: int = 0
+    errors: list[tuple[int, str]] = field(default_factory=list)
+
+
+def _hash_password(args) -> str:
+    # Runs in a worker process; same format as Flask-Bcrypt's generate_password_hash
+    password, rounds = args
+    return _bcrypt.hashpw(password.encode(), _bcrypt.gensalt(rounds)).decode()
+
+
+def _hash_workers() -> int:
+    return current_app.config.get("IMPORT_HASH_WORKERS") or os.cpu_count() or 1
+
+
+def hash_pool() -> ProcessPoolExecutor | None:
+    # One pool per import, handed to every chunk; its processes start on first use. Spawned, not
+    # forked: the importing web or job worker runs other threads and holds pooled DB connections.
+    workers = _hash_workers()
+    return ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) if workers > 1 else None
+
+
+def hash_passwords(passwords: list[str], pool: ProcessPoolExecutor | None = None) -> list[str]:
+    rounds = current_app.config.get("BCRYPT_LOG_ROUNDS", 12)
+    jobs = [(p, rounds) for p in passwords]
+    if pool is None or len(jobs) < 8:
+        return [_hash_password(j) for j in jobs]
+    return list(pool.map(_hash_password, jobs, chunksize=max(1, len(jobs) // (_hash_workers() * 4))))
+
+
+def _reader(stream):
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    reader = csv.DictReader(text)
+    reader.fieldnames = [(f or "").strip().lower() for f in reader.fieldnames or []]
+    return reader
+
+
+def _clean(row: dict) -> dict:
+    return {k: (v or "").strip() for k, v in row.items() if k}
+
+
+class _Accounts:
+    # Username/email uniqueness against the DB (pre-fetched) and earlier rows of the same file
+    def __init__(self):
+        self.usernames = set(db.session.execute(select(User.username)).scalars())
+        self.emails = {e.lower() for e in db.session.execute(select(User.email).where(User.email.is_not(None))).scalars()}
+
+    def check(self, row: dict, errors: list[str]):
+        username, email, password = row.get("username"), row.get("email"), row.get("password")
+        if not username:
+            return
+        if len(username) > 64:
+            errors.append("username terlalu panjang")
+        elif username in self.usernames:
+            errors.append(f"username '{username}' sudah dipakai")
+        if len(password or "") < 6:
+            errors.append("password minimal 6 karakter")
+        if email and len(email) > EMAIL_MAX:
+            errors.append("email terlalu panjang")
+        elif email and not EMAIL.match(email):
+            errors.append(f"format email '{email}' tidak valid")
+        elif email and email.lower() in self.emails:
+            errors.append(f"email '{email}' sudah dipakai")
+
+    def claim(self, row: dict):
+        if row.get("username"):
+            self.usernames.add(row["username"])
+            if row.get("email"):
+                self.emails.add(row["email"].lower())
+
+
+def _validate_student(row, seen, classrooms, errors):
+    if not row.get("nis"):
+        errors.append("NIS wajib diisi")
+    elif len(row["nis"]) > 32:
+        errors.append("NIS terlalu panjang")
+    elif row["nis"] in seen:
+        errors.append(f"NIS '{row['nis']}' sudah ada")
+    if not row.get("name"):
+        errors.append("nama wajib diisi")
+    elif len(row["name"]) > 128:
+        errors.append("nama terlalu panjang")
+    values = {
+        "nis": row.get("nis"),
+        "name": row.get("name"),
+        "birth_date": None,
+        "gender": None,
+        "address": row.get("address") or None,
+        "parent_phone": row.get("parent_phone") or None,
+        "classroom_id": None,
+    }
+    if len(row.get("parent_phone") or "") > PHONE_MAX:
+        errors.append("telp ortu terlalu panjang")
+    if row.get("birth_date"):
+        try:
+            values["birth_date"] = date.fromisoformat(row["birth_date"])
+        except ValueError:
+            errors.append("tanggal lahir harus YYYY-MM-DD")
+    if row.get("gender"):
+        if row["gender"].upper() not in ("M", "F"):
+            errors.append("gender harus M atau F")
+        values["gender"] = row["gender"].upper()
+    if row.get("classroom"):
+        values["classroom_id"] = classrooms.get(row["classroom"])
+        if values["classroom_id"] is None:
+            errors.append(f"kelas '{row['classroom']}' tidak ditemukan")
+    return values
+
+
+def _validate_teacher(row, seen, errors):
+    if not row.get("nip"):
+        errors.append("NIP wajib diisi")
+    elif len(row["nip"]) > 32:
+        errors.append("NIP terlalu panjang")
+    elif row["nip"] in seen:
+        errors.append(f"NIP '{row['nip']}' sudah ada")
+    if not row.get("name"):
+        errors.append("nama wajib diisi")
+    elif len(row["name"]) > 128:
+        errors.append("nama terlalu panjang")
+    if len(row.get("phone") or "") > PHONE_MAX:
+        errors.append("telp terlalu panjang")
+    return {
+        "nip": row.get("nip"),
+        "name": row.get("name"),
+        "phone": row.get("phone") or None,
+        "address": row.get("address") or None,
+    }
+
+
+def _flush_chunk(kind: str, chunk: list[tuple[dict, dict]], report: ImportReport, pool: ProcessPoolExecutor | None):
+    model, key, link = (Student, "nis", "student_id") if kind == "students" else (Teacher, "nip", "teacher_id")
+    key_col = getattr(model, key)
+    db.session.execute(insert(model), [values for values, _ in chunk])
+    ids = dict(db.session.execute(select(key_col, model.id).where(key_col.in_([v[key] for v, _ in chunk]))).all())
+
+    accounts = [(values, row) for values, row in chunk if row.get("username")]
+    hashes = hash_passwords([row["password"] for _, row in accounts], pool)
+    users = [
+        {
+            "username": row["username"],
+            "email": row.get("email") or None,
+            "password_hash": pw_hash,
+            "role": RoleEnum.student if kind == "students" else RoleEnum.teacher,
+            "is_active": True,
+            link: ids[values[key]],
+        }
+        for (values, row), pw_hash in zip(accounts, hashes)
+    ]
+    if users:
+        db.session.execute(insert(User), users)
+
+    # Bulk inserts skip mapper events; keep the search index and dashboard counters current
+    connection = db.session.connection()
+    if kind == "students":
+        reindex(connection, [(ids[v["nis"]], v["name"]) for v, _ in chunk])
+    bump_counter(connection, kind, len(chunk))
+    report.inserted += len(chunk)
+    report.users_created += len(users)
+
+
+def run_import(kind: str, stream, dry_run: bool = True, progress=None) -> ImportReport:
+    report = ImportReport(dry_run=dry_run)
+    chunk_size = current_app.config.get("IMPORT_CHUNK_SIZE", 500)
+    if kind == "students":
+        seen = set(db.session.execute(select(Student.nis)).scalars())
+        classrooms = {c.name: c.id for c in reference.classrooms(fresh=True)}
+        columns = STUDENT_COLUMNS
+    else:
+        seen = set(db.session.execute(select(Teacher.nip)).scalars())
+        columns = TEACHER_COLUMNS
+    accounts = _Accounts()
+    pool = None if dry_run else hash_pool()
+
+    try:
+        reader = _reader(stream)
+        missing = {columns[0], "name"} - set(reader.fieldnames)
+        if missing:
+            report.errors.append((1, f"kolom wajib tidak ada: {', '.join(sorted(missing))}"))
+            return report
+        chunk = []
+        for row in reader:
+            report.total += 1
+            if progress and report.total % chunk_size == 0:
+                progress(report.total, message=f"{report.total} baris diperiksa")
+            row = _clean(row)
+            errors = []
+            if kind == "students":
+                values = _validate_student(row, seen, classrooms, errors)
+            else:
+                values = _validate_teacher(row, seen, errors)
+            accounts.check(row, errors)
+            if errors:
+                report.errors.append((reader.line_num, "; ".join(errors)))
+                continue
+            seen.add(values[columns[0]])
+            accounts.claim(row)
+            report.valid += 1
+            if not dry_run:
+                chunk.append((values, row))
+                if len(chunk) >= chunk_size:
+                    _flush_chunk(kind, chunk, report, pool)
+                    chunk = []
+        if chunk:
+            _flush_chunk(kind, chunk, report, pool)
+    except (UnicodeDecodeError, csv.Error) as e:
+        db.session.rollback()
+        report.inserted = report.users_created = 0
+        report.errors.append((0, f"file CSV tidak dapat dibaca: {e}"))
+        return report
+    except IntegrityError:
+        db.session.rollback()
+        report.inserted = report.users_created = 0
+        report.errors.append((0, "data bentrok dengan perubahan lain, tidak ada data yang disimpan"))
+        return report
+    except DBAPIError as e:
+        # Anything the row checks above missed (e.g. a value the column rejects): same all-or-nothing outcome
+        db.session.rollback()
+        report.inserted = report.users_created = 0
+        report.errors.append((0, f"data ditolak database, tidak ada data yang disimpan: {e.orig}"))
+        return report
+    finally:
+        if pool:
+            pool.shutdown()
+
+    if not dry_run:
+        db.session.commit()
+    return report
+
+
+@task("import")
+def import_job(ctx, kind: str, path: str, dry_run: bool = True):
+    with open(path, "rb") as f:
+        report = run_import(kind, f, dry_run=dry_run, progress=ctx.progress)
+    os.remove(path)
+    return {
+        "dry_run": report.dry_run,
+        "total": report.total,
+        "valid": report.valid,
+        "inserted": report.inserted,
+        "users_created": report.users_created,
+        "error_count": len(report.errors),
+        "errors": report.errors[:MAX_LISTED_ERRORS],
+    }
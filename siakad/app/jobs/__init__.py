@@ -0,0 +1 @@
+# jobs blueprint package
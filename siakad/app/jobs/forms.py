@@ -0,0 +1,8 @@
+from flask_wtf import FlaskForm
+from wtforms import SelectField, SubmitField
+from wtforms.validators import DataRequired
+
+
+class StartJobForm(FlaskForm):
+    kind = SelectField("Proses", choices=[], validators=[DataRequired()])
+    submit = SubmitField("Jalankan")
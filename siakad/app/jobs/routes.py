@@ -0,0 +1,122 @@
+import multiprocessing
+import os
+
+import click
+from flask import Blueprint, render_template, redirect, url_for, flash, jsonify, abort, send_file
+from flask_login import login_required, current_user
+from sqlalchemy import select
+
+from ..extensions import db
+from ..models import Job
+from ..utils.decorators import role_required
+from .forms import StartJobForm
+from .runner import enqueue, request_cancel, storage_path, work, worker_process
+
+bp = Blueprint("jobs", __name__, url_prefix="/jobs")
+
+# Jobs an admin can start by hand from the jobs page
+MANUAL_JOBS = [
+    ("report_cards", "Rapor seluruh sekolah (ZIP)"),
+    ("rebuild_stats", "Bangun ulang statistik dashboard"),
+    ("reindex_search", "Bangun ulang indeks pencarian siswa"),
+]
+RECENT_JOBS = 50
+
+
+def job_status(job: Job) -> dict:
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status.value,
+        "progress": job.progress,
+        "total": job.total,
+        "percent": job.percent,
+        "message": job.message,
+        "attempts": job.attempts,
+        "result": job.result,
+        "error": job.error.strip().splitlines()[-1] if job.error else None,
+        "created_at": job.created_at.isoformat(),
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "download_url": url_for("jobs.download", job_id=job.id) if (job.result or {}).get("file") else None,
+    }
+
+
+def _get_job(job_id: int) -> Job:
+    job = db.session.get(Job, job_id)
+    if not job:
+        abort(404)
+    return job
+
+
+@bp.route("/")
+@login_required
+@role_required("admin")
+def index():
+    form = StartJobForm()
+    form.kind.choices = MANUAL_JOBS
+    jobs = db.session.execute(select(Job).order_by(Job.id.desc()).limit(RECENT_JOBS)).scalars().all()
+    return render_template("jobs/index.html", form=form, jobs=jobs, labels=dict(MANUAL_JOBS))
+
+
+@bp.route("/start", methods=["POST"])
+@login_required
+@role_required("admin")
+def start():
+    form = StartJobForm()
+    form.kind.choices = MANUAL_JOBS
+    if form.validate_on_submit():
+        job = enqueue(form.kind.data, user_id=current_user.id)
+        flash(f"Job #{job.id} dijadwalkan.", "success")
+    return redirect(url_for("jobs.index"))
+
+
+@bp.route("/<int:job_id>")
+@login_required
+@role_required("admin")
+def status(job_id):
+    return jsonify(job_status(_get_job(job_id)))
+
+
+@bp.route("/<int:job_id>/cancel", methods=["POST"])
+@login_required
+@role_required("admin")
+def cancel(job_id):
+    _get_job(job_id)
+    if request_cancel(job_id):
+        flash(f"Pembatalan job #{job_id} diminta.", "info")
+    else:
+        flash(f"Job #{job_id} sudah selesai.", "warning")
+    return redirect(url_for("jobs.index"))
+
+
+@bp.route("/<int:job_id>/download")
+@login_required
+@role_required("admin")
+def download(job_id):
+    result = _get_job(job_id).result or {}
+    path = storage_path(os.path.basename(result["file"])) if result.get("file") else None
+    if not path or not os.path.exists(path):
+        abort(404)
+    return send_file(path, as_attachment=True, download_name=result.get("filename") or os.path.basename(path))
+
+
+@bp.cli.command("worker")
+@click.option("--processes", default=1, show_default=True, help="Jumlah proses worker.")
+@click.option("--burst", is_flag=True, help="Berhenti setelah antrean kosong.")
+def worker_command(processes, burst):
+    if processes <= 1:
+        try:
+            print(f"{work(burst=burst)} job diproses.")
+        except KeyboardInterrupt:
+            pass
+        return
+    ctx = multiprocessing.get_context("spawn")
+    pool = [ctx.Process(target=worker_process, args=(burst,)) for _ in range(processes)]
+    for p in pool:
+        p.start()
+    try:
+        for p in pool:
+            p.join()
+    except KeyboardInterrupt:
+        for p in pool:
+            p.join()
@@ -0,0 +1,237 @@
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+from typing import Callable
+
+from flask import current_app, g
+from sqlalchemy import select, update, func
+from sqlalchemy.exc import OperationalError
+
+from ..extensions import db, audit
+from ..models import Job, JobStatus
+
+log = logging.getLogger(__name__)
+
+# kind -> callable(ctx, **params) returning a JSON-able result
+TASKS: dict[str, Callable] = {}
+
+# Minimum seconds between progress writes from one job
+PROGRESS_INTERVAL = 1.0
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def task(kind: str):
+    # Registers a job handler; modules defining tasks are imported with their blueprints
+    def decorator(fn):
+        TASKS[kind] = fn
+        return fn
+
+    return decorator
+
+
+def _engine():
+    return db.engines["jobs"]
+
+
+def _update(job_id: int, *criteria, **values) -> int:
+    # Own transaction on the jobs bind, independent of whatever the task has open on db.session
+    with _engine().begin() as conn:
+        return conn.execute(update(Job).where(Job.id == job_id, *criteria).values(**values)).rowcount
+
+
+def storage_path(name: str | None = None) -> str:
+    base = current_app.config.get("JOB_STORAGE_PATH") or os.path.join(current_app.instance_path, "jobs")
+    os.makedirs(base, exist_ok=True)
+    return os.path.join(base, name) if name else base
+
+
+def enqueue(kind: str, params: dict | None = None, user_id: int | None = None, max_attempts: int | None = None) -> Job:
+    # max_attempts=1 for jobs that must not be retried (or reclaimed from a dead worker)
+    if kind not in TASKS:
+        raise KeyError(f"unknown job kind {kind!r}")
+    job = Job(
+        kind=kind,
+        params=params or {},
+        created_by=user_id,
+        max_attempts=max_attempts or current_app.config.get("JOB_MAX_ATTEMPTS", 3),
+    )
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+def request_cancel(job_id: int) -> bool:
+    # Queued jobs are cancelled outright; running ones stop at their next progress call
+    now = datetime.utcnow()
+    if _update(job_id, Job.status == JobStatus.queued, status=JobStatus.cancelled, finished_at=now, message="Dibatalkan"):
+        return True
+    return bool(_update(job_id, Job.status == JobStatus.running, cancel_requested=True))
+
+
+class JobContext:
+    def __init__(self, job_id: int, attempt: int):
+        self.job_id = job_id
+        self.attempt = attempt
+        self._last_write = 0.0
+
+    def path(self, name: str) -> str:
+        return storage_path(f"job_{self.job_id}_{name}")
+
+    def progress(self, done: int, total: int | None = None, message: str | None = None, force: bool = False):
+        # Throttled; also the cancellation checkpoint. Best effort: a locked jobs DB skips the write.
+        now = time.monotonic()
+        if not force and now - self._last_write < PROGRESS_INTERVAL:
+            return
+        self._last_write = now
+        values = {"progress": done, "heartbeat_at": datetime.utcnow()}
+        if total is not None:
+            values["total"] = total
+        if message is not None:
+            values["message"] = message[:255]
+        try:
+            with _engine().begin() as conn:
+                conn.execute(update(Job).where(Job.id == self.job_id).values(**values))
+                cancelled = conn.scalar(select(Job.cancel_requested).where(Job.id == self.job_id))
+        except OperationalError:
+            log.warning("job %s: progress update skipped (jobs database busy)", self.job_id)
+            return
+        if cancelled:
+            raise JobCancelled()
+
+
+class _Heartbeat(threading.Thread):
+    # Keeps heartbeat_at fresh for tasks that report progress rarely, so they are not taken for dead
+    def __init__(self, engine, job_id: int, interval: float):
+        super().__init__(daemon=True)
+        self.engine, self.job_id, self.interval = engine, job_id, interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                with self.engine.begin() as conn:
+                    conn.execute(update(Job).where(Job.id == self.job_id).values(heartbeat_at=datetime.utcnow()))
+            except OperationalError:
+                pass
+
+
+def _recover_stale(conn, now: datetime):
+    # Jobs whose worker stopped heartbeating are retried, or failed once out of attempts
+    stale = (Job.status == JobStatus.running, Job.heartbeat_at < now - timedelta(seconds=current_app.config.get("JOB_STALE_AFTER", 300)))
+    conn.execute(
+        update(Job)
+        .where(*stale, Job.attempts >= Job.max_attempts)
+        .values(status=JobStatus.failed, finished_at=now, error="Worker berhenti saat menjalankan job.")
+    )
+    conn.execute(update(Job).where(*stale).values(status=JobStatus.queued, worker=None, run_after=now))
+
+
+def claim_next(worker: str) -> int | None:
+    now = datetime.utcnow()
+    with _engine().begin() as conn:
+        _recover_stale(conn, now)
+        candidates = conn.scalars(
+            select(Job.id)
+            .where(Job.status == JobStatus.queued, Job.run_after <= now)
+            .order_by(Job.run_after, Job.id)
+            .limit(5)
+        ).all()
+        for job_id in candidates:
+            # Conditional update: only one worker wins a given row
+            claimed = conn.execute(
+                update(Job)
+                .where(Job.id == job_id, Job.status == JobStatus.queued)
+                .values(
+                    status=JobStatus.running,
+                    worker=worker,
+                    attempts=Job.attempts + 1,
+                    cancel_requested=False,
+                    started_at=now,
+                    heartbeat_at=now,
+                )
+            ).rowcount
+            if claimed:
+                return job_id
+    return None
+
+
+def run_job(job_id: int):
+    with _engine().connect() as conn:
+        kind, params, attempts, max_attempts, created_by = conn.execute(
+            select(Job.kind, Job.params, Job.attempts, Job.max_attempts, Job.created_by).where(Job.id == job_id)
+        ).one()
+    # Changes made by the job are attributed to whoever queued it (see app.grades.audit)
+    g.actor_id = created_by
+    fn = TASKS.get(kind)
+    ctx = JobContext(job_id, attempts)
+    heartbeat = _Heartbeat(_engine(), job_id, max(1.0, current_app.config.get("JOB_STALE_AFTER", 300) / 3))
+    heartbeat.start()
+    try:
+        if fn is None:
+            raise LookupError(f"unknown job kind {kind!r}")
+        result = fn(ctx, **(params or {}))
+        db.session.commit()
+    except JobCancelled:
+        db.session.rollback()
+        _update(job_id, status=JobStatus.cancelled, finished_at=datetime.utcnow(), message="Dibatalkan")
+    except Exception:
+        db.session.rollback()
+        log.exception("job %s (%s) failed on attempt %s", job_id, kind, attempts)
+        now = datetime.utcnow()
+        error = traceback.format_exc()
+        if fn is not None and attempts < max_attempts:
+            delay = current_app.config.get("JOB_RETRY_DELAY", 30) * 2 ** (attempts - 1)
+            _update(job_id, status=JobStatus.queued, worker=None, error=error, run_after=now + timedelta(seconds=delay))
+        else:
+            _update(job_id, status=JobStatus.failed, error=error, finished_at=now)
+    else:
+        _update(
+            job_id,
+            status=JobStatus.done,
+            result=result,
+            error=None,
+            progress=func.coalesce(Job.total, Job.progress),
+            finished_at=datetime.utcnow(),
+        )
+    finally:
+        heartbeat.stopped.set()
+        db.session.remove()
+
+
+def work(burst: bool = False, worker: str | None = None) -> int:
+    # Processes jobs until interrupted; burst=True returns once the queue is empty
+    worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+    poll = current_app.config.get("JOB_POLL_INTERVAL", 2)
+    processed = 0
+    while True:
+        job_id = claim_next(worker)
+        if job_id is None:
+            if burst:
+                return processed
+            time.sleep(poll)
+            continue
+        log.info("worker %s running job %s", worker, job_id)
+        run_job(job_id)
+        processed += 1
+
+
+def worker_process(burst: bool = False):
+    # Entry point for spawned worker processes; each builds its own app and engines
+    from .. import create_app
+
+    app = create_app()
+    with app.app_context():
+        try:
+            work(burst=burst)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            # multiprocessing children exit without running atexit hooks
+            audit.close()
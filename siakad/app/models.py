@@ -8,6 +8,7 @@ from sqlalchemy import UniqueConstraint, CheckConstraint, Index, ForeignKey
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from .extensions import db, bcrypt
+from .utils.grading import Weights, EQUAL_WEIGHTS, compute_final
 
 
 class RoleEnum(enum.Enum):
@@ -16,13 +17,21 @@ class RoleEnum(enum.Enum):
     student = "student"
 
 
+class JobStatus(enum.Enum):
+    queued = "queued"
+    running = "running"
+    done = "done"
+    failed = "failed"
+    cancelled = "cancelled"
+
+
 class Classroom(db.Model):
     __tablename__ = "classrooms"
 
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str] = mapped_column(db.String(64), unique=True, nullable=False)
 
-    students: Mapped[list[Student]] = relationship("Student", back_populates="classroom")
+    students: Mapped[list[Student]] = relationship("Student", back_populates="classroom", passive_deletes=True)
 
     def __repr__(self) -> str:
         return f"<Classroom {self.name}>"
@@ -38,11 +47,15 @@ class Student(db.Model):
     address: Mapped[str | None] = mapped_column(db.Text())
     gender: Mapped[str | None] = mapped_column(db.Enum("M", "F", name="gender_enum"))
     parent_phone: Mapped[str | None] = mapped_column(db.String(32))
-    classroom_id: Mapped[int | None] = mapped_column(ForeignKey("classrooms.id"), index=True)
+    classroom_id: Mapped[int | None] = mapped_column(ForeignKey("classrooms.id", ondelete="SET NULL"), index=True)
 
+    # passive_deletes: enrollments/grades go by ON DELETE CASCADE, users.student_id by SET NULL;
+    # deleting a student never loads its rows (see app.removal)
     classroom: Mapped[Classroom | None] = relationship("Classroom", back_populates="students")
-    enrollments: Mapped[list[Enrollment]] = relationship("Enrollment", back_populates="student", cascade="all, delete-orphan")
-    user: Mapped[User | None] = relationship("User", back_populates="student", uselist=False)
+    enrollments: Mapped[list[Enrollment]] = relationship(
+        "Enrollment", back_populates="student", cascade="all, delete-orphan", passive_deletes=True
+    )
+    user: Mapped[User | None] = relationship("User", back_populates="student", uselist=False, passive_deletes=True)
 
     created_at: Mapped[datetime] = mapped_column(db.DateTime, default=datetime.utcnow, nullable=False)
 
@@ -50,6 +63,14 @@ class Student(db.Model):
         return f"<Student {self.nis} {self.name}>"
 
 
+class StudentSearchToken(db.Model):
+    # Inverted index of normalized name tokens, maintained by app.students.search
+    __tablename__ = "student_search_tokens"
+
+    token: Mapped[str] = mapped_column(db.String(64), primary_key=True)
+    student_id: Mapped[int] = mapped_column(ForeignKey("students.id", ondelete="CASCADE"), primary_key=True, index=True)
+
+
 class Teacher(db.Model):
     __tablename__ = "teachers"
 
@@ -59,8 +80,8 @@ class Teacher(db.Model):
     phone: Mapped[str | None] = mapped_column(db.String(32))
     address: Mapped[str | None] = mapped_column(db.Text())
 
-    subjects: Mapped[list[Subject]] = relationship("Subject", back_populates="teacher")
-    user: Mapped[User | None] = relationship("User", back_populates="teacher", uselist=False)
+    subjects: Mapped[list[Subject]] = relationship("Subject", back_populates="teacher", passive_deletes=True)
+    user: Mapped[User | None] = relationship("User", back_populates="teacher", uselist=False, passive_deletes=True)
 
     def __repr__(self) -> str:
         return f"<Teacher {self.nip} {self.name}>"
@@ -73,31 +94,61 @@ class Subject(db.Model):
     code: Mapped[str] = mapped_column(db.String(16), unique=True, nullable=False)
     name: Mapped[str] = mapped_column(db.String(128), nullable=False)
     sks: Mapped[int] = mapped_column(db.Integer, nullable=False)
-    teacher_id: Mapped[int | None] = mapped_column(ForeignKey("teachers.id"), index=True)
+    teacher_id: Mapped[int | None] = mapped_column(ForeignKey("teachers.id", ondelete="SET NULL"), index=True)
 
     teacher: Mapped[Teacher | None] = relationship("Teacher", back_populates="subjects")
-    enrollments: Mapped[list[Enrollment]] = relationship("Enrollment", back_populates="subject", cascade="all, delete-orphan")
+    enrollments: Mapped[list[Enrollment]] = relationship(
+        "Enrollment", back_populates="subject", cascade="all, delete-orphan", passive_deletes=True
+    )
 
     def __repr__(self) -> str:
         return f"<Subject {self.code} {self.name}>"
 
 
+class AcademicTerm(db.Model):
+    # Semester an enrollment belongs to; exactly one is active and scopes grade views by default
+    __tablename__ = "academic_terms"
+    __table_args__ = (
+        UniqueConstraint("academic_year", "semester", name="uq_term_year_semester"),
+    )
+
+    SEMESTERS = {1: "Ganjil", 2: "Genap"}
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    academic_year: Mapped[str] = mapped_column(db.String(16), nullable=False)  # e.g. 2024/2025
+    semester: Mapped[int] = mapped_column(db.Integer, nullable=False)
+    starts_on: Mapped[date | None]
+    ends_on: Mapped[date | None]
+    is_active: Mapped[bool] = mapped_column(db.Boolean, default=False, nullable=False)
+
+    @property
+    def name(self) -> str:
+        return f"{self.academic_year} {self.SEMESTERS.get(self.semester, self.semester)}"
+
+    def __repr__(self) -> str:
+        return f"<AcademicTerm {self.name}>"
+
+
 class Enrollment(db.Model):
     __tablename__ = "enrollments"
     __table_args__ = (
-        UniqueConstraint("student_id", "subject_id", name="uq_enrollment_student_subject"),
+        # Leading term_id: also serves per-term lookups by student (transcripts)
+        UniqueConstraint("term_id", "student_id", "subject_id", name="uq_enrollment_term_student_subject"),
     )
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    student_id: Mapped[int] = mapped_column(ForeignKey("students.id"), nullable=False, index=True)
-    subject_id: Mapped[int] = mapped_column(ForeignKey("subjects.id"), nullable=False, index=True)
+    term_id: Mapped[int] = mapped_column(ForeignKey("academic_terms.id"), nullable=False)
+    student_id: Mapped[int] = mapped_column(ForeignKey("students.id", ondelete="CASCADE"), nullable=False, index=True)
+    subject_id: Mapped[int] = mapped_column(ForeignKey("subjects.id", ondelete="CASCADE"), nullable=False, index=True)
 
     student: Mapped[Student] = relationship("Student", back_populates="enrollments")
     subject: Mapped[Subject] = relationship("Subject", back_populates="enrollments")
-    grade: Mapped[Grade | None] = relationship("Grade", back_populates="enrollment", uselist=False, cascade="all, delete-orphan")
+    grade: Mapped[Grade | None] = relationship(
+        "Grade", back_populates="enrollment", uselist=False, cascade="all, delete-orphan", passive_deletes=True
+    )
 
     def __repr__(self) -> str:
-        return f"<Enrollment s:{self.student_id} sub:{self.subject_id}>"
+        return f"<Enrollment t:{self.term_id} s:{self.student_id} sub:{self.subject_id}>"
 
 
 class Grade(db.Model):
@@ -110,7 +161,7 @@ class Grade(db.Model):
     )
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    enrollment_id: Mapped[int] = mapped_column(ForeignKey("enrollments.id"), unique=True, nullable=False)
+    enrollment_id: Mapped[int] = mapped_column(ForeignKey("enrollments.id", ondelete="CASCADE"), unique=True, nullable=False)
 
     tugas: Mapped[float | None] = mapped_column(db.Float)
     uts: Mapped[float | None] = mapped_column(db.Float)
@@ -119,14 +170,143 @@ class Grade(db.Model):
 
     enrollment: Mapped[Enrollment] = relationship("Enrollment", back_populates="grade")
 
-    def recompute_final(self):
-        parts = [p for p in [self.tugas, self.uts, self.uas] if p is not None]
-        self.nilai_akhir = round(sum(parts) / len(parts), 2) if parts else None
+    @staticmethod
+    def compute_final(tugas, uts, uas, weights: Weights = EQUAL_WEIGHTS):
+        # Formula lives in app.utils.grading, shared with the set-based recompute
+        return compute_final(tugas, uts, uas, weights)
+
+    def recompute_final(self, weights: Weights = EQUAL_WEIGHTS):
+        self.nilai_akhir = Grade.compute_final(self.tugas, self.uts, self.uas, weights)
 
     def __repr__(self) -> str:
         return f"<Grade enr:{self.enrollment_id} final:{self.nilai_akhir}>"
 
 
+class GradeArchive(db.Model):
+    # Enrollments and grades of past academic years, moved out of the hot tables by the year
+    # rollover (app.classes.rollover). Subject and classroom are snapshotted so old transcripts
+    # stay readable after renames or deletions.
+    __tablename__ = "grade_archive"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    academic_year: Mapped[str] = mapped_column(db.String(16), nullable=False)
+    semester: Mapped[int | None] = mapped_column(db.Integer)
+    enrollment_id: Mapped[int] = mapped_column(db.Integer, nullable=False)
+    student_id: Mapped[int] = mapped_column(ForeignKey("students.id", ondelete="CASCADE"), nullable=False)
+    subject_id: Mapped[int | None] = mapped_column(db.Integer)
+    subject_code: Mapped[str] = mapped_column(db.String(16), nullable=False)
+    subject_name: Mapped[str] = mapped_column(db.String(128), nullable=False)
+    sks: Mapped[int] = mapped_column(db.Integer, nullable=False)
+    classroom_name: Mapped[str | None] = mapped_column(db.String(64))
+
+    tugas: Mapped[float | None] = mapped_column(db.Float)
+    uts: Mapped[float | None] = mapped_column(db.Float)
+    uas: Mapped[float | None] = mapped_column(db.Float)
+    nilai_akhir: Mapped[float | None] = mapped_column(db.Float)
+
+    archived_at: Mapped[datetime] = mapped_column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<GradeArchive {self.academic_year} s:{self.student_id} {self.subject_code}>"
+
+
+class Rollover(db.Model):
+    # One row per completed year rollover, written in the rollover's own transaction; the unique
+    # academic_year is what stops the same year from being promoted twice
+    __tablename__ = "rollovers"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    academic_year: Mapped[str] = mapped_column(db.String(16), unique=True, nullable=False)
+    moved: Mapped[int] = mapped_column(db.Integer, default=0, nullable=False)
+    archived: Mapped[int] = mapped_column(db.Integer, default=0, nullable=False)
+    user_id: Mapped[int | None] = mapped_column(db.Integer)
+    completed_at: Mapped[datetime] = mapped_column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<Rollover {self.academic_year}>"
+
+
+class GradingPolicy(db.Model):
+    # Component weights for nilai_akhir: one row per subject override, subject_id NULL is the global default.
+    # UNIQUE lets any number of NULL subject_ids through, so the default row also carries is_default = TRUE
+    # (NULL on overrides), which is unique and can only be set together with subject_id NULL.
+    __tablename__ = "grading_policies"
+    __table_args__ = (
+        CheckConstraint("tugas >= 0 AND uts >= 0 AND uas >= 0", name="ck_policy_weights_positive"),
+        CheckConstraint("tugas + uts + uas > 0", name="ck_policy_weights_total"),
+        CheckConstraint(
+            "(subject_id IS NULL AND is_default IS NOT NULL AND is_default = 1)"
+            " OR (subject_id IS NOT NULL AND is_default IS NULL)",
+            name="ck_policy_single_default",
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    subject_id: Mapped[int | None] = mapped_column(ForeignKey("subjects.id", ondelete="CASCADE"), unique=True)
+    is_default: Mapped[bool | None] = mapped_column(db.Boolean, unique=True)
+    tugas: Mapped[float] = mapped_column(db.Float, nullable=False)
+    uts: Mapped[float] = mapped_column(db.Float, nullable=False)
+    uas: Mapped[float] = mapped_column(db.Float, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    subject: Mapped[Subject | None] = relationship("Subject")
+
+    @property
+    def weights(self) -> Weights:
+        return Weights(self.tugas, self.uts, self.uas)
+
+
+class SubjectStat(db.Model):
+    # Running per-term, per-subject aggregate of nilai_akhir, maintained by app.dashboard.stats
+    __tablename__ = "subject_stats"
+
+    term_id: Mapped[int] = mapped_column(ForeignKey("academic_terms.id", ondelete="CASCADE"), primary_key=True)
+    subject_id: Mapped[int] = mapped_column(ForeignKey("subjects.id", ondelete="CASCADE"), primary_key=True)
+    grade_count: Mapped[int] = mapped_column(db.Integer, default=0, nullable=False)
+    grade_sum: Mapped[float] = mapped_column(db.Float, default=0, nullable=False)
+
+    @property
+    def average(self) -> float | None:
+        return round(self.grade_sum / self.grade_count, 2) if self.grade_count else None
+
+
+class StatCounter(db.Model):
+    __tablename__ = "stat_counters"
+
+    name: Mapped[str] = mapped_column(db.String(32), primary_key=True)
+    value: Mapped[int] = mapped_column(db.Integer, default=0, nullable=False)
+
+
+class CacheTagVersion(db.Model):
+    # Change counter per table (cache tag), bumped by app.utils.cache after each commit; the response
+    # cache and the reference lookup lists of other processes compare against it
+    __tablename__ = "cache_tag_versions"
+
+    name: Mapped[str] = mapped_column(db.String(64), primary_key=True)
+    version: Mapped[int] = mapped_column(db.BigInteger, nullable=False)
+
+
+class GradeAudit(db.Model):
+    # Append-only change log for grades and enrollments, written asynchronously by app.grades.audit.
+    # No foreign keys: entries outlive the rows (and users) they describe.
+    __tablename__ = "grade_audit"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    entity: Mapped[str] = mapped_column(db.String(16), nullable=False)  # grade | enrollment
+    action: Mapped[str] = mapped_column(db.String(8), nullable=False)  # insert | update | delete
+    record_id: Mapped[int | None] = mapped_column(db.Integer)
+    enrollment_id: Mapped[int | None] = mapped_column(db.Integer)
+    student_id: Mapped[int | None] = mapped_column(db.Integer)
+    subject_id: Mapped[int | None] = mapped_column(db.Integer)
+    user_id: Mapped[int | None] = mapped_column(db.Integer)
+    # {"field": [old, new], ...}
+    changes: Mapped[dict] = mapped_column(db.JSON, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<GradeAudit {self.entity} {self.action} enr:{self.enrollment_id}>"
+
+
 class User(UserMixin, db.Model):
     __tablename__ = "users"
 
@@ -136,8 +316,8 @@ class User(UserMixin, db.Model):
     password_hash: Mapped[str] = mapped_column(db.String(255), nullable=False)
     role: Mapped[str] = mapped_column(db.Enum(RoleEnum), nullable=False, index=True)
 
-    teacher_id: Mapped[int | None] = mapped_column(ForeignKey("teachers.id"), unique=True)
-    student_id: Mapped[int | None] = mapped_column(ForeignKey("students.id"), unique=True)
+    teacher_id: Mapped[int | None] = mapped_column(ForeignKey("teachers.id", ondelete="SET NULL"), unique=True)
+    student_id: Mapped[int | None] = mapped_column(ForeignKey("students.id", ondelete="SET NULL"), unique=True)
     is_active: Mapped[bool] = mapped_column(db.Boolean, default=True, nullable=False)
 
     teacher: Mapped[Teacher | None] = relationship("Teacher", back_populates="user")
@@ -156,6 +336,60 @@ class User(UserMixin, db.Model):
         return f"<User {self.username} ({self.role})>"
 
 
+class Job(db.Model):
+    # Background job queue, processed by `flask jobs worker` (see app.jobs.runner).
+    # Lives on its own bind so progress can be committed while a job holds a write transaction.
+    __tablename__ = "jobs"
+    __bind_key__ = "jobs"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    kind: Mapped[str] = mapped_column(db.String(64), nullable=False)
+    params: Mapped[dict] = mapped_column(db.JSON, default=dict, nullable=False)
+    status: Mapped[JobStatus] = mapped_column(db.Enum(JobStatus), default=JobStatus.queued, nullable=False)
+    progress: Mapped[int] = mapped_column(db.Integer, default=0, nullable=False)
+    total: Mapped[int | None] = mapped_column(db.Integer)
+    message: Mapped[str | None] = mapped_column(db.String(255))
+    result: Mapped[dict | None] = mapped_column(db.JSON)
+    error: Mapped[str | None] = mapped_column(db.Text())
+    attempts: Mapped[int] = mapped_column(db.Integer, default=0, nullable=False)
+    max_attempts: Mapped[int] = mapped_column(db.Integer, default=3, nullable=False)
+    cancel_requested: Mapped[bool] = mapped_column(db.Boolean, default=False, nullable=False)
+    worker: Mapped[str | None] = mapped_column(db.String(64))
+    # users.id of the requester; no FK because the jobs bind may be a different database
+    created_by: Mapped[int | None] = mapped_column(db.Integer)
+
+    run_after: Mapped[datetime] = mapped_column(db.DateTime, default=datetime.utcnow, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(db.DateTime, default=datetime.utcnow, nullable=False)
+    started_at: Mapped[datetime | None] = mapped_column(db.DateTime)
+    heartbeat_at: Mapped[datetime | None] = mapped_column(db.DateTime)
+    finished_at: Mapped[datetime | None] = mapped_column(db.DateTime)
+
+    @property
+    def percent(self) -> int | None:
+        return min(100, int(self.progress * 100 / self.total)) if self.total else None
+
+    @property
+    def active(self) -> bool:
+        return self.status in (JobStatus.queued, JobStatus.running)
+
+    def __repr__(self) -> str:
+        return f"<Job {self.id} {self.kind} {self.status.value}>"
+
+
 # Helpful indexes
 Index("ix_students_classroom", Student.classroom_id)
 Index("ix_subjects_teacher", Subject.teacher_id)
+# Keyset pagination on (name, id)
+Index("ix_students_name", Student.name, Student.id)
+Index("ix_teachers_name", Teacher.name, Teacher.id)
+Index("ix_subjects_name", Subject.name, Subject.id)
+Index("ix_jobs_status_run_after", Job.status, Job.run_after)
+# Term-scoped grade sheets, reports and analytics
+Index("ix_enrollments_term_subject", Enrollment.term_id, Enrollment.subject_id)
+Index("ix_grade_archive_student", GradeArchive.student_id, GradeArchive.academic_year)
+Index("ix_grade_archive_year_subject", GradeArchive.academic_year, GradeArchive.subject_id)
+# Audit history per student / per subject, newest first. Ordered by capture time, not id:
+# queued entries are inserted after synchronous bulk ones captured later
+Index("ix_grade_audit_student", GradeAudit.student_id, GradeAudit.created_at, GradeAudit.id)
+Index("ix_grade_audit_subject", GradeAudit.subject_id, GradeAudit.created_at, GradeAudit.id)
+Index("ix_grade_audit_created", GradeAudit.created_at, GradeAudit.id)
@@ -0,0 +1,120 @@
+from typing import NamedTuple
+
+from sqlalchemy import select
+
+from .extensions import db, refdata
+from .models import AcademicTerm, Classroom, Teacher, Subject
+
+
+# Lightweight rows for choice lists and labels; forms, filters and report headers read these
+# instead of querying classrooms/teachers/subjects on every request.
+class ClassroomRef(NamedTuple):
+    id: int
+    name: str
+
+
+class TeacherRef(NamedTuple):
+    id: int
+    nip: str
+    name: str
+
+
+class SubjectRef(NamedTuple):
+    id: int
+    code: str
+    name: str
+    sks: int
+    teacher_id: int | None
+
+    @property
+    def label(self) -> str:
+        return f"{self.code} - {self.name}"
+
+
+class TermRef(NamedTuple):
+    id: int
+    academic_year: str
+    semester: int
+    is_active: bool
+
+    @property
+    def semester_name(self) -> str:
+        return AcademicTerm.SEMESTERS.get(self.semester, str(self.semester))
+
+    @property
+    def name(self) -> str:
+        return f"{self.academic_year} {self.semester_name}"
+
+
+def _load_classrooms():
+    return (ClassroomRef._make(r) for r in db.session.execute(select(Classroom.id, Classroom.name).order_by(Classroom.name, Classroom.id)))
+
+
+def _load_teachers():
+    return (TeacherRef._make(r) for r in db.session.execute(select(Teacher.id, Teacher.nip, Teacher.name).order_by(Teacher.name, Teacher.id)))
+
+
+def _load_subjects():
+    stmt = select(Subject.id, Subject.code, Subject.name, Subject.sks, Subject.teacher_id).order_by(Subject.name, Subject.id)
+    return (SubjectRef._make(r) for r in db.session.execute(stmt))
+
+
+def _load_terms():
+    stmt = select(AcademicTerm.id, AcademicTerm.academic_year, AcademicTerm.semester, AcademicTerm.is_active).order_by(
+        AcademicTerm.academic_year.desc(), AcademicTerm.semester.desc()
+    )
+    return (TermRef._make(r) for r in db.session.execute(stmt))
+
+
+refdata.register("classrooms", _load_classrooms)
+refdata.register("teachers", _load_teachers)
+refdata.register("subjects", _load_subjects)
+refdata.register("academic_terms", _load_terms)
+
+
+def classrooms(fresh: bool = False) -> tuple[ClassroomRef, ...]:
+    return refdata.get("classrooms", fresh)
+
+
+def teachers() -> tuple[TeacherRef, ...]:
+    return refdata.get("teachers")
+
+
+def subjects(teacher_id: int | None = None) -> tuple[SubjectRef, ...]:
+    rows = refdata.get("subjects")
+    if teacher_id is None:
+        return rows
+    return tuple(s for s in rows if s.teacher_id == teacher_id)
+
+
+def terms(fresh: bool = False) -> tuple[TermRef, ...]:
+    # Newest first
+    return refdata.get("academic_terms", fresh)
+
+
+def term(term_id) -> TermRef | None:
+    return next((t for t in terms() if t.id == term_id), None)
+
+
+def active_term() -> TermRef | None:
+    return next((t for t in terms() if t.is_active), None)
+
+
+def classroom(classroom_id) -> ClassroomRef | None:
+    return next((c for c in classrooms() if c.id == classroom_id), None)
+
+
+def subject(subject_id) -> SubjectRef | None:
+    return next((s for s in subjects() if s.id == subject_id), None)
+
+
+def classroom_choices() -> list[tuple[int, str]]:
+    return [(c.id, c.name) for c in classrooms()]
+
+
+def teacher_choices() -> list[tuple[int, str]]:
+    return [(t.id, t.name) for t in teachers()]
+
+
+def subject_choices(teacher_id: int | None = None) -> list[tuple[int, str]]:
+    return [(s.id, s.label) for s in subjects(teacher_id)]
@@ -0,0 +1,72 @@
+from sqlalchemy import delete
+
+from .auth.identity import touch_linked
+from .classes.enrollment import forget_grades, forget_enrollments
+from .classes.rollover import archive_enrollments
+from .dashboard.stats import bump_counter
+from .extensions import db
+from .models import Student, Teacher, Subject, Classroom, Enrollment, User
+from .utils import cache
+
+# Set-based deletes of students, subjects, teachers and classrooms, one or many at a time. Dependent rows
+# go by the ON DELETE CASCADE / SET NULL declared in schema.sql instead of being loaded and deleted one
+# by one, so removing a subject with thousands of grades is a single DELETE. Mapper events don't fire:
+# stats, counters, audit rows and cache tags of the cascaded tables are kept in step here. The caller
+# commits. Each returns the number of rows deleted.
+
+
+def _delete(model, ids: list[int]) -> int:
+    return db.session.execute(
+        delete(model).where(model.id.in_(ids)).execution_options(synchronize_session=False)
+    ).rowcount
+
+
+def delete_students(ids: list[int]) -> int:
+    # Cascades to enrollments, grades, archived grades and search tokens; accounts are unlinked
+    if not ids:
+        return 0
+    scope = (Enrollment.student_id.in_(ids),)
+    forget_grades(*scope)
+    forget_enrollments(*scope)
+    touch_linked(User.student_id, ids)
+    deleted = _delete(Student, ids)
+    bump_counter(db.session.connection(), "students", -deleted)
+    cache.touch(db.session, "student_search_tokens", "grade_archive", "users")
+    return deleted
+
+
+def delete_subjects(ids: list[int], archive: bool = False) -> int:
+    # Cascades to enrollments, grades, stats and the grading policy. With archive set, the
+    # enrollments and grades are first copied to grade_archive, which keeps no FK to subjects.
+    if not ids:
+        return 0
+    scope = (Enrollment.subject_id.in_(ids),)
+    if archive:
+        archive_enrollments(*scope)
+        cache.touch(db.session, "grade_archive")
+    forget_grades(*scope)
+    forget_enrollments(*scope)
+    deleted = _delete(Subject, ids)
+    bump_counter(db.session.connection(), "subjects", -deleted)
+    cache.touch(db.session, "subject_stats", "grading_policies")
+    return deleted
+
+
+def delete_teachers(ids: list[int]) -> int:
+    # Their subjects and accounts are unlinked (SET NULL)
+    if not ids:
+        return 0
+    touch_linked(User.teacher_id, ids)
+    deleted = _delete(Teacher, ids)
+    bump_counter(db.session.connection(), "teachers", -deleted)
+    cache.touch(db.session, "subjects", "users")
+    return deleted
+
+
+def delete_classrooms(ids: list[int]) -> int:
+    # Their students are left without a classroom (SET NULL)
+    if not ids:
+        return 0
+    deleted = _delete(Classroom, ids)
+    cache.touch(db.session, "students")
+    return deleted
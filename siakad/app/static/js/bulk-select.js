@@ -0,0 +1,11 @@
+// Header checkbox for multi-select tables: data-select-all names the form whose row
+// checkboxes (input[form=...]) it toggles.
+(function () {
+  document.querySelectorAll('input[data-select-all]').forEach(function (toggle) {
+    toggle.addEventListener('change', function () {
+      document.querySelectorAll('input[type=checkbox][form="' + toggle.dataset.selectAll + '"]').forEach(function (box) {
+        box.checked = toggle.checked;
+      });
+    });
+  });
+})();
@@ -0,0 +1,107 @@
+// Autosave for the grade grid (form[data-grade-grid]): edited cells are collected and sent as
+// one PATCH per pause in typing. Each row carries data-version, echoed back so the server can
+// refuse rows changed elsewhere in the meantime; those are reloaded with the current values.
+// Without JS the form still posts normally.
+(function () {
+  const form = document.querySelector('form[data-grade-grid]');
+  if (!form) return;
+  const url = form.dataset.gradeGrid;
+  const csrf = form.querySelector('input[name=csrf_token]');
+  const status = form.querySelector('[data-grid-status]');
+  const DELAY = 800;
+  let pending = new Map();
+  let timer = null;
+  let inFlight = false;
+
+  function setStatus(text) {
+    if (status) status.textContent = text;
+  }
+
+  function rowOf(studentId) {
+    return form.querySelector('tr[data-student-id="' + studentId + '"]');
+  }
+
+  function apply(row, conflict) {
+    const tr = rowOf(row.student_id);
+    if (!tr) return;
+    tr.dataset.version = row.version;
+    ['tugas', 'uts', 'uas'].forEach(function (field) {
+      const input = tr.querySelector('input[data-field="' + field + '"]');
+      const key = row.student_id + ':' + field;
+      // Keep what the user typed since this batch was sent; it goes out with the next one
+      if (input && (conflict || !pending.has(key))) {
+        input.value = row[field] === null ? '' : row[field];
+        input.classList.toggle('is-invalid', false);
+      }
+      if (conflict) pending.delete(key);
+    });
+    tr.querySelector('[data-final]').textContent = row.nilai_akhir === null ? '-' : row.nilai_akhir;
+    tr.classList.toggle('table-warning', conflict);
+  }
+
+  function flush() {
+    timer = null;
+    if (inFlight || pending.size === 0) return;
+    const cells = Array.from(pending.values()).map(function (input) {
+      const tr = input.closest('tr');
+      return {
+        student_id: Number(tr.dataset.studentId),
+        field: input.dataset.field,
+        value: input.value.trim() === '' ? null : input.value,
+        version: tr.dataset.version,
+      };
+    });
+    pending = new Map();
+    inFlight = true;
+    setStatus('Menyimpan...');
+    fetch(url, {
+      method: 'PATCH',
+      headers: { 'Content-Type': 'application/json', 'X-CSRFToken': csrf ? csrf.value : '' },
+      body: JSON.stringify({ cells: cells }),
+    })
+      .then(function (r) { return r.json(); })
+      .then(function (data) {
+        (data.rows || []).forEach(function (row) { apply(row, false); });
+        (data.conflicts || []).forEach(function (row) { apply(row, true); });
+        (data.errors || []).forEach(function (e) {
+          const tr = e.student_id && rowOf(e.student_id);
+          const input = tr && tr.querySelector('input[data-field="' + e.field + '"]');
+          if (input) {
+            input.classList.add('is-invalid');
+            input.title = e.message;
+          }
+        });
+        if (data.error) setStatus(data.error);
+        else if ((data.conflicts || []).length) setStatus('Sebagian nilai diubah pengguna lain dan dimuat ulang; periksa baris yang ditandai.');
+        else if ((data.errors || []).length) setStatus('Sebagian nilai tidak valid (0-100).');
+        else setStatus('Tersimpan.');
+      })
+      .catch(function (err) {
+        // Only network failures are retried; anything else (session expired, no access) is not JSON
+        if (!(err instanceof TypeError)) {
+          setStatus('Gagal menyimpan. Muat ulang halaman.');
+          return;
+        }
+        setStatus('Gagal menyimpan; perubahan akan dicoba lagi.');
+        cells.forEach(function (c) {
+          const input = rowOf(c.student_id).querySelector('input[data-field="' + c.field + '"]');
+          const key = c.student_id + ':' + c.field;
+          if (!pending.has(key)) pending.set(key, input);
+        });
+      })
+      .finally(function () {
+        inFlight = false;
+        if (pending.size && !timer) timer = setTimeout(flush, DELAY);
+      });
+  }
+
+  form.addEventListener('input', function (e) {
+    const input = e.target;
+    if (!input.dataset || !input.dataset.field) return;
+    const tr = input.closest('tr');
+    pending.set(tr.dataset.studentId + ':' + input.dataset.field, input);
+    setStatus('Belum disimpan');
+    clearTimeout(timer);
+    timer = setTimeout(flush, DELAY);
+  });
+})();
@@ -0,0 +1,40 @@
+// Typeahead for inputs marked with data-student-search.
+// data-href is a URL template where "__id__" is replaced by the chosen student id.
+(function () {
+  document.querySelectorAll('input[data-student-search]').forEach(function (input) {
+    const wrapper = input.parentElement;
+    wrapper.classList.add('position-relative');
+    const menu = document.createElement('div');
+    menu.className = 'dropdown-menu w-100';
+    wrapper.appendChild(menu);
+    let timer = null;
+    let seq = 0;
+
+    function render(items) {
+      menu.innerHTML = '';
+      items.forEach(function (s) {
+        const a = document.createElement('a');
+        a.className = 'dropdown-item';
+        a.href = input.dataset.href.replace('__id__', s.id);
+        a.textContent = s.nis + ' - ' + s.name + (s.classroom ? ' (' + s.classroom + ')' : '');
+        menu.appendChild(a);
+      });
+      menu.classList.toggle('show', items.length > 0);
+    }
+
+    input.addEventListener('input', function () {
+      clearTimeout(timer);
+      const q = input.value.trim();
+      if (!q) { render([]); return; }
+      timer = setTimeout(function () {
+        const params = new URLSearchParams({ q: q });
+        if (input.dataset.classroom) params.set('classroom_id', input.dataset.classroom);
+        const current = ++seq;
+        fetch(input.dataset.studentSearch + '?' + params.toString(), { headers: { 'Accept': 'application/json' } })
+          .then(function (r) { return r.ok ? r.json() : []; })
+          .then(function (items) { if (current === seq) render(items); });
+      }, 150);
+    });
+    input.addEventListener('blur', function () { setTimeout(function () { render([]); }, 200); });
+  });
+})();
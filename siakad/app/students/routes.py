@@ -1,11 +1,18 @@
-from flask import Blueprint, render_template, redirect, url_for, request, flash
+from flask import Blueprint, render_template, redirect, url_for, request, flash, jsonify
 from flask_login import login_required
 from sqlalchemy import select
+from sqlalchemy.orm import joinedload
 
 from ..extensions import db
+from ..jobs.runner import task
+from .. import reference
 from ..models import Student, Classroom, User, RoleEnum
+from ..removal import delete_students
 from ..utils.decorators import role_required
+from ..utils.export import csv_response, stream_rows
+from ..utils.pagination import keyset_paginate
 from .forms import StudentForm
+from .search import search_clause, search_students, rebuild_index
 
 bp = Blueprint("students", __name__, url_prefix="/students")
 
@@ -14,13 +21,74 @@ bp = Blueprint("students", __name__, url_prefix="/students")
 @login_required
 @role_required("admin")
 def index():
-    students = db.session.execute(select(Student).order_by(Student.name)).scalars().all()
-    return render_template("students/index.html", students=students)
+    q = (request.args.get("q") or "").strip()
+    classroom_id = request.args.get("classroom_id", type=int)
+    gender = request.args.get("gender") or None
+    stmt = select(Student).options(joinedload(Student.classroom))
+    clause = search_clause(q)
+    if clause is not None:
+        stmt = stmt.where(clause)
+    if classroom_id:
+        stmt = stmt.where(Student.classroom_id == classroom_id)
+    if gender in ("M", "F"):
+        stmt = stmt.where(Student.gender == gender)
+    page = keyset_paginate(stmt, Student.name, Student.id)
+    return render_template(
+        "students/index.html",
+        students=page.items,
+        page=page,
+        classes=reference.classrooms(),
+        filters={"q": q, "classroom_id": classroom_id, "gender": gender},
+    )
+
+
+@bp.route("/search")
+@login_required
+@role_required("admin", "teacher")
+def search():
+    q = (request.args.get("q") or "").strip()
+    limit = min(max(request.args.get("limit", 10, type=int), 1), 50)
+    results = search_students(q, request.args.get("classroom_id", type=int), limit) if q else []
+    return jsonify(results)
+
+
+@bp.cli.command("reindex-search")
+def reindex_search():
+    total = rebuild_index()
+    print(f"Indeks pencarian dibangun ulang untuk {total} siswa.")
+
+
+@task("reindex_search")
+def reindex_search_job(ctx):
+    return {"students": rebuild_index()}
+
+
+@bp.route("/export")
+@login_required
+@role_required("admin")
+def export():
+    stmt = (
+        select(
+            Student.nis,
+            Student.name,
+            Classroom.name,
+            Student.gender,
+            Student.birth_date,
+            Student.parent_phone,
+            Student.address,
+        )
+        .outerjoin(Classroom, Classroom.id == Student.classroom_id)
+        .order_by(Student.name, Student.id)
+    )
+    return csv_response(
+        "data_siswa.csv",
+        ["NIS", "Nama", "Kelas", "Gender", "Tanggal Lahir", "Telp Ortu", "Alamat"],
+        stream_rows(stmt),
+    )
 
 
 def _populate_class_choices(form: StudentForm):
-    classes = db.session.execute(select(Classroom).order_by(Classroom.name)).scalars().all()
-    form.classroom_id.choices = [(-1, "- Tidak ada -")] + [(c.id, c.name) for c in classes]
+    form.classroom_id.choices = [(-1, "- Tidak ada -")] + reference.classroom_choices()
 
 
 @bp.route("/create", methods=["GET", "POST"])
@@ -102,16 +170,28 @@ def edit(student_id):
 @login_required
 @role_required("admin")
 def delete(student_id):
-    s = db.session.get(Student, student_id)
-    if not s:
+    if not delete_students([student_id]):
         flash("Siswa tidak ditemukan.", "warning")
     else:
-        db.session.delete(s)
         db.session.commit()
         flash("Siswa dihapus.", "info")
     return redirect(url_for("students.index"))
 
 
+@bp.route("/bulk-delete", methods=["POST"])
+@login_required
+@role_required("admin")
+def bulk_delete():
+    ids = request.form.getlist("ids", type=int)
+    if not ids:
+        flash("Tidak ada data yang dipilih.", "warning")
+        return redirect(url_for("students.index"))
+    deleted = delete_students(ids)
+    db.session.commit()
+    flash(f"{deleted} siswa dihapus.", "info")
+    return redirect(url_for("students.index"))
+
+
 @bp.route("/view/<int:student_id>")
 @login_required
 @role_required("admin")
@@ -0,0 +1,108 @@
+import re
+import unicodedata
+
+from sqlalchemy import select, delete, insert, and_, or_, event, inspect
+
+from ..extensions import db
+from ..models import Student, Classroom, StudentSearchToken
+
+MAX_TOKEN = 64
+_SPLIT = re.compile(r"[^0-9a-z]+")
+
+
+def normalize(text: str) -> str:
+    folded = unicodedata.normalize("NFKD", text or "")
+    return "".join(ch for ch in folded if not unicodedata.combining(ch)).lower()
+
+
+def name_tokens(name: str) -> set[str]:
+    return {t[:MAX_TOKEN] for t in _SPLIT.split(normalize(name)) if t}
+
+
+def prefix_match(column, prefix: str):
+    # Range predicate instead of LIKE so SQLite (case-insensitive LIKE) and MySQL both seek the index
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return and_(column >= prefix, column < upper)
+
+
+def search_clause(q: str):
+    terms = name_tokens(q)
+    clauses = []
+    if q.strip():
+        clauses.append(prefix_match(Student.nis, q.strip()))
+    if terms:
+        clauses.append(and_(*(
+            Student.id.in_(select(StudentSearchToken.student_id).where(prefix_match(StudentSearchToken.token, t)))
+            for t in terms
+        )))
+    return or_(*clauses) if clauses else None
+
+
+def search_students(q: str, classroom_id: int | None = None, limit: int = 10) -> list[dict]:
+    clause = search_clause(q)
+    if clause is None:
+        return []
+    stmt = (
+        select(Student.id, Student.nis, Student.name, Classroom.name)
+        .outerjoin(Classroom, Classroom.id == Student.classroom_id)
+        .where(clause)
+        .order_by(Student.name, Student.id)
+        .limit(limit)
+    )
+    if classroom_id:
+        stmt = stmt.where(Student.classroom_id == classroom_id)
+    return [
+        {"id": sid, "nis": nis, "name": name, "classroom": classroom}
+        for sid, nis, name, classroom in db.session.execute(stmt)
+    ]
+
+
+def token_rows(student_id: int, name: str) -> list[dict]:
+    return [{"token": t, "student_id": student_id} for t in name_tokens(name)]
+
+
+def reindex(connection, students) -> None:
+    # ``students`` is an iterable of (id, name); used by events and bulk loaders alike
+    students = list(students)
+    if not students:
+        return
+    ids = [sid for sid, _ in students]
+    connection.execute(delete(StudentSearchToken).where(StudentSearchToken.student_id.in_(ids)))
+    rows = [row for sid, name in students for row in token_rows(sid, name)]
+    if rows:
+        connection.execute(insert(StudentSearchToken), rows)
+
+
+def rebuild_index(chunk: int = 5000) -> int:
+    db.session.execute(delete(StudentSearchToken))
+    total = 0
+    last_id = 0
+    while True:
+        batch = db.session.execute(
+            select(Student.id, Student.name).where(Student.id > last_id).order_by(Student.id).limit(chunk)
+        ).all()
+        if not batch:
+            break
+        rows = [row for sid, name in batch for row in token_rows(sid, name)]
+        if rows:
+            db.session.execute(insert(StudentSearchToken), rows)
+        last_id = batch[-1][0]
+        total += len(batch)
+    db.session.commit()
+    return total
+
+
+@event.listens_for(Student, "after_insert")
+def _index_new_student(mapper, connection, target):
+    reindex(connection, [(target.id, target.name)])
+
+
+@event.listens_for(Student, "after_update")
+def _reindex_student(mapper, connection, target):
+    if inspect(target).attrs.name.history.has_changes():
+        reindex(connection, [(target.id, target.name)])
+
+
+@event.listens_for(Student, "after_delete")
+def _unindex_student(mapper, connection, target):
+    connection.execute(delete(StudentSearchToken).where(StudentSearchToken.student_id == target.id))
@@ -1,30 +1,36 @@
 from flask import Blueprint, render_template, redirect, url_for, request, flash
 from flask_login import login_required, current_user
-from sqlalchemy import select
+from sqlalchemy import select, or_
+from sqlalchemy.orm import joinedload
 
 from ..extensions import db
-from ..models import Subject, Teacher
+from ..models import Subject
+from .. import reference
+from ..removal import delete_subjects
 from ..utils.decorators import role_required
+from ..utils.pagination import keyset_paginate
 from .forms import SubjectForm
 
 bp = Blueprint("subjects", __name__, url_prefix="/subjects")
 
 
 def _teacher_choices():
-    teachers = db.session.execute(select(Teacher).order_by(Teacher.name)).scalars().all()
-    return [(-1, "- Tidak ada -")] + [(t.id, t.name) for t in teachers]
+    return [(-1, "- Tidak ada -")] + reference.teacher_choices()
 
 
 @bp.route("/")
 @login_required
 @role_required("admin", "teacher")
 def index():
-    q = select(Subject).order_by(Subject.name)
+    q = (request.args.get("q") or "").strip()
+    stmt = select(Subject).options(joinedload(Subject.teacher))
     role = getattr(getattr(current_user, "role", None), "value", current_user.role)
-    if role == "teacher" and current_user.teacher:
-        q = q.where(Subject.teacher_id == current_user.teacher.id)
-    subjects = db.session.execute(q).scalars().all()
-    return render_template("subjects/index.html", subjects=subjects)
+    if role == "teacher" and current_user.teacher_id:
+        stmt = stmt.where(Subject.teacher_id == current_user.teacher_id)
+    if q:
+        stmt = stmt.where(or_(Subject.name.startswith(q, autoescape=True), Subject.code.startswith(q, autoescape=True)))
+    page = keyset_paginate(stmt, Subject.name, Subject.id)
+    return render_template("subjects/index.html", subjects=page.items, page=page, filters={"q": q})
 
 
 @bp.route("/create", methods=["GET", "POST"])
@@ -74,11 +80,23 @@ def edit(subject_id):
 @login_required
 @role_required("admin")
 def delete(subject_id):
-    s = db.session.get(Subject, subject_id)
-    if not s:
+    if not delete_subjects([subject_id]):
         flash("Mata pelajaran tidak ditemukan.", "warning")
     else:
-        db.session.delete(s)
         db.session.commit()
         flash("Mata pelajaran dihapus.", "info")
     return redirect(url_for("subjects.index"))
+
+
+@bp.route("/bulk-delete", methods=["POST"])
+@login_required
+@role_required("admin")
+def bulk_delete():
+    ids = request.form.getlist("ids", type=int)
+    if not ids:
+        flash("Tidak ada data yang dipilih.", "warning")
+        return redirect(url_for("subjects.index"))
+    deleted = delete_subjects(ids, archive=bool(request.form.get("archive")))
+    db.session.commit()
+    flash(f"{deleted} mata pelajaran dihapus.", "info")
+    return redirect(url_for("subjects.index"))
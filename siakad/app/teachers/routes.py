@@ -1,10 +1,12 @@
 from flask import Blueprint, render_template, redirect, url_for, request, flash
 from flask_login import login_required
-from sqlalchemy import select
+from sqlalchemy import select, or_
 
 from ..extensions import db
 from ..models import Teacher, User, RoleEnum
+from ..removal import delete_teachers
 from ..utils.decorators import role_required
+from ..utils.pagination import keyset_paginate
 from .forms import TeacherForm
 
 bp = Blueprint("teachers", __name__, url_prefix="/teachers")
@@ -14,8 +16,12 @@ bp = Blueprint("teachers", __name__, url_prefix="/teachers")
 @login_required
 @role_required("admin")
 def index():
-    teachers = db.session.execute(select(Teacher).order_by(Teacher.name)).scalars().all()
-    return render_template("teachers/index.html", teachers=teachers)
+    q = (request.args.get("q") or "").strip()
+    stmt = select(Teacher)
+    if q:
+        stmt = stmt.where(or_(Teacher.name.startswith(q, autoescape=True), Teacher.nip.startswith(q, autoescape=True)))
+    page = keyset_paginate(stmt, Teacher.name, Teacher.id)
+    return render_template("teachers/index.html", teachers=page.items, page=page, filters={"q": q})
 
 
 @bp.route("/create", methods=["GET", "POST"])
@@ -87,11 +93,23 @@ def edit(teacher_id):
 @login_required
 @role_required("admin")
 def delete(teacher_id):
-    t = db.session.get(Teacher, teacher_id)
-    if not t:
+    if not delete_teachers([teacher_id]):
         flash("Guru tidak ditemukan.", "warning")
     else:
-        db.session.delete(t)
         db.session.commit()
         flash("Guru dihapus.", "info")
     return redirect(url_for("teachers.index"))
+
+
+@bp.route("/bulk-delete", methods=["POST"])
+@login_required
+@role_required("admin")
+def bulk_delete():
+    ids = request.form.getlist("ids", type=int)
+    if not ids:
+        flash("Tidak ada data yang dipilih.", "warning")
+        return redirect(url_for("teachers.index"))
+    deleted = delete_teachers(ids)
+    db.session.commit()
+    flash(f"{deleted} guru dihapus.", "info")
+    return redirect(url_for("teachers.index"))
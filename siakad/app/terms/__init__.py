@@ -0,0 +1 @@
+# terms blueprint package
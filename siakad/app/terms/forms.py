@@ -0,0 +1,17 @@
+from flask_wtf import FlaskForm
+from wtforms import StringField, SelectField, DateField, BooleanField, SubmitField
+from wtforms.validators import DataRequired, Optional, Regexp
+
+from ..models import AcademicTerm
+
+
+class TermForm(FlaskForm):
+    academic_year = StringField(
+        "Tahun Ajaran",
+        validators=[DataRequired(), Regexp(r"^\d{4}/\d{4}$", message="Format tahun ajaran: 2024/2025")],
+    )
+    semester = SelectField("Semester", choices=list(AcademicTerm.SEMESTERS.items()), coerce=int)
+    starts_on = DateField("Mulai", validators=[Optional()])
+    ends_on = DateField("Selesai", validators=[Optional()])
+    activate = BooleanField("Jadikan semester aktif")
+    submit = SubmitField("Simpan")
@@ -0,0 +1,74 @@
+import click
+from flask import Blueprint, render_template, redirect, url_for, flash
+from flask_login import login_required
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+
+from ..extensions import db
+from ..models import AcademicTerm
+from .. import reference
+from ..utils.decorators import role_required
+from .forms import TermForm
+
+bp = Blueprint("terms", __name__, url_prefix="/terms")
+
+
+def activate(term_id: int) -> None:
+    # One UPDATE flips every row, so exactly one term is active afterwards; the caller commits
+    db.session.execute(
+        update(AcademicTerm).values(is_active=AcademicTerm.id == term_id).execution_options(synchronize_session=False)
+    )
+
+
+def create_term(academic_year: str, semester: int, starts_on=None, ends_on=None, active: bool = False) -> AcademicTerm:
+    # Inserting the term also creates its zeroed subject_stats rows (app.dashboard.stats)
+    term = AcademicTerm(academic_year=academic_year, semester=semester, starts_on=starts_on, ends_on=ends_on)
+    db.session.add(term)
+    db.session.flush()
+    if active:
+        activate(term.id)
+    return term
+
+
+@bp.route("/", methods=["GET", "POST"])
+@login_required
+@role_required("admin")
+def index():
+    form = TermForm()
+    if form.validate_on_submit():
+        try:
+            term = create_term(
+                form.academic_year.data.strip(), form.semester.data, form.starts_on.data, form.ends_on.data, form.activate.data
+            )
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            flash("Semester tersebut sudah ada.", "danger")
+        else:
+            flash(f"Semester {term.name} ditambahkan.", "success")
+            return redirect(url_for("terms.index"))
+    return render_template("terms/index.html", form=form, terms=reference.terms(fresh=True))
+
+
+@bp.route("/<int:term_id>/activate", methods=["POST"])
+@login_required
+@role_required("admin")
+def activate_view(term_id):
+    term = reference.term(term_id)
+    if not term:
+        flash("Semester tidak ditemukan.", "warning")
+    else:
+        activate(term.id)
+        db.session.commit()
+        flash(f"Semester aktif: {term.name}.", "success")
+    return redirect(url_for("terms.index"))
+
+
+@bp.cli.command("create")
+@click.argument("academic_year")
+@click.argument("semester", type=click.IntRange(1, 2))
+@click.option("--activate", "active", is_flag=True, help="Jadikan semester aktif.")
+def create_command(academic_year, semester, active):
+    term = create_term(academic_year, semester, active=active)
+    db.session.commit()
+    print(f"Semester {term.name} dibuat (id {term.id}){' dan diaktifkan' if active else ''}.")
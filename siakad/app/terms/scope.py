@@ -0,0 +1,24 @@
+from functools import wraps
+
+from flask import g, request, flash, redirect, url_for
+
+from .. import reference
+from ..reference import TermRef
+
+
+def current_term() -> TermRef | None:
+    # ?term_id= picks a term explicitly; otherwise the active one, else the newest. None until a term exists
+    if "term" not in g:
+        term_id = request.args.get("term_id", type=int)
+        g.term = (reference.term(term_id) if term_id else None) or reference.active_term() or next(iter(reference.terms()), None)
+    return g.term
+
+
+def term_required(f):
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        if current_term() is None:
+            flash("Belum ada semester. Admin perlu membuat semester terlebih dahulu.", "warning")
+            return redirect(url_for("dashboard.index"))
+        return f(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,146 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import insert
+
+log = logging.getLogger(__name__)
+
+_STOP = object()
+_FLUSH = object()
+
+
+class AuditWriter:
+    # Append-only audit rows go onto an in-process queue and a daemon thread inserts them in
+    # batches, so the request that made the change never waits on the audit table. The queue
+    # is drained on interpreter exit (atexit) and on close(); flush() waits until it is written.
+    def __init__(self, table_name: str, app=None):
+        self.table_name = table_name
+        self.batch_size = 500
+        self.interval = 1.0
+        self.max_retries = 3
+        self.written = 0
+        self.dropped = 0
+        self._engine = None
+        self._table = None
+        self._queue = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._write_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        atexit.register(self.close)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.close()
+        self.batch_size = app.config.get("AUDIT_BATCH_SIZE", 500)
+        self.interval = app.config.get("AUDIT_FLUSH_INTERVAL", 1.0)
+        self._engine = self._table = None
+        app.extensions["audit"] = self
+
+    def record(self, rows: list[dict]):
+        if not rows:
+            return
+        if self._engine is None:
+            # Resolved on first use so the thread never needs an app context
+            ext = current_app.extensions["sqlalchemy"]
+            self._engine, self._table = ext.engine, ext.metadata.tables[self.table_name]
+        self._ensure_thread()
+        for row in rows:
+            self._queue.put(row)
+
+    def _ensure_thread(self):
+        # Forked workers inherit the queue object but not the thread; start one per process
+        if self._running():
+            return
+        with self._start_lock:
+            if not self._running():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+                self._thread.start()
+
+    def _drain(self, block: bool) -> tuple[list, bool]:
+        # block=True waits for a first row, then up to `interval` seconds for the batch to fill.
+        # Returns every item taken (markers included, for task_done) and whether to stop.
+        items, rows, stop = [], 0, False
+        try:
+            item = self._queue.get() if block else self._queue.get_nowait()
+            deadline = time.monotonic() + self.interval
+            while True:
+                items.append(item)
+                if item is _STOP:
+                    stop = True
+                    break
+                if item is _FLUSH:
+                    break
+                rows += 1
+                if rows >= self.batch_size:
+                    break
+                remaining = deadline - time.monotonic()
+                item = self._queue.get(timeout=remaining) if block and remaining > 0 else self._queue.get_nowait()
+        except queue.Empty:
+            pass
+        return items, stop
+
+    def _insert(self, batch: list[dict]):
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                with self._write_lock, self._engine.begin() as conn:
+                    conn.execute(insert(self._table), batch)
+                self.written += len(batch)
+                return
+            except Exception:
+                if attempt == self.max_retries:
+                    self.dropped += len(batch)
+                    log.exception("audit: dropped %s rows after %s attempts", len(batch), attempt)
+                    return
+                time.sleep(0.2 * 2 ** attempt)
+
+    def _write(self, items: list):
+        batch = [item for item in items if item is not _STOP and item is not _FLUSH]
+        if batch:
+            self._insert(batch)
+        for _ in items:
+            self._queue.task_done()
+
+    def _run(self):
+        while True:
+            items, stop = self._drain(block=True)
+            self._write(items)
+            if stop:
+                return
+
+    def _running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive() and self._pid == os.getpid()
+
+    def flush(self):
+        # Returns once everything queued so far is written: by the writer thread when it runs
+        # in this process (it cuts its current batch short), otherwise from the calling thread
+        if self._running():
+            self._queue.put(_FLUSH)
+            self._queue.join()
+            return
+        while True:
+            items, _ = self._drain(block=False)
+            if not items:
+                return
+            self._write(items)
+
+    def close(self, timeout: float = 10.0):
+        if self._running():
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+        self._thread = None
+        if self._engine is not None:
+            self.flush()
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def stats(self) -> dict:
+        return {"pending": self.pending(), "written": self.written, "dropped": self.dropped, "batch_size": self.batch_size}
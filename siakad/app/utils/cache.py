@@ -0,0 +1,399 @@
+import atexit
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, select, update, insert, table, column
+from sqlalchemy.orm import Session
+
+from .routing import primary_reads
+
+log = logging.getLogger(__name__)
+
+# Change counter per tag, shared by every process using the database. Memory backends only see
+# their own bumps; they pick up the others' from here (see ResponseCache.sync).
+STAMPS = table("cache_tag_versions", column("name"), column("version"))
+
+
+class MemoryBackend:
+    # Per-process LRU with TTL; tag versions live alongside the entries
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._tags = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry[1], entry[2]
+
+    def set(self, key, value, ttl, versions):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value, versions)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def tag_versions(self, tags):
+        with self._lock:
+            return {t: self._tags.get(t, 0) for t in tags}
+
+    def bump(self, tags):
+        now = time.time_ns()
+        with self._lock:
+            for t in tags:
+                self._tags[t] = max(self._tags.get(t, 0) + 1, now)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteBackend:
+    # Shared by every worker on the host through one WAL-mode SQLite file
+    def __init__(self, path: str, max_entries: int = 10000):
+        self.path = path
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("CREATE TABLE IF NOT EXISTS cache_entries (key TEXT PRIMARY KEY, expires REAL, value BLOB)")
+        conn.execute("CREATE TABLE IF NOT EXISTS cache_tags (name TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_cache_entries_expires ON cache_entries (expires)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._conn().execute(
+            "SELECT value FROM cache_entries WHERE key = ? AND expires >= ?", (key, time.time())
+        ).fetchone()
+        return pickle.loads(row[0]) if row else None
+
+    def set(self, key, value, ttl, versions):
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache_entries (key, expires, value) VALUES (?, ?, ?)",
+            (key, time.time() + ttl, pickle.dumps((value, versions), pickle.HIGHEST_PROTOCOL)),
+        )
+        conn.execute("DELETE FROM cache_entries WHERE expires < ?", (time.time(),))
+        overflow = conn.execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0] - self.max_entries
+        if overflow > 0:
+            conn.execute(
+                "DELETE FROM cache_entries WHERE key IN (SELECT key FROM cache_entries ORDER BY expires LIMIT ?)",
+                (overflow,),
+            )
+            self.evictions += overflow
+
+    def tag_versions(self, tags):
+        tags = list(tags)
+        placeholders = ",".join("?" * len(tags))
+        rows = self._conn().execute(
+            f"SELECT name, version FROM cache_tags WHERE name IN ({placeholders})", tags
+        ).fetchall()
+        found = dict(rows)
+        return {t: found.get(t, 0) for t in tags}
+
+    def bump(self, tags):
+        now = time.time_ns()
+        self._conn().executemany(
+            "INSERT INTO cache_tags (name, version) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET version = MAX(version + 1, excluded.version)",
+            [(t, now) for t in tags],
+        )
+
+    def clear(self):
+        self._conn().execute("DELETE FROM cache_entries")
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0]
+
+
+class TagStamps:
+    # Committed tags are queued here and a daemon thread bumps their rows in cache_tag_versions
+    # afterwards, in its own short transaction, folding everything queued meanwhile into one
+    # UPDATE: writers never wait on or lock the shared rows. Readers poll the (small) table and
+    # treat any counter that differs from the last one they saw as a change.
+    def __init__(self):
+        self.max_retries = 3
+        self.written = 0
+        self.dropped = 0
+        self._engine = None
+        self._pending = set()
+        self._stopping = False
+        self._cond = threading.Condition()
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        atexit.register(self.close)
+
+    def init_app(self, app):
+        self.close()
+        self._engine = None
+
+    def queue(self, tags):
+        if not tags:
+            return
+        if self._engine is None:
+            # Resolved on first use so the thread never needs an app context
+            self._engine = current_app.extensions["sqlalchemy"].engine
+        self._ensure_thread()
+        with self._cond:
+            self._pending.update(tags)
+            self._cond.notify()
+
+    def read(self, session) -> dict:
+        with primary_reads():
+            return dict(session.execute(select(STAMPS.c.name, STAMPS.c.version)).all())
+
+    def _ensure_thread(self):
+        # Forked workers inherit the pending set but not the thread; start one per process
+        if self._running():
+            return
+        with self._start_lock:
+            if not self._running():
+                self._pid = os.getpid()
+                self._stopping = False
+                self._thread = threading.Thread(target=self._run, name="cache-stamps", daemon=True)
+                self._thread.start()
+
+    def _running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive() and self._pid == os.getpid()
+
+    def _take(self, block: bool) -> set:
+        with self._cond:
+            while block and not self._pending and not self._stopping:
+                self._cond.wait()
+            tags, self._pending = self._pending, set()
+            return tags
+
+    def _write(self, tags: set):
+        names = sorted(tags)
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                with self._engine.begin() as conn:
+                    bumped = conn.execute(
+                        update(STAMPS).where(STAMPS.c.name.in_(names)).values(version=STAMPS.c.version + 1)
+                    ).rowcount
+                    if bumped < len(names):
+                        known = set(conn.execute(select(STAMPS.c.name).where(STAMPS.c.name.in_(names))).scalars())
+                        conn.execute(insert(STAMPS), [{"name": n, "version": 1} for n in names if n not in known])
+                self.written += 1
+                return
+            except Exception:
+                # Another process may have inserted the same new tag; the retry updates it
+                if attempt == self.max_retries:
+                    self.dropped += len(names)
+                    log.exception("cache: dropped stamps for %s after %s attempts", names, attempt)
+                    return
+                time.sleep(0.2 * 2 ** attempt)
+
+    def _run(self):
+        while True:
+            tags = self._take(block=True)
+            if tags:
+                self._write(tags)
+            if self._stopping:
+                return
+
+    def flush(self):
+        # Writes whatever is queued from the calling thread
+        tags = self._take(block=False)
+        if tags and self._engine is not None:
+            self._write(tags)
+
+    def close(self, timeout: float = 10.0):
+        if self._running():
+            with self._cond:
+                self._stopping = True
+                self._cond.notify()
+            self._thread.join(timeout)
+        self._thread = None
+        self.flush()
+
+
+class ResponseCache:
+    # Entries remember the version of each tag when stored; bumping a tag
+    # (after a commit touching that table) makes them stale everywhere.
+    # Versions are bump timestamps (ns), which also tells how recently a tag changed.
+    # Committed tags are also stamped (see TagStamps); with the memory backend each process keeps
+    # its own tags and reads the others' stamps every check_interval seconds.
+    def __init__(self, app=None):
+        self.backend = None
+        self.default_ttl = 300
+        self.primary_window_ns = 0
+        self.shared_stamps = False
+        self.check_interval = 5.0
+        self.stamps = TagStamps()
+        self._subscribers = []
+        self._seen = {}
+        self._checked = 0.0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        kind = app.config.get("CACHE_BACKEND", "memory")
+        self.default_ttl = app.config.get("CACHE_DEFAULT_TTL", 300)
+        if app.config.get("SQLALCHEMY_REPLICA_URI"):
+            self.primary_window_ns = app.config.get("REPLICA_MAX_LAG", 10) * 1_000_000_000
+        max_entries = app.config.get("CACHE_MAX_ENTRIES", 1024)
+        self.check_interval = app.config.get("CACHE_TAG_CHECK_INTERVAL", 5.0)
+        self.shared_stamps = kind == "memory"
+        self.stamps.init_app(app)
+        self._seen = {}
+        self._checked = 0.0
+        if kind == "memory":
+            self.backend = MemoryBackend(max_entries)
+        elif kind == "sqlite":
+            path = app.config.get("CACHE_SQLITE_PATH") or os.path.join(app.instance_path, "cache.sqlite3")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self.backend = SQLiteBackend(path, max_entries)
+        else:
+            self.backend = None
+        app.extensions["response_cache"] = self
+
+    def get_or_set(self, key: str, tags, fn, ttl: int | None = None):
+        if self.backend is None:
+            return fn()
+        if self.shared_stamps:
+            self.sync()
+        versions = self.backend.tag_versions(tags)
+        entry = self.backend.get(key)
+        if entry is not None and entry[1] == versions:
+            with self._lock:
+                self.hits += 1
+            return entry[0]
+        with self._lock:
+            self.misses += 1
+        if self.primary_window_ns and max(versions.values(), default=0) > time.time_ns() - self.primary_window_ns:
+            # A tag changed within the replica's lag window: don't cache what a lagging replica returns
+            with primary_reads():
+                value = fn()
+        else:
+            value = fn()
+        self.backend.set(key, value, ttl or self.default_ttl, versions)
+        return value
+
+    def sync(self):
+        # One small query per check_interval: tags bumped by other workers and the job runner
+        now = time.monotonic()
+        if now - self._checked < self.check_interval:
+            return
+        stamps = self.stamps.read(current_app.extensions["sqlalchemy"].session)
+        changed = [t for t, v in stamps.items() if self._seen.get(t) != v]
+        self._seen = stamps
+        self._checked = now
+        if changed:
+            self.backend.bump(changed)
+
+    def subscribe(self, fn):
+        # fn(tables) runs after every commit in this process, e.g. to drop in-process copies
+        if fn not in self._subscribers:
+            self._subscribers.append(fn)
+
+    def invalidate(self, *tags):
+        if self.backend is not None and tags:
+            self.backend.bump(tags)
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__ if self.backend else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else None,
+            "entries": len(self.backend) if self.backend else 0,
+            "evictions": self.backend.evictions if self.backend else 0,
+            "default_ttl": self.default_ttl,
+        }
+
+
+def cache_key(*parts) -> str:
+    return ":".join(str(p) for p in parts)
+
+
+# Tags are table names. They are collected on the session as rows change and
+# fired once the transaction commits.
+def _pending(session) -> set:
+    return session.info.setdefault("cache_tags", set())
+
+
+def touch(session, *tables) -> None:
+    # Tables changed by the database itself (ON DELETE CASCADE / SET NULL), which no hook sees
+    _pending(session).update(tables)
+
+
+def _collect(session, table) -> None:
+    _pending(session).add(table.name)
+    if table.metadata.info.get("bind_key"):
+        # Lives in another database (the jobs bind): invalidated locally, never stamped
+        session.info.setdefault("cache_unstamped", set()).add(table.name)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_flushed(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        table = getattr(obj, "__table__", None)
+        if table is not None:
+            _collect(session, table)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_bulk(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, "table", None)
+        if table is not None:
+            _collect(orm_execute_state.session, table)
+
+
+def _cache():
+    return current_app.extensions.get("response_cache") if has_app_context() else None
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session):
+    tags = session.info.pop("cache_tags", None)
+    unstamped = session.info.pop("cache_unstamped", set())
+    cache = _cache()
+    if tags and cache is not None:
+        cache.invalidate(*tags)
+        # Stamped whatever the backend: refdata keys its lookup lists on the same counters
+        cache.stamps.queue(tags - unstamped)
+        for fn in cache._subscribers:
+            fn(tags)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session):
+    for key in ("cache_tags", "cache_unstamped"):
+        session.info.pop(key, None)
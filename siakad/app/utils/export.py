@@ -0,0 +1,89 @@
+import csv
+import io
+import zipfile
+
+from flask import Response, stream_with_context
+
+from ..extensions import db
+from .routing import replica_reads
+
+# Rows are fetched through a server-side cursor in partitions of this size
+STREAM_CHUNK = 1000
+
+# Text starting with these is run as a formula by spreadsheet apps
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def stream_rows(stmt):
+    # Exports read from the replica when one is configured; the bind is fixed at execute time
+    with replica_reads():
+        result = db.session.execute(stmt.execution_options(yield_per=STREAM_CHUNK))
+    for partition in result.partitions():
+        yield from partition
+
+
+def _safe_cell(value):
+    # Numbers stay numbers; text that would be a formula gets a leading ' and opens as plain text
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def csv_response(filename: str, header, rows):
+    def generate():
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        # BOM so spreadsheet apps detect UTF-8
+        buf.write("\ufeff")
+        writer.writerow(map(_safe_cell, header))
+        for i, row in enumerate(rows, 1):
+            writer.writerow(map(_safe_cell, row))
+            if i % STREAM_CHUNK == 0:
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+        yield buf.getvalue()
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+class _ChunkSink(io.RawIOBase):
+    # Write-only, non-seekable target: zipfile falls back to data descriptors and never seeks back
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def iter_zip(members):
+    # members yields (archive name, str | bytes); archive bytes are yielded as each member is written
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, data in members:
+            zf.writestr(name, data)
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    yield sink.drain()
+
+
+def zip_response(filename: str, members):
+    return Response(
+        stream_with_context(iter_zip(members)),
+        mimetype="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -0,0 +1,46 @@
+from decimal import Decimal, ROUND_HALF_UP
+from typing import NamedTuple
+
+from sqlalchemy import case, cast, func, null, Numeric
+
+
+class Weights(NamedTuple):
+    tugas: float
+    uts: float
+    uas: float
+
+
+# No policy configured: plain mean of the filled-in components
+EQUAL_WEIGHTS = Weights(1.0, 1.0, 1.0)
+
+
+# The two functions below are the single definition of nilai_akhir: a weighted mean of the
+# components that are filled in, where a missing component's weight drops out, rounded half up
+# to 2 places. compute_final serves per-row saves, final_expression the set-based recompute; both
+# sum in the same order and round the decimal value, so they agree to the last digit.
+# Binary noise past 10 places is cut first, so 15.344999999999999 (meant as 15.345) rounds up
+# as it does in the database; round() would also round exact halves to even (80.125 -> 80.12).
+NOISE = Decimal("1e-10")
+CENTS = Decimal("0.01")
+
+
+def compute_final(tugas, uts, uas, weights: Weights = EQUAL_WEIGHTS):
+    parts = [(v, w) for v, w in zip((tugas, uts, uas), weights) if v is not None and w]
+    total = sum(w for _, w in parts)
+    if not total:
+        return None
+    mean = Decimal(sum(v * w for v, w in parts) / total).quantize(NOISE, ROUND_HALF_UP)
+    return float(mean.quantize(CENTS, ROUND_HALF_UP))
+
+
+def final_expression(tugas, uts, uas, weights: Weights = EQUAL_WEIGHTS):
+    numerator = denominator = None
+    for col, w in ((col, float(w)) for col, w in zip((tugas, uts, uas), weights) if w):
+        term, weight = func.coalesce(col * w, 0.0), case((col.is_not(None), w), else_=0.0)
+        numerator = term if numerator is None else numerator + term
+        denominator = weight if denominator is None else denominator + weight
+    if numerator is None:
+        return null()
+    # Through DECIMAL(30,10) as in compute_final: ROUND on an exact value rounds half up, while on a
+    # DOUBLE MySQL may round half to even
+    return func.round(cast(numerator / func.nullif(denominator, 0.0), Numeric(30, 10)), 2)
@@ -0,0 +1,133 @@
+import random
+import re
+import threading
+import time
+from collections import Counter
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*(?:\?|%s|:\w+)(?:\s*,\s*(?:\?|%s|:\w+))*\s*\)")
+_SPACES = re.compile(r"\s+")
+
+
+def fingerprint(statement: str) -> str:
+    # Same shape, different parameters => same fingerprint
+    sql = _LITERALS.sub("?", statement)
+    sql = _IN_LIST.sub("(?)", sql)
+    return _SPACES.sub(" ", sql).strip()
+
+
+class _Trace:
+    __slots__ = ("count", "seconds", "fingerprints", "slowest")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.fingerprints = Counter()
+        self.slowest = []
+
+
+class SQLInstrumentation:
+    # Per-endpoint query counts/timings for a sampled share of requests, plus N+1 detection
+    def __init__(self, app=None):
+        self.sample_rate = 0.0
+        self.repeat_threshold = 10
+        self.slow_request_ms = 500
+        self.top_n = 5
+        self._endpoints = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.sample_rate = app.config.get("SQL_SAMPLE_RATE", 0.0)
+        self.repeat_threshold = app.config.get("SQL_N_PLUS_ONE_THRESHOLD", 10)
+        self.slow_request_ms = app.config.get("SQL_SLOW_REQUEST_MS", 500)
+        self.top_n = app.config.get("SQL_TOP_STATEMENTS", 5)
+        app.extensions["sql_instrumentation"] = self
+        if self.sample_rate > 0:
+            app.before_request(self._start)
+            app.teardown_request(self._finish)
+
+    def _start(self):
+        if random.random() < self.sample_rate:
+            g._sql_trace = _Trace()
+
+    def _finish(self, exc=None):
+        trace = g.pop("_sql_trace", None)
+        if trace is None:
+            return
+        endpoint = request.endpoint or "<unmatched>"
+        repeated = [(fp, n) for fp, n in trace.fingerprints.most_common(3) if n >= self.repeat_threshold]
+        with self._lock:
+            stats = self._endpoints.setdefault(endpoint, {
+                "requests": 0,
+                "queries": 0,
+                "max_queries": 0,
+                "sql_ms": 0.0,
+                "n_plus_one": 0,
+                "slowest": [],
+                "repeated": {},
+            })
+            stats["requests"] += 1
+            stats["queries"] += trace.count
+            stats["max_queries"] = max(stats["max_queries"], trace.count)
+            stats["sql_ms"] += trace.seconds * 1000
+            stats["slowest"] = sorted(stats["slowest"] + trace.slowest, reverse=True)[: self.top_n]
+            if repeated:
+                stats["n_plus_one"] += 1
+                for fp, n in repeated:
+                    stats["repeated"][fp] = max(stats["repeated"].get(fp, 0), n)
+
+        logger = current_app.logger
+        for fp, n in repeated:
+            logger.warning("Possible N+1 on %s: %d x %s", endpoint, n, fp[:200])
+        if trace.seconds * 1000 >= self.slow_request_ms:
+            logger.warning("Slow SQL on %s: %d queries, %.1f ms", endpoint, trace.count, trace.seconds * 1000)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            endpoints = {
+                name: {
+                    "requests": s["requests"],
+                    "avg_queries": round(s["queries"] / s["requests"], 2),
+                    "max_queries": s["max_queries"],
+                    "avg_sql_ms": round(s["sql_ms"] / s["requests"], 3),
+                    "n_plus_one_requests": s["n_plus_one"],
+                    "slowest": [{"ms": round(ms * 1000, 3), "sql": fp} for ms, fp in s["slowest"]],
+                    "repeated": s["repeated"],
+                }
+                for name, s in self._endpoints.items()
+            }
+        return {"sample_rate": self.sample_rate, "endpoints": endpoints}
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and "_sql_trace" in g:
+        context._sql_start = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, "_sql_start", None)
+    if start is None or not has_request_context():
+        return
+    elapsed = time.perf_counter() - start
+    trace = g.get("_sql_trace")
+    if trace is None:
+        return
+    fp = fingerprint(statement)
+    trace.count += 1
+    trace.seconds += elapsed
+    trace.fingerprints[fp] += 1
+    trace.slowest.append((elapsed, fp))
+    if len(trace.slowest) > 20:
+        trace.slowest = sorted(trace.slowest, reverse=True)[:5]
@@ -0,0 +1,109 @@
+import base64
+import json
+from datetime import datetime
+
+from flask import request, url_for
+from sqlalchemy import and_, or_, DateTime
+
+from ..extensions import db
+
+PER_PAGE = 50
+MAX_PER_PAGE = 200
+
+
+def _encode(values) -> str:
+    raw = json.dumps(list(values), default=str, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode(token: str | None):
+    if not token:
+        return None
+    try:
+        return json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except ValueError:
+        return None
+
+
+def _coerce(column, value):
+    # Cursors are JSON: datetimes come back as ISO strings
+    if isinstance(value, str) and isinstance(column.type, DateTime):
+        return datetime.fromisoformat(value)
+    return value
+
+
+def _scalar(value) -> bool:
+    # Anything else (lists, objects, booleans) is a tampered token. The key columns are NOT NULL and
+    # _seek compares with < / >, so a null is rejected as well.
+    return isinstance(value, (str, int, float)) and not isinstance(value, bool)
+
+
+def _seek(columns, values, forward: bool):
+    # (a, b) > (x, y)  ==  a > x OR (a = x AND b > y); spelled out so MySQL can use the index
+    cond = None
+    for col, value in reversed(list(zip(columns, values))):
+        cmp = col > value if forward else col < value
+        cond = cmp if cond is None else or_(cmp, and_(col == value, cond))
+    return cond
+
+
+class KeysetPage:
+    def __init__(self, items, per_page, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def _url(self, **cursor):
+        args = {k: v for k, v in request.args.items() if k not in ("after", "before")}
+        return url_for(request.endpoint, **(request.view_args or {}), **args, **cursor)
+
+    @property
+    def next_url(self):
+        return self._url(after=self.next_cursor) if self.next_cursor else None
+
+    @property
+    def prev_url(self):
+        return self._url(before=self.prev_cursor) if self.prev_cursor else None
+
+    @property
+    def first_url(self):
+        return self._url() if self.prev_cursor else None
+
+
+def keyset_paginate(stmt, *columns, descending: bool = False) -> KeysetPage:
+    # Seek pagination over ``columns`` (last one must be unique, e.g. the primary key).
+    # Items must be ORM entities exposing those columns as attributes.
+    # descending=True lists newest/highest first.
+    per_page = min(max(request.args.get("per_page", PER_PAGE, type=int), 1), MAX_PER_PAGE)
+    after = _decode(request.args.get("after"))
+    before = None if after else _decode(request.args.get("before"))
+    cursor = after or before
+    forward = before is None
+
+    try:
+        valid = isinstance(cursor, list) and len(cursor) == len(columns) and all(_scalar(v) for v in cursor)
+        cursor = [_coerce(col, value) for col, value in zip(columns, cursor)] if valid else None
+    except ValueError:
+        cursor = None
+    if cursor is None:
+        forward = True
+    else:
+        stmt = stmt.where(_seek(columns, cursor, forward != descending))
+    order = columns if forward != descending else [c.desc() for c in columns]
+    items = db.session.execute(stmt.order_by(*order).limit(per_page + 1)).unique().scalars().all()
+    has_more = len(items) > per_page
+    items = items[:per_page]
+    if not forward:
+        items.reverse()
+
+    def key(item):
+        return _encode(getattr(item, c.key) for c in columns)
+
+    next_cursor = prev_cursor = None
+    if items:
+        if has_more or not forward:
+            next_cursor = key(items[-1])
+        if (forward and cursor) or (not forward and has_more):
+            prev_cursor = key(items[0])
+    return KeysetPage(items, per_page, next_cursor, prev_cursor)
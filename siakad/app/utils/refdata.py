@@ -0,0 +1,73 @@
+import threading
+import time
+
+from flask import current_app
+
+from .routing import primary_reads
+
+
+class ReferenceData:
+    # In-process cache of small, rarely changing lookup tables as tuples of rows, keyed on the
+    # response cache's per-table change counters (cache_tag_versions, see cache.TagStamps). Each
+    # process reads the counters at most every check_interval seconds, and drops its own copy of a
+    # table as soon as it commits a change to it.
+    def __init__(self, app=None):
+        self.check_interval = 5.0
+        self.reloads = 0
+        self._loaders = {}
+        self._data = {}
+        self._versions = {}
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        # After the response cache: committed tags reach forget() through it
+        self.check_interval = app.config.get("REFDATA_CHECK_INTERVAL", 5.0)
+        with self._lock:
+            self._data.clear()
+            self._checked = 0.0
+        app.extensions["response_cache"].subscribe(self.forget)
+        app.extensions["refdata"] = self
+
+    def register(self, name: str, loader):
+        # loader() returns an iterable of rows; name is the table whose writes invalidate it
+        self._loaders[name] = loader
+
+    def expire(self):
+        self._checked = 0.0
+
+    def forget(self, tables):
+        with self._lock:
+            for name in self._loaders.keys() & set(tables):
+                self._data.pop(name, None)
+
+    def _current_versions(self, session) -> dict:
+        now = time.monotonic()
+        if now - self._checked >= self.check_interval:
+            self._versions = current_app.extensions["response_cache"].stamps.read(session)
+            self._checked = now
+        return self._versions
+
+    def get(self, name: str, fresh: bool = False) -> tuple:
+        # fresh=True checks the version now, for writers that must not act on another process's stale copy
+        if fresh:
+            self.expire()
+        session = current_app.extensions["sqlalchemy"].session
+        version = self._current_versions(session).get(name, 0)
+        entry = self._data.get(name)
+        if entry is None or entry[0] != version:
+            with primary_reads():
+                rows = tuple(self._loaders[name]())
+            with self._lock:
+                self._data[name] = entry = (version, rows)
+                self.reloads += 1
+        return entry[1]
+
+    def stats(self) -> dict:
+        return {
+            "datasets": {name: {"version": v, "rows": len(rows)} for name, (v, rows) in self._data.items()},
+            "reloads": self.reloads,
+            "check_interval": self.check_interval,
+        }
@@ -0,0 +1,114 @@
+import sqlite3
+import time
+from contextlib import contextmanager
+
+from flask import g, has_app_context, has_request_context, session as flask_session, current_app
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, create_engine
+from sqlalchemy.engine import Engine
+
+
+def _pool_options(size, overflow) -> dict:
+    return {k: v for k, v in (("pool_size", size), ("max_overflow", overflow)) if v is not None}
+
+
+def configure_engines(app):
+    # Binds and per-engine pool sizing; must run before db.init_app
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+        **app.config.get("SQLALCHEMY_ENGINE_OPTIONS", {}),
+        **_pool_options(app.config.get("SQLALCHEMY_POOL_SIZE"), app.config.get("SQLALCHEMY_MAX_OVERFLOW")),
+    }
+    binds = app.config["SQLALCHEMY_BINDS"] = dict(app.config.get("SQLALCHEMY_BINDS") or {})
+    # Job queue bind defaults to the main database
+    binds.setdefault("jobs", app.config.get("JOBS_DATABASE_URI") or app.config["SQLALCHEMY_DATABASE_URI"])
+
+
+@event.listens_for(Engine, "connect")
+def _sqlite_foreign_keys(dbapi_connection, connection_record):
+    # SQLite only enforces foreign keys, and with them ON DELETE CASCADE / SET NULL, when asked per
+    # connection; deletes rely on those actions as they do on MySQL
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.execute("PRAGMA foreign_keys=ON")
+
+
+def init_replica(app):
+    # Deliberately not a Flask-SQLAlchemy bind: no metadata is attached, so create_all/drop_all never touch it
+    url = app.config.get("SQLALCHEMY_REPLICA_URI")
+    if url:
+        options = {
+            **app.config["SQLALCHEMY_ENGINE_OPTIONS"],
+            **_pool_options(app.config.get("REPLICA_POOL_SIZE"), app.config.get("REPLICA_MAX_OVERFLOW")),
+        }
+        app.extensions["db_replica"] = create_engine(url, **options)
+
+
+def _pinned_to_primary() -> bool:
+    # This client wrote recently; the replica may not have caught up yet
+    return has_request_context() and flask_session.get("_primary_until", 0) > time.time()
+
+
+@contextmanager
+def replica_reads():
+    # Plain SELECTs on the default bind go to the replica inside this block (or decorated view)
+    previous = g.get("_replica_reads", False)
+    g._replica_reads = not _pinned_to_primary()
+    try:
+        yield
+    finally:
+        g._replica_reads = previous
+
+
+@contextmanager
+def primary_reads():
+    previous = g.get("_primary_reads", False)
+    g._primary_reads = True
+    try:
+        yield
+    finally:
+        g._primary_reads = previous
+
+
+class RoutingSession(Session):
+    # Sends reads to the replica bind when replica_reads() is active. Flushes, DML, SELECT ... FOR
+    # UPDATE, bare connection() calls and everything after this session's first write stay on the
+    # primary, so a request always reads its own writes.
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        if (
+            bind is None
+            and clause is not None
+            and getattr(clause, "is_select", False)
+            and getattr(clause, "_for_update_arg", None) is None
+            and not self._flushing
+            and not self.info.get("wrote")
+            and has_app_context()
+            and g.get("_replica_reads")
+            and not g.get("_primary_reads")
+        ):
+            replica = current_app.extensions.get("db_replica")
+            if replica is not None and engine is self._db.engines.get(None):
+                return replica
+        return engine
+
+
+def _on_default_bind(table) -> bool:
+    return table is not None and table.metadata.info.get("bind_key") is None
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _mark_flushed(session, flush_context):
+    if any(_on_default_bind(getattr(obj, "__table__", None)) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info["wrote"] = True
+
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def _mark_bulk(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        if _on_default_bind(getattr(orm_execute_state.statement, "table", None)):
+            orm_execute_state.session.info["wrote"] = True
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _pin_writer(session):
+    if session.info.get("wrote") and has_request_context() and current_app.config.get("SQLALCHEMY_REPLICA_URI"):
+        flask_session["_primary_until"] = time.time() + current_app.config.get("REPLICA_MAX_LAG", 10)
@@ -0,0 +1,245 @@
+import argparse
+import json
+import math
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple, Callable
+
+from sqlalchemy import event, select, func
+
+from app import create_app
+from config import get_config
+from app.extensions import db
+from app.models import User, RoleEnum, Student, Enrollment
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+class Route(NamedTuple):
+    name: str
+    role: str
+    method: str
+    url: Callable[[dict], str]
+    data: Callable[[dict], dict] | None
+    # Maximum SQL statements per request; exceeding it fails the run
+    query_budget: int
+
+
+ROUTES = [
+    Route("dashboard.index", "admin", "GET", lambda ctx: "/", None, 4),
+    Route("students.index", "admin", "GET", lambda ctx: "/students/", None, 4),
+    Route(
+        "grades.manage_subject", "admin", "GET",
+        lambda ctx: f"/grades/subject/{ctx['subject_id']}?classroom_id={ctx['classroom_id']}", None, 5,
+    ),
+    Route(
+        "grades.report", "admin", "POST", lambda ctx: "/grades/report",
+        lambda ctx: {"subject_id": ctx["subject_id"], "classroom_id": ctx["classroom_id"]}, 5,
+    ),
+    Route("grades.transcript_admin", "admin", "GET", lambda ctx: f"/grades/transcript/{ctx['student_id']}", None, 3),
+    Route("grades.transcript_me", "student", "GET", lambda ctx: "/grades/transcript", None, 3),
+    Route(
+        "auth.login", None, "POST", lambda ctx: "/auth/login",
+        lambda ctx: {"username": ctx["admin_username"], "password": ctx["admin_password"]}, 2,
+    ),
+]
+
+
+class BenchConfig:
+    # Mixed in front of the environment's config
+    TESTING = True
+    WTF_CSRF_ENABLED = False
+    SQL_SAMPLE_RATE = 0.0
+
+
+class QueryCounter:
+    def __init__(self, engines):
+        self._local = threading.local()
+        for engine in engines:
+            event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args, **kwargs):
+        self._local.count = getattr(self._local, "count", 0) + 1
+
+    def take(self) -> int:
+        count = getattr(self._local, "count", 0)
+        self._local.count = 0
+        return count
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def build_context(args):
+    # Pick a busy (subject, classroom) pair and a student with enrollments from the loaded dataset
+    subject_id, classroom_id = db.session.execute(
+        select(Enrollment.subject_id, Student.classroom_id)
+        .join(Student, Student.id == Enrollment.student_id)
+        .where(Student.classroom_id.is_not(None))
+        .group_by(Enrollment.subject_id, Student.classroom_id)
+        .order_by(func.count().desc())
+        .limit(1)
+    ).one()
+    student_user = db.session.execute(
+        select(User.username, User.student_id).where(User.role == RoleEnum.student, User.student_id.is_not(None)).limit(1)
+    ).first()
+    student_id = student_user[1] if student_user else db.session.scalar(select(Enrollment.student_id).limit(1))
+    return {
+        "subject_id": subject_id,
+        "classroom_id": classroom_id,
+        "student_id": student_id,
+        "admin_username": args.admin_username,
+        "admin_password": args.admin_password,
+        "student_username": student_user[0] if student_user else None,
+        "student_password": args.user_password,
+    }
+
+
+def login(app, ctx, role):
+    client = app.test_client()
+    if role is None:
+        return client
+    username, password = {
+        "admin": (ctx["admin_username"], ctx["admin_password"]),
+        "student": (ctx["student_username"], ctx["student_password"]),
+    }[role]
+    if username is None:
+        return None
+    response = client.post("/auth/login", data={"username": username, "password": password})
+    if response.status_code != 302:
+        raise SystemExit(f"Login gagal untuk {username}")
+    return client
+
+
+def run_route(app, counter, route, ctx, args):
+    clients = [login(app, ctx, route.role) for _ in range(args.concurrency)]
+    if clients[0] is None:
+        return None
+    url = route.url(ctx)
+    data = route.data(ctx) if route.data else None
+
+    def hit(client):
+        if route.role is None:
+            client = app.test_client()
+        started = time.perf_counter()
+        response = client.open(url, method=route.method, data=data)
+        elapsed = time.perf_counter() - started
+        if response.status_code >= 400:
+            raise SystemExit(f"{route.name}: HTTP {response.status_code}")
+        return elapsed, counter.take()
+
+    for _ in range(args.warmup):
+        hit(clients[0])
+    counter.take()
+
+    latencies, queries = [], []
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = pool.map(lambda i: hit(clients[i % len(clients)]), range(args.iterations))
+        for elapsed, count in results:
+            latencies.append(elapsed * 1000)
+            queries.append(count)
+    wall = time.perf_counter() - started
+    return {
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "throughput_rps": round(len(latencies) / wall, 1),
+        "queries": max(queries),
+        "query_budget": route.query_budget,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def compare(results, baseline, tolerance):
+    failures = []
+    for name, r in results.items():
+        if r["queries"] > r["query_budget"]:
+            failures.append(f"{name}: {r['queries']} query > budget {r['query_budget']}")
+        base = baseline.get(name)
+        if base and r["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            failures.append(f"{name}: p95 {r['p95_ms']} ms > baseline {base['p95_ms']} ms (+{tolerance:.0%})")
+        if base and r["queries"] > base["queries"]:
+            failures.append(f"{name}: {r['queries']} query > baseline {base['queries']}")
+    return failures
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark hot routes against the configured database.")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=1, help="jumlah thread klien paralel")
+    parser.add_argument("--routes", nargs="*", help="nama route yang diuji (default: semua)")
+    parser.add_argument("--cache", default="null", help="CACHE_BACKEND selama benchmark (null = ukur jalur DB)")
+    parser.add_argument("--admin-username", default="admin")
+    parser.add_argument("--admin-password", default="admin123")
+    parser.add_argument("--user-password", default="password123", help="password akun siswa dari seed.py --accounts")
+    parser.add_argument("--baseline", help="file JSON baseline untuk dibandingkan")
+    parser.add_argument("--save-baseline", help="simpan hasil sebagai baseline ke file ini")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="kenaikan p95 yang masih diterima")
+    args = parser.parse_args(argv)
+    if args.baseline and not os.path.exists(args.baseline):
+        parser.error(f"file baseline tidak ditemukan: {args.baseline}")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    config = type("Config", (BenchConfig, get_config()), {"CACHE_BACKEND": args.cache})
+    app = create_app(config)
+    with app.app_context():
+        # Every engine a request may hit: the primary, the other binds and the read replica
+        engines = {*db.engines.values(), app.extensions.get("db_replica")} - {None}
+        counter = QueryCounter(engines)
+        ctx = build_context(args)
+
+    # Requests run outside the setup app context so each one gets its own, as in production
+    results = {}
+    for route in ROUTES:
+        if args.routes and route.name not in args.routes:
+            continue
+        result = run_route(app, counter, route, ctx, args)
+        if result is None:
+            print(f"{route.name:28} dilewati (tidak ada akun {route.role})")
+            continue
+        results[route.name] = result
+        print(
+            f"{route.name:28} p50 {result['p50_ms']:8.2f}  p95 {result['p95_ms']:8.2f}  p99 {result['p99_ms']:8.2f} ms"
+            f"  {result['throughput_rps']:8.1f} rps  {result['queries']:3d} q  rss {result['peak_rss_mb']} MB"
+        )
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as fh:
+            json.dump(results, fh, indent=2, sort_keys=True)
+        print(f"Baseline disimpan ke {args.save_baseline}")
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)
+    failures = compare(results, baseline, args.tolerance)
+    for failure in failures:
+        print(f"REGRESI: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,6 +3,12 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+
+def _optional_int(name: str) -> int | None:
+    value = os.getenv(name)
+    return int(value) if value else None
+
+
 class Config:
     SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret-key")
     SQLALCHEMY_DATABASE_URI = os.getenv(
@@ -17,12 +23,64 @@ class Config:
         "pool_recycle": int(os.getenv("SQLALCHEMY_ENGINE_POOL_RECYCLE", "280")),
     }
 
+    # Pool sizing for the primary engine (unset = SQLAlchemy defaults)
+    SQLALCHEMY_POOL_SIZE = _optional_int("SQLALCHEMY_POOL_SIZE")
+    SQLALCHEMY_MAX_OVERFLOW = _optional_int("SQLALCHEMY_MAX_OVERFLOW")
+
+    # Optional read replica: reporting views and exports read from it. A client that just wrote is
+    # kept on the primary, and cache fills shortly after a write read the primary, for REPLICA_MAX_LAG s.
+    SQLALCHEMY_REPLICA_URI = os.getenv("SQLALCHEMY_REPLICA_URI")
+    REPLICA_POOL_SIZE = _optional_int("REPLICA_POOL_SIZE")
+    REPLICA_MAX_OVERFLOW = _optional_int("REPLICA_MAX_OVERFLOW")
+    REPLICA_MAX_LAG = int(os.getenv("REPLICA_MAX_LAG", "10"))
+
+    # View data cache: "memory" (per worker), "sqlite" (shared by workers on one host) or "null"
+    CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+    CACHE_DEFAULT_TTL = int(os.getenv("CACHE_DEFAULT_TTL", "300"))
+    CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "1024"))
+    CACHE_SQLITE_PATH = os.getenv("CACHE_SQLITE_PATH")
+    # Memory backend: seconds between reads of the tag versions other processes committed
+    CACHE_TAG_CHECK_INTERVAL = float(os.getenv("CACHE_TAG_CHECK_INTERVAL", "5"))
+
+    # Classroom/teacher/subject lookup lists cached per process; seconds between version checks
+    REFDATA_CHECK_INTERVAL = float(os.getenv("REFDATA_CHECK_INTERVAL", "5"))
+
+    # Grade audit log: rows per batch INSERT and seconds the writer thread waits to fill a batch
+    AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "500"))
+    AUDIT_FLUSH_INTERVAL = float(os.getenv("AUDIT_FLUSH_INTERVAL", "1"))
+
+    # SQL instrumentation: share of requests traced (0 disables), N+1 repeat threshold, slow-request log threshold
+    SQL_SAMPLE_RATE = float(os.getenv("SQL_SAMPLE_RATE", "0.05"))
+    SQL_N_PLUS_ONE_THRESHOLD = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", "10"))
+    SQL_SLOW_REQUEST_MS = int(os.getenv("SQL_SLOW_REQUEST_MS", "500"))
+
     # Bcrypt
     BCRYPT_LOG_ROUNDS = int(os.getenv("BCRYPT_LOG_ROUNDS", "12"))
 
+    # CSV import: rows per bulk INSERT and processes used for password hashing (0 = all CPUs)
+    IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "500"))
+    IMPORT_HASH_WORKERS = int(os.getenv("IMPORT_HASH_WORKERS", "0"))
+
+    # Grades per UPDATE window when nilai_akhir is recomputed after a weighting change
+    GRADE_RECOMPUTE_CHUNK = int(os.getenv("GRADE_RECOMPUTE_CHUNK", "5000"))
+
+    # Whole-school report-card job: processes rendering HTML (0 = up to 4, 1 = render in the job worker)
+    REPORT_CARD_WORKERS = int(os.getenv("REPORT_CARD_WORKERS", "0"))
+
+    # Background jobs: queue database (defaults to SQLALCHEMY_DATABASE_URI; a separate SQLite file
+    # avoids lock waits on progress updates when the main DB is SQLite), result files, retry and
+    # stale-worker timing in seconds
+    JOBS_DATABASE_URI = os.getenv("JOBS_DATABASE_URI")
+    JOB_STORAGE_PATH = os.getenv("JOB_STORAGE_PATH")
+    JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+    JOB_RETRY_DELAY = int(os.getenv("JOB_RETRY_DELAY", "30"))
+    JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "2"))
+    JOB_STALE_AFTER = int(os.getenv("JOB_STALE_AFTER", "300"))
+
 
 class DevelopmentConfig(Config):
     DEBUG = True
+    SQL_SAMPLE_RATE = float(os.getenv("SQL_SAMPLE_RATE", "1.0"))
 
 
 class ProductionConfig(Config):
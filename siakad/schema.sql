@@ -15,16 +15,27 @@ CREATE TABLE IF NOT EXISTS students (
   classroom_id INT NULL,
   created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
   INDEX ix_students_classroom (classroom_id),
+  INDEX ix_students_name (name, id),
   CONSTRAINT fk_students_classroom FOREIGN KEY (classroom_id) REFERENCES classrooms(id)
     ON UPDATE CASCADE ON DELETE SET NULL
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+CREATE TABLE IF NOT EXISTS student_search_tokens (
+  token VARCHAR(64) NOT NULL,
+  student_id INT NOT NULL,
+  PRIMARY KEY (token, student_id),
+  INDEX ix_student_search_tokens_student_id (student_id),
+  CONSTRAINT fk_student_search_tokens_student FOREIGN KEY (student_id) REFERENCES students(id)
+    ON UPDATE CASCADE ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_bin;
+
 CREATE TABLE IF NOT EXISTS teachers (
   id INT AUTO_INCREMENT PRIMARY KEY,
   nip VARCHAR(32) NOT NULL UNIQUE,
   name VARCHAR(128) NOT NULL,
   phone VARCHAR(32) NULL,
-  address TEXT NULL
+  address TEXT NULL,
+  INDEX ix_teachers_name (name, id)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 CREATE TABLE IF NOT EXISTS subjects (
@@ -34,17 +45,33 @@ CREATE TABLE IF NOT EXISTS subjects (
   sks INT NOT NULL,
   teacher_id INT NULL,
   INDEX ix_subjects_teacher (teacher_id),
+  INDEX ix_subjects_name (name, id),
   CONSTRAINT fk_subjects_teacher FOREIGN KEY (teacher_id) REFERENCES teachers(id)
     ON UPDATE CASCADE ON DELETE SET NULL
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+-- Semesters; exactly one is_active row scopes grade views by default
+CREATE TABLE IF NOT EXISTS academic_terms (
+  id INT AUTO_INCREMENT PRIMARY KEY,
+  academic_year VARCHAR(16) NOT NULL,
+  semester INT NOT NULL,
+  starts_on DATE NULL,
+  ends_on DATE NULL,
+  is_active BOOLEAN NOT NULL DEFAULT FALSE,
+  CONSTRAINT uq_term_year_semester UNIQUE (academic_year, semester)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
 CREATE TABLE IF NOT EXISTS enrollments (
   id INT AUTO_INCREMENT PRIMARY KEY,
+  term_id INT NOT NULL,
   student_id INT NOT NULL,
   subject_id INT NOT NULL,
-  CONSTRAINT uq_enrollment_student_subject UNIQUE (student_id, subject_id),
+  CONSTRAINT uq_enrollment_term_student_subject UNIQUE (term_id, student_id, subject_id),
+  INDEX ix_enrollments_term_subject (term_id, subject_id),
   INDEX ix_enrollments_student (student_id),
   INDEX ix_enrollments_subject (subject_id),
+  CONSTRAINT fk_enrollments_term FOREIGN KEY (term_id) REFERENCES academic_terms(id)
+    ON UPDATE CASCADE,
   CONSTRAINT fk_enrollments_student FOREIGN KEY (student_id) REFERENCES students(id)
     ON UPDATE CASCADE ON DELETE CASCADE,
   CONSTRAINT fk_enrollments_subject FOREIGN KEY (subject_id) REFERENCES subjects(id)
@@ -66,6 +93,96 @@ CREATE TABLE IF NOT EXISTS grades (
   CONSTRAINT ck_grade_final_range CHECK (nilai_akhir >= 0 AND nilai_akhir <= 100)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+-- Past academic years, moved out of enrollments/grades by the year rollover
+CREATE TABLE IF NOT EXISTS grade_archive (
+  id INT AUTO_INCREMENT PRIMARY KEY,
+  academic_year VARCHAR(16) NOT NULL,
+  semester INT NULL,
+  enrollment_id INT NOT NULL,
+  student_id INT NOT NULL,
+  subject_id INT NULL,
+  subject_code VARCHAR(16) NOT NULL,
+  subject_name VARCHAR(128) NOT NULL,
+  sks INT NOT NULL,
+  classroom_name VARCHAR(64) NULL,
+  tugas FLOAT NULL,
+  uts FLOAT NULL,
+  uas FLOAT NULL,
+  nilai_akhir FLOAT NULL,
+  archived_at DATETIME NOT NULL,
+  INDEX ix_grade_archive_student (student_id, academic_year),
+  INDEX ix_grade_archive_year_subject (academic_year, subject_id),
+  CONSTRAINT fk_grade_archive_student FOREIGN KEY (student_id) REFERENCES students(id)
+    ON UPDATE CASCADE ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Completed year rollovers; the unique year makes a rollover run at most once
+CREATE TABLE IF NOT EXISTS rollovers (
+  id INT AUTO_INCREMENT PRIMARY KEY,
+  academic_year VARCHAR(16) NOT NULL UNIQUE,
+  moved INT NOT NULL DEFAULT 0,
+  archived INT NOT NULL DEFAULT 0,
+  user_id INT NULL,
+  completed_at DATETIME NOT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Component weights for nilai_akhir; subject_id NULL is the global default
+CREATE TABLE IF NOT EXISTS grading_policies (
+  id INT AUTO_INCREMENT PRIMARY KEY,
+  subject_id INT NULL UNIQUE,
+  -- TRUE on the global default row, NULL otherwise: at most one default
+  is_default BOOLEAN NULL UNIQUE,
+  tugas DOUBLE NOT NULL,
+  uts DOUBLE NOT NULL,
+  uas DOUBLE NOT NULL,
+  updated_at DATETIME NOT NULL,
+  CONSTRAINT ck_policy_weights_positive CHECK (tugas >= 0 AND uts >= 0 AND uas >= 0),
+  CONSTRAINT ck_policy_weights_total CHECK (tugas + uts + uas > 0),
+  CONSTRAINT ck_policy_single_default CHECK ((subject_id IS NULL AND is_default IS NOT NULL AND is_default = 1) OR (subject_id IS NOT NULL AND is_default IS NULL)),
+  CONSTRAINT fk_grading_policies_subject FOREIGN KEY (subject_id) REFERENCES subjects(id)
+    ON UPDATE CASCADE ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS subject_stats (
+  term_id INT NOT NULL,
+  subject_id INT NOT NULL,
+  grade_count INT NOT NULL DEFAULT 0,
+  grade_sum DOUBLE NOT NULL DEFAULT 0,
+  PRIMARY KEY (term_id, subject_id),
+  CONSTRAINT fk_subject_stats_term FOREIGN KEY (term_id) REFERENCES academic_terms(id)
+    ON UPDATE CASCADE ON DELETE CASCADE,
+  CONSTRAINT fk_subject_stats_subject FOREIGN KEY (subject_id) REFERENCES subjects(id)
+    ON UPDATE CASCADE ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS stat_counters (
+  name VARCHAR(32) PRIMARY KEY,
+  value INT NOT NULL DEFAULT 0
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Change counter per table, shared by the per-process response caches and lookup lists
+CREATE TABLE IF NOT EXISTS cache_tag_versions (
+  name VARCHAR(64) PRIMARY KEY,
+  version BIGINT NOT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Append-only grade/enrollment change log (no FKs: entries outlive the rows they describe)
+CREATE TABLE IF NOT EXISTS grade_audit (
+  id INT AUTO_INCREMENT PRIMARY KEY,
+  entity VARCHAR(16) NOT NULL,
+  action VARCHAR(8) NOT NULL,
+  record_id INT NULL,
+  enrollment_id INT NULL,
+  student_id INT NULL,
+  subject_id INT NULL,
+  user_id INT NULL,
+  changes JSON NOT NULL,
+  created_at DATETIME NOT NULL,
+  INDEX ix_grade_audit_student (student_id, created_at, id),
+  INDEX ix_grade_audit_subject (subject_id, created_at, id),
+  INDEX ix_grade_audit_created (created_at, id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
 CREATE TABLE IF NOT EXISTS users (
   id INT AUTO_INCREMENT PRIMARY KEY,
   username VARCHAR(64) NOT NULL UNIQUE,
@@ -81,3 +198,27 @@ CREATE TABLE IF NOT EXISTS users (
   CONSTRAINT fk_users_student FOREIGN KEY (student_id) REFERENCES students(id)
     ON UPDATE CASCADE ON DELETE SET NULL
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Background job queue (may live in a separate database, see JOBS_DATABASE_URI)
+CREATE TABLE IF NOT EXISTS jobs (
+  id INT AUTO_INCREMENT PRIMARY KEY,
+  kind VARCHAR(64) NOT NULL,
+  params JSON NOT NULL,
+  status ENUM('queued','running','done','failed','cancelled') NOT NULL DEFAULT 'queued',
+  progress INT NOT NULL DEFAULT 0,
+  total INT NULL,
+  message VARCHAR(255) NULL,
+  result JSON NULL,
+  error TEXT NULL,
+  attempts INT NOT NULL DEFAULT 0,
+  max_attempts INT NOT NULL DEFAULT 3,
+  cancel_requested BOOLEAN NOT NULL DEFAULT FALSE,
+  worker VARCHAR(64) NULL,
+  created_by INT NULL,
+  run_after DATETIME NOT NULL,
+  created_at DATETIME NOT NULL,
+  started_at DATETIME NULL,
+  heartbeat_at DATETIME NULL,
+  finished_at DATETIME NULL,
+  INDEX ix_jobs_status_run_after (status, run_after)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
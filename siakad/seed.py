@@ -1,22 +1,205 @@
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import select
+
 from app import create_app
-from app.extensions import db
-from app.models import User, RoleEnum
+from app.extensions import db, bcrypt
+from app.models import User, RoleEnum, Classroom, Teacher, Subject, Student, AcademicTerm, Enrollment, Grade
+from app.dashboard.stats import rebuild_stats
+from app.students.search import rebuild_index
+
+FIRST_NAMES = [
+    "Adi", "Agus", "Ahmad", "Ayu", "Bayu", "Budi", "Citra", "Dewi", "Dian", "Eka", "Fajar", "Fitri", "Gilang",
+    "Hana", "Indra", "Intan", "Joko", "Kartika", "Lina", "Made", "Nur", "Putri", "Rizki", "Sari", "Tono", "Wahyu",
+]
+LAST_NAMES = [
+    "Pratama", "Saputra", "Lestari", "Wulandari", "Hidayat", "Nugroho", "Kurniawan", "Setiawan", "Permata",
+    "Siregar", "Simanjuntak", "Wijaya", "Rahmawati", "Susanto", "Putra", "Utami", "Santoso", "Halim",
+]
+SUBJECT_NAMES = [
+    "Matematika", "Bahasa Indonesia", "Bahasa Inggris", "Fisika", "Kimia", "Biologi", "Sejarah", "Geografi",
+    "Ekonomi", "Sosiologi", "PPKn", "Seni Budaya", "PJOK", "Informatika", "Agama", "Prakarya",
+]
+LEVELS = ["X", "XI", "XII"]
+
+
+def ensure_admin():
+    # Create admin if not exists
+    username = "admin"
+    user = User.query.filter_by(username=username).first()
+    if not user:
+        user = User(username=username, role=RoleEnum.admin, email=None)
+        user.set_password("admin123")
+        db.session.add(user)
+        db.session.commit()
+        print("Admin user created: admin/admin123")
+    else:
+        print("Admin user already exists")
+
+
+def ensure_term(academic_year: str) -> int:
+    # Generated enrollments go into the active term; semester 1 of academic_year is created (active) when none exists
+    term_id = db.session.scalar(select(AcademicTerm.id).where(AcademicTerm.is_active.is_(True)))
+    if term_id is None:
+        term = AcademicTerm(academic_year=academic_year, semester=1, is_active=True)
+        db.session.add(term)
+        db.session.commit()
+        print(f"Semester aktif dibuat: {term.name}")
+        term_id = term.id
+    return term_id
+
+
+def _person_name(rng: random.Random) -> str:
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+
+def _insert_chunks(table, rows, chunk: int):
+    for i in range(0, len(rows), chunk):
+        db.session.execute(table.insert(), rows[i:i + chunk])
+        db.session.commit()
+
+
+def _ids_by(column, id_column, keys):
+    # Ordered by id: rng.choice/sample over these must see the same order on every engine and plan,
+    # or --seed would not reproduce the dataset
+    return dict(db.session.execute(select(column, id_column).where(column.in_(keys)).order_by(id_column)).all())
+
+
+def generate(args, term_id: int):
+    rng = random.Random(args.seed)
+    prefix = args.prefix
+    started = time.perf_counter()
+    # One bcrypt hash shared by every generated account
+    password_hash = bcrypt.generate_password_hash(args.password).decode() if args.accounts else None
+
+    classroom_names = [
+        f"{prefix}{LEVELS[i % len(LEVELS)]}-{i // len(LEVELS) + 1}" for i in range(args.classrooms)
+    ]
+    _insert_chunks(Classroom.__table__, [{"name": n} for n in classroom_names], args.chunk_size)
+    classroom_ids = list(_ids_by(Classroom.name, Classroom.id, classroom_names).values())
+
+    teachers = [
+        {"nip": f"{prefix}T{i:06d}", "name": _person_name(rng), "phone": f"08{rng.randrange(10**9, 10**10)}", "address": None}
+        for i in range(args.teachers)
+    ]
+    _insert_chunks(Teacher.__table__, teachers, args.chunk_size)
+    teacher_ids = _ids_by(Teacher.nip, Teacher.id, [t["nip"] for t in teachers])
+
+    subjects = [
+        {
+            "code": f"{prefix}M{i:03d}",
+            "name": f"{SUBJECT_NAMES[i % len(SUBJECT_NAMES)]} {i // len(SUBJECT_NAMES) + 1}",
+            "sks": rng.randint(1, 4),
+            "teacher_id": rng.choice(list(teacher_ids.values())) if teacher_ids else None,
+        }
+        for i in range(args.subjects)
+    ]
+    _insert_chunks(Subject.__table__, subjects, args.chunk_size)
+    subject_ids = list(_ids_by(Subject.code, Subject.id, [s["code"] for s in subjects]).values())
+
+    if args.accounts:
+        _insert_chunks(User.__table__, [
+            {"username": f"{prefix.lower()}guru{i}", "email": None, "password_hash": password_hash,
+             "role": RoleEnum.teacher.name, "teacher_id": teacher_ids[t["nip"]], "student_id": None, "is_active": True}
+            for i, t in enumerate(teachers)
+        ], args.chunk_size)
+
+    per_student = min(args.enrollments_per_student, len(subject_ids))
+    totals = {"students": 0, "enrollments": 0, "grades": 0}
+    for start in range(0, args.students, args.chunk_size):
+        batch = []
+        for i in range(start, min(start + args.chunk_size, args.students)):
+            batch.append({
+                "nis": f"{prefix}{i:07d}",
+                "name": _person_name(rng),
+                "birth_date": date(2008, 1, 1) + timedelta(days=rng.randrange(3 * 365)),
+                "address": None,
+                "gender": rng.choice("MF"),
+                "parent_phone": None,
+                "classroom_id": rng.choice(classroom_ids) if classroom_ids else None,
+                "created_at": date.today(),
+            })
+        db.session.execute(Student.__table__.insert(), batch)
+        student_ids = _ids_by(Student.nis, Student.id, [s["nis"] for s in batch])
+
+        if args.accounts:
+            db.session.execute(User.__table__.insert(), [
+                {"username": f"{prefix.lower()}siswa{s['nis']}", "email": None, "password_hash": password_hash,
+                 "role": RoleEnum.student.name, "teacher_id": None, "student_id": student_ids[s["nis"]], "is_active": True}
+                for s in batch
+            ])
+
+        if per_student:
+            enrollments = [
+                {"term_id": term_id, "student_id": sid, "subject_id": sub}
+                for sid in student_ids.values()
+                for sub in rng.sample(subject_ids, per_student)
+            ]
+            db.session.execute(Enrollment.__table__.insert(), enrollments)
+            enrolled = db.session.execute(
+                select(Enrollment.id)
+                .where(Enrollment.term_id == term_id, Enrollment.student_id.in_(list(student_ids.values())))
+                .order_by(Enrollment.id)
+            ).scalars().all()
+            grades = []
+            for enr_id in enrolled:
+                if rng.random() >= args.graded_ratio:
+                    continue
+                parts = [round(rng.gauss(75, 12), 1) for _ in range(3)]
+                tugas, uts, uas = (min(100.0, max(0.0, p)) for p in parts)
+                grades.append({
+                    "enrollment_id": enr_id, "tugas": tugas, "uts": uts, "uas": uas,
+                    "nilai_akhir": Grade.compute_final(tugas, uts, uas),
+                })
+            if grades:
+                db.session.execute(Grade.__table__.insert(), grades)
+            totals["enrollments"] += len(enrollments)
+            totals["grades"] += len(grades)
+        db.session.commit()
+        totals["students"] += len(batch)
+        print(f"  {totals['students']}/{args.students} siswa, {totals['grades']} nilai", end="\r", flush=True)
+
+    print()
+    # Core inserts skip mapper events; rebuild the derived tables once at the end
+    rebuild_index()
+    rebuild_stats()
+    print(
+        f"Selesai dalam {time.perf_counter() - started:.1f} dtk: {len(classroom_ids)} kelas, {len(teacher_ids)} guru, "
+        f"{len(subject_ids)} mapel, {totals['students']} siswa, {totals['enrollments']} enrollment, {totals['grades']} nilai"
+    )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Seed admin user and, optionally, a synthetic dataset.")
+    parser.add_argument("--create-schema", action="store_true", help="jalankan db.create_all() terlebih dahulu")
+    parser.add_argument("--seed", type=int, default=42, help="seed acak (hasil deterministik)")
+    parser.add_argument("--prefix", default="G", help="prefix NIS/NIP/kode agar tidak bentrok dengan data lain")
+    parser.add_argument("--academic-year", default="2024/2025", help="tahun ajaran semester aktif bila belum ada")
+    parser.add_argument("--classrooms", type=int, default=0)
+    parser.add_argument("--teachers", type=int, default=0)
+    parser.add_argument("--subjects", type=int, default=0)
+    parser.add_argument("--students", type=int, default=0)
+    parser.add_argument("--enrollments-per-student", type=int, default=10)
+    parser.add_argument("--graded-ratio", type=float, default=0.9, help="porsi enrollment yang sudah bernilai")
+    parser.add_argument("--accounts", action="store_true", help="buat akun login untuk guru dan siswa")
+    parser.add_argument("--password", default="password123", help="password bersama untuk akun yang dibuat")
+    parser.add_argument("--chunk-size", type=int, default=2000)
+    return parser.parse_args(argv)
 
 
-def main():
+def main(argv=None):
+    args = parse_args(argv)
     app = create_app()
     with app.app_context():
-        # Create admin if not exists
-        username = "admin"
-        user = User.query.filter_by(username=username).first()
-        if not user:
-            user = User(username=username, role=RoleEnum.admin, email=None)
-            user.set_password("admin123")
-            db.session.add(user)
-            db.session.commit()
-            print("Admin user created: admin/admin123")
-        else:
-            print("Admin user already exists")
+        if args.create_schema:
+            db.create_all()
+        ensure_admin()
+        term_id = ensure_term(args.academic_year)
+        if any((args.classrooms, args.teachers, args.subjects, args.students)):
+            generate(args, term_id)
 
 
 if __name__ == "__main__":